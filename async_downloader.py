@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module download ảnh bất đồng bộ (asyncio + aiohttp) thay cho pool worker thread
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp là tùy chọn, chỉ cần cho chế độ async
+    aiohttp = None
+
+from http_session_pool import DEFAULT_HEADERS
+from host_scheduler import get_host
+from retry_policy import CircuitBreaker, CircuitOpenError, parse_retry_after
+from url_dedup import UrlDeduplicator
+from stream_download import CHUNK_SIZE, DownloadRejected, ImageStreamBuffer
+
+
+class HttpStatusError(Exception):
+    """Response có HTTP status lỗi (>= 400)"""
+
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+        super().__init__(f"HTTP Error {status}: {reason}")
+
+
+class AsyncImageDownloader:
+    def __init__(self, app, max_in_flight=100, limit_per_host=0, timeout=30, cpu_workers=None):
+        """
+        Khởi tạo engine download bất đồng bộ
+
+        Args:
+            app (ImageCrawlerApp): App cung cấp xử lý ảnh, ghi kết quả và log
+            max_in_flight (int): Số request được phép chạy đồng thời trên event loop
+            limit_per_host (int): Số request đồng thời tối đa mỗi host (0 = không giới hạn)
+            timeout (int): Timeout (giây) cho mỗi request
+            cpu_workers (int): Số thread chờ xử lý ảnh / đọc ghi cache (mặc định = số CPU)
+        """
+        self.app = app
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.limit_per_host = max(0, int(limit_per_host))
+        self.timeout = timeout
+        self.cpu_workers = cpu_workers or os.cpu_count() or 4
+
+    @staticmethod
+    def is_available():
+        """Kiểm tra aiohttp đã được cài đặt chưa"""
+        return aiohttp is not None
+
+    def run(self, entries, save_dir):
+        """
+        Chạy toàn bộ entries trên một event loop mới (gọi từ crawl thread)
+
+        Args:
+            entries (list): Danh sách entry {'code', 'link', 'row'}
+            save_dir (str): Thư mục lưu ảnh
+        """
+        asyncio.run(self._run(entries, save_dir))
+
+    async def _run(self, entries, save_dir):
+        pending = asyncio.Queue()
+        for index, entry in enumerate(entries):
+            pending.put_nowait((index, entry))
+
+        self.total = len(entries)
+        self.completed = 0
+
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.limit_per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        with ThreadPoolExecutor(max_workers=self.cpu_workers) as executor:
+            async with aiohttp.ClientSession(headers=DEFAULT_HEADERS, connector=connector,
+                                             timeout=timeout) as session:
+                consumers = [
+                    asyncio.create_task(self._consume(pending, session, executor, save_dir))
+                    for _ in range(min(self.max_in_flight, len(entries)) or 1)
+                ]
+                await asyncio.gather(*consumers)
+
+    async def _consume(self, pending, session, executor, save_dir):
+        while self.app.is_crawling:
+            try:
+                index, entry = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            link = entry['link']
+            product_code = entry['code']
+            row = entry['row']
+
+            # Phân loại link gửi request HEAD (blocking) - chạy trên thread pool mặc định, không chiếm pool xử lý ảnh
+            if await asyncio.get_running_loop().run_in_executor(None, self.app.is_direct_image_link, link):
+                state, outcome = self.app.url_dedup.claim(link, (save_dir, product_code, row, None))
+                if state == UrlDeduplicator.OWNER:
+                    await self._download(session, executor, link, save_dir, product_code, row)
+                elif state == UrlDeduplicator.COMPLETED:
+                    await asyncio.get_running_loop().run_in_executor(
+                        executor, self.app.record_deduplicated, link, outcome, save_dir, product_code, row)
+            else:
+                # Link trang web cần Selenium - chuyển sang worker thread như chế độ direct
+                self.app.log_message(f"🌐 Chuyển link trang web sang worker thread: {link}")
+                self.app.download_queue.put((link, save_dir, product_code, row))
+
+            self.completed += 1
+            self.app.processed_count += 1
+            self.app.update_progress(self.completed / self.total * 100)
+
+    async def _fetch(self, session, executor, img_url, result_entry):
+        """Download bytes với retry/backoff, circuit breaker và cache HTTP dùng chung với worker thread"""
+        policy = self.app.retry_policy
+        breaker = self.app.circuit_breaker
+        cache = self.app.http_cache
+        host = get_host(img_url)
+        headers = cache.conditional_headers(img_url) if cache else None
+        loop = asyncio.get_running_loop()
+        attempt = 0
+
+        while True:
+            # Delay tối thiểu giữa 2 request cùng host và lùi theo Retry-After dùng chung trạng thái với scheduler
+            wait = self.app.download_queue.try_send(img_url)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.app.download_queue.try_send(img_url)
+
+            allowed = breaker.allow(host)
+            if not allowed:
+                raise CircuitOpenError(host)
+
+            attempt += 1
+            result_entry['attempts'] = result_entry.get('attempts', 0) + 1
+            try:
+                async with session.get(img_url, headers=headers) as response:
+                    if cache and response.status == 304:
+                        breaker.record_success(host)
+                        content = await loop.run_in_executor(executor, cache.get_body, img_url)
+                        if content is not None:
+                            result_entry['cache_status'] = 'hit'
+                            return content
+                        # Body trong cache không còn - tải lại đầy đủ
+                        headers = None
+                        continue
+
+                    if response.status < 400:
+                        # Host đã phản hồi bình thường - body bị từ chối không phải lỗi của host
+                        breaker.record_success(host)
+                        # Đọc streaming: kiểm tra headers, sniff chunk đầu, dừng nếu vượt giới hạn
+                        stream = ImageStreamBuffer(response.headers, self.app.max_download_bytes)
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            stream.feed(chunk)
+                        content = stream.finish()
+                        if cache:
+                            await loop.run_in_executor(executor, cache.store, img_url, dict(response.headers), content)
+                            result_entry['cache_status'] = 'miss'
+                        return content
+
+                    retry_after = None
+                    if response.status in (429, 503):
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        self.app.download_queue.record_throttled(img_url, retry_after)
+
+                    if not policy.is_retryable_status(response.status):
+                        breaker.record_success(host)
+                        raise HttpStatusError(response.status, response.reason)
+
+                    breaker.record_failure(host)
+                    if attempt >= policy.max_attempts or not self.app.is_crawling:
+                        raise HttpStatusError(response.status, response.reason)
+
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError):
+                breaker.record_failure(host)
+                if attempt >= policy.max_attempts or not self.app.is_crawling:
+                    raise
+                retry_after = None
+            finally:
+                if allowed == CircuitBreaker.PROBE:
+                    breaker.end_probe(host)
+
+            delay = policy.compute_delay(attempt, retry_after)
+            self.app.log_message(f"🔁 Thử lại lần {attempt + 1}/{policy.max_attempts} sau {delay:.1f}s: {img_url}")
+            await asyncio.sleep(delay)
+
+    async def _download(self, session, executor, img_url, save_dir, product_code, row_number):
+        start_time = time.time()
+        result_entry = self.app.create_result_entry(img_url, product_code, row_number, direct=True)
+
+        try:
+            fetch_started = time.monotonic()
+            try:
+                content = await self._fetch(session, executor, img_url, result_entry)
+            finally:
+                self.app.record_download_time(fetch_started)
+
+            # Xử lý Pillow (CPU) trên process pool của app; thread executor chỉ chờ kết quả để không chặn event loop
+            loop = asyncio.get_running_loop()
+            filename, file_size = await loop.run_in_executor(
+                executor, self.app.save_entry_image, img_url, content, save_dir, product_code, result_entry)
+
+            result_entry.update({
+                'status': 'success',
+                'filename': filename,
+                'file_size': file_size,
+                'download_time': time.time() - start_time
+            })
+            self.app.success_count += 1
+            self.app.log_message(f"✅ Đã lưu ảnh: {filename} (Mã: {product_code}) - {file_size/1024:.1f}KB")
+
+        except HttpStatusError as e:
+            result_entry['error_reason'] = f"HTTP Error {e.status}: {e.reason}"
+            self.app.failed_count += 1
+            self.app.log_message(f"❌ HTTP Error {e.status}: {img_url}")
+
+        except DownloadRejected as e:
+            self.app.record_download_rejected(e)
+            # Hỏi lại Content-Type (HTTP blocking) và tìm ảnh trên trang bằng worker thread nếu link thật ra là trang web
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(None, self.app.reroute_rejected_link, img_url):
+                await loop.run_in_executor(None, self.app.download_from_webpage, img_url, save_dir, product_code,
+                                           result_entry, start_time)
+            else:
+                result_entry['error_reason'] = f"Download Rejected: {e.reason}"
+                self.app.failed_count += 1
+                self.app.log_message(f"🚫 Dừng download sớm: {img_url} - {e.reason}")
+
+        except CircuitOpenError as e:
+            result_entry['error_reason'] = f"Circuit Breaker: {str(e)}"
+            self.app.failed_count += 1
+            self.app.log_message(f"⛔ Bỏ qua (host bị ngắt): {img_url}")
+
+        except asyncio.TimeoutError:
+            result_entry['error_reason'] = f"Timeout - Link không phản hồi trong {self.timeout}s"
+            self.app.failed_count += 1
+            self.app.log_message(f"❌ Timeout khi download: {img_url}")
+
+        except aiohttp.ClientError as e:
+            result_entry['error_reason'] = f"Network Error: {str(e)}"
+            self.app.failed_count += 1
+            self.app.log_message(f"❌ Network Error: {img_url}")
+
+        except Exception as e:
+            result_entry['error_reason'] = f"Image Processing Error: {str(e)}"
+            self.app.failed_count += 1
+            self.app.log_message(f"❌ Image Error: {img_url} - {str(e)}")
+
+        finally:
+            if result_entry['download_time'] is None:
+                result_entry['download_time'] = time.time() - start_time
+            self.app.record_result(result_entry)
+            # Các dòng trùng URL đang chờ: copy file output trong executor
+            await asyncio.get_running_loop().run_in_executor(
+                executor, self.app.complete_deduplicated, img_url, result_entry, save_dir)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module pool trình duyệt Chrome headless dùng lại giữa các trang: worker mượn driver rồi trả lại,
+driver hỏng được thay mới, driver đã mở quá N trang được khởi động lại để tránh rò rỉ bộ nhớ
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+
+class BrowserPoolClosed(Exception):
+    """Pool đã đóng (crawl đã dừng) - không cấp thêm driver"""
+
+
+PROFILE_LEAN = 'lean'
+PROFILE_DEFAULT = 'default'
+
+# Profile "lean" chặn video/audio, font và tracking. Dấu * ở cuối để khớp cả link có query string
+# (vd font.woff2?v=3)
+LEAN_BLOCKED_URL_PATTERNS = [
+    '*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.ogg*',
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*connect.facebook.net*',
+    '*hotjar.com*', '*clarity.ms*', '*analytics.tiktok.com*',
+]
+
+# Ảnh chỉ bị chặn khi không cần: chờ trang theo <img> và xếp hạng ảnh (naturalWidth/naturalHeight,
+# đọc kích thước bằng Range) đều cần ảnh tải thật
+LEAN_BLOCKED_IMAGE_PATTERNS = [
+    '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.bmp*', '*.ico*', '*.svg*',
+]
+
+
+def build_chrome_options(profile=PROFILE_LEAN, block_images=False):
+    """
+    Tạo ChromeOptions cho driver headless
+
+    Args:
+        profile (str): PROFILE_LEAN (page load "eager", tắt extension/GPU) hoặc PROFILE_DEFAULT
+        block_images (bool): Profile lean không tải ảnh
+
+    Returns:
+        webdriver.ChromeOptions: Options dùng chung cho mọi driver trong pool
+    """
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+
+    if profile == PROFILE_LEAN:
+        # Trả về khi DOM sẵn sàng, không chờ ảnh/font/iframe tải xong
+        options.page_load_strategy = 'eager'
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-gpu')
+        if block_images:
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    return options
+
+
+def block_heavy_resources(driver, patterns=None):
+    """
+    Chặn request theo URL pattern bằng CDP (Network.setBlockedURLs)
+
+    Args:
+        driver (WebDriver): Driver Chrome
+        patterns (list): URL pattern cần chặn (mặc định LEAN_BLOCKED_URL_PATTERNS)
+    """
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns or LEAN_BLOCKED_URL_PATTERNS)})
+
+
+def measure_eager_saving(driver):
+    """
+    Ước tính thời gian page load "eager" của profile lean tiết kiệm cho trang vừa mở: driver.get trả về
+    khi DOM sẵn sàng, profile mặc định phải chờ thêm tới sự kiện load (ảnh, font, iframe tải xong).
+    Không tính phần tiết kiệm nhờ chặn font/video/tracking (và ảnh nếu có chặn) - đo bằng compare_profiles
+
+    Args:
+        driver (WebDriver): Driver đang mở trang
+
+    Returns:
+        float: Số giây từ DOMContentLoaded tới load (trang chưa load xong thì tính tới hiện tại),
+               None nếu trình duyệt không có Navigation Timing
+    """
+    timing = driver.execute_script(
+        "const n = performance.getEntriesByType('navigation')[0];"
+        "return n ? [n.domContentLoadedEventEnd, n.loadEventEnd, performance.now()] : null;")
+    if not timing or not timing[0]:
+        return None
+    dom_ready, loaded, now = timing
+    return max(0.0, ((loaded or now) - dom_ready) / 1000.0)
+
+
+class ChromeDriverPool:
+    def __init__(self, max_drivers=2, max_pages=50, page_load_timeout=30, profile=PROFILE_LEAN,
+                 block_images=False, driver_factory=None, log=None):
+        """
+        Khởi tạo pool (driver được tạo khi cần, tối đa max_drivers cùng lúc)
+
+        Args:
+            max_drivers (int): Số trình duyệt tối đa chạy cùng lúc
+            max_pages (int): Số trang tối đa mỗi driver mở trước khi được khởi động lại (0 = không giới hạn)
+            page_load_timeout (int): Timeout tải trang (giây)
+            profile (str): PROFILE_LEAN hoặc PROFILE_DEFAULT (xem build_chrome_options)
+            block_images (bool): Profile lean chặn luôn ảnh (chỉ khi không cần ảnh để chờ trang / xếp hạng)
+            driver_factory (callable): Hàm tạo driver mới (mặc định: Chrome headless)
+            log (callable): Hàm ghi log (nếu có)
+        """
+        self.max_drivers = max(1, int(max_drivers))
+        self.max_pages = max(0, int(max_pages))
+        self.page_load_timeout = page_load_timeout
+        self.profile = profile if profile in (PROFILE_LEAN, PROFILE_DEFAULT) else PROFILE_LEAN
+        self.block_images = bool(block_images) and self.profile == PROFILE_LEAN
+        self.driver_factory = driver_factory or self._create_chrome
+        self.log = log
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = set()
+        self._pages = {}
+        self._creating = 0
+        self._closed = False
+
+        self._install_lock = threading.Lock()
+        self._driver_path = None
+
+        self.stats = {'started': 0, 'recycled': 0, 'unhealthy': 0, 'pages': 0,
+                      'startup_time': 0.0, 'peak_in_use': 0, 'page_loads': 0, 'load_time': 0.0}
+
+    def _create_chrome(self):
+        # Chỉ gọi ChromeDriverManager().install() một lần cho cả pool
+        with self._install_lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+
+        driver = webdriver.Chrome(service=Service(self._driver_path), options=build_chrome_options(self.profile, self.block_images))
+        driver.set_page_load_timeout(self.page_load_timeout)
+        if self.profile == PROFILE_LEAN:
+            try:
+                patterns = LEAN_BLOCKED_URL_PATTERNS + (LEAN_BLOCKED_IMAGE_PATTERNS if self.block_images else [])
+                block_heavy_resources(driver, patterns)
+            except Exception as e:
+                # Chrome quá cũ không có CDP - vẫn chạy được, chỉ không chặn request
+                if self.log:
+                    self.log(f"⚠️ Không bật được chặn tài nguyên cho trình duyệt: {str(e)}")
+        return driver
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _is_healthy(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _total_locked(self):
+        return len(self._idle) + len(self._in_use) + self._creating
+
+    def lease(self, timeout=None):
+        """
+        Mượn một driver (tạo mới nếu pool chưa đủ, ngược lại chờ driver được trả)
+
+        Args:
+            timeout (float): Thời gian chờ tối đa (None = chờ tới khi có)
+
+        Returns:
+            WebDriver: Driver sẵn sàng mở trang
+
+        Raises:
+            BrowserPoolClosed: Pool đã đóng
+            TimeoutError: Hết thời gian chờ
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise BrowserPoolClosed("pool trình duyệt đã đóng")
+                    if self._idle:
+                        driver = self._idle.pop()
+                        self._in_use.add(driver)
+                        self.stats['peak_in_use'] = max(self.stats['peak_in_use'], len(self._in_use))
+                        break
+                    if self._total_locked() < self.max_drivers:
+                        driver = None
+                        self._creating += 1
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("hết thời gian chờ trình duyệt rảnh")
+                    self._cond.wait(remaining)
+
+            if driver is None:
+                return self._start_driver()
+
+            # Health check driver lấy từ pool, driver hỏng thì bỏ và lấy/tạo cái khác
+            if self._is_healthy(driver):
+                return driver
+            self._discard(driver, reason='unhealthy')
+
+    def _start_driver(self):
+        started = time.time()
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._creating -= 1
+            self.stats['started'] += 1
+            self.stats['startup_time'] += time.time() - started
+            self._pages[id(driver)] = 0
+            if self._closed:
+                self._quit(driver)
+                raise BrowserPoolClosed("pool trình duyệt đã đóng")
+            self._in_use.add(driver)
+            self.stats['peak_in_use'] = max(self.stats['peak_in_use'], len(self._in_use))
+        return driver
+
+    def _discard(self, driver, reason):
+        with self._cond:
+            self._in_use.discard(driver)
+            self._pages.pop(id(driver), None)
+            self.stats[reason] += 1
+            self._cond.notify()
+        self._quit(driver)
+
+        if self.log:
+            if reason == 'recycled':
+                self.log(f"♻️ Khởi động lại trình duyệt sau {self.max_pages} trang")
+            else:
+                self.log("⚠️ Trình duyệt không phản hồi - thay bằng trình duyệt mới")
+
+    def release(self, driver, healthy=True):
+        """
+        Trả driver về pool sau khi mở xong một trang
+
+        Args:
+            driver (WebDriver): Driver đã mượn
+            healthy (bool): False nếu driver gặp lỗi - driver bị đóng thay vì dùng lại
+        """
+        with self._cond:
+            self.stats['pages'] += 1
+            pages = self._pages.get(id(driver), 0) + 1
+            self._pages[id(driver)] = pages
+
+            if not self._closed and healthy and not (self.max_pages and pages >= self.max_pages):
+                self._in_use.discard(driver)
+                self._idle.append(driver)
+                self._cond.notify()
+                return
+
+        if self._closed:
+            with self._cond:
+                self._in_use.discard(driver)
+                self._pages.pop(id(driver), None)
+            self._quit(driver)
+        else:
+            self._discard(driver, reason='recycled' if healthy else 'unhealthy')
+
+    def load_page(self, driver, url):
+        """
+        Mở trang bằng driver đã mượn và ghi nhận thời gian tải
+
+        Args:
+            driver (WebDriver): Driver đã mượn từ pool
+            url (str): URL trang
+
+        Returns:
+            float: Thời gian tải trang (giây)
+        """
+        started = time.time()
+        driver.get(url)
+        elapsed = time.time() - started
+        with self._cond:
+            self.stats['page_loads'] += 1
+            self.stats['load_time'] += elapsed
+        return elapsed
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Mượn driver trong khối with, luôn trả lại kể cả khi có exception"""
+        driver = self.lease(timeout)
+        healthy = True
+        try:
+            yield driver
+        except Exception:
+            healthy = self._is_healthy(driver)
+            raise
+        finally:
+            self.release(driver, healthy)
+
+    def close_all(self):
+        """Đóng pool: quit các driver rảnh ngay, driver đang dùng sẽ bị quit khi được trả"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._pages.pop(id(driver), None)
+            self._quit(driver)
+
+    def get_stats(self):
+        """
+        Thống kê pool cho báo cáo
+
+        Returns:
+            dict: started, recycled, unhealthy, pages, startup_time, peak_in_use, avg_startup,
+                  page_loads, load_time, avg_load, profile, block_images
+        """
+        with self._cond:
+            stats = dict(self.stats)
+        stats['avg_startup'] = stats['startup_time'] / stats['started'] if stats['started'] else 0.0
+        stats['avg_load'] = stats['load_time'] / stats['page_loads'] if stats['page_loads'] else 0.0
+        stats['profile'] = self.profile
+        stats['block_images'] = self.block_images
+        return stats
+
+
+def compare_profiles(urls, page_load_timeout=30, block_images=False, driver_factory=None, log=None):
+    """
+    Đo thời gian tải từng trang với profile mặc định và profile lean (mỗi profile một trình duyệt,
+    mở lần lượt cùng danh sách trang)
+
+    Args:
+        urls (list): Các URL trang cần đo
+        page_load_timeout (int): Timeout tải trang (giây)
+        block_images (bool): Profile lean chặn luôn ảnh (như khi crawl với cùng cấu hình)
+        driver_factory (callable): Hàm driver_factory(profile) tạo driver (mặc định: Chrome headless của pool)
+        log (callable): Hàm ghi log (nếu có)
+
+    Returns:
+        list: Mỗi trang một dict {'url', 'default', 'lean', 'saved'} - thời gian (giây), None nếu lỗi
+    """
+    timings = {url: {'url': url, PROFILE_DEFAULT: None, PROFILE_LEAN: None, 'saved': None} for url in urls}
+
+    for profile in (PROFILE_DEFAULT, PROFILE_LEAN):
+        factory = (lambda p=profile: driver_factory(p)) if driver_factory else None
+        pool = ChromeDriverPool(max_drivers=1, max_pages=0, page_load_timeout=page_load_timeout,
+                                profile=profile, block_images=block_images, driver_factory=factory, log=log)
+        try:
+            # Mở một trang trước để thời gian khởi động Chrome không bị tính vào trang đầu tiên
+            with pool.driver() as driver:
+                driver.get('about:blank')
+                for url in urls:
+                    try:
+                        timings[url][profile] = pool.load_page(driver, url)
+                    except Exception as e:
+                        if log:
+                            log(f"⚠️ [{profile}] Không tải được {url}: {str(e)}")
+        finally:
+            pool.close_all()
+
+    for timing in timings.values():
+        if timing[PROFILE_DEFAULT] is not None and timing[PROFILE_LEAN] is not None:
+            timing['saved'] = timing[PROFILE_DEFAULT] - timing[PROFILE_LEAN]
+    return list(timings.values())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module tự điều chỉnh số worker download theo kiểu AIMD (tăng cộng, giảm nhân) dựa trên
+latency, throughput và tỷ lệ 429/5xx quan sát được trong từng chu kỳ
+"""
+
+import threading
+import time
+
+OUTCOME_OK = 'ok'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_ERROR = 'error'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class AdaptiveConcurrencyController:
+    def __init__(self, resize, current, backlog, min_workers=1, max_workers=32, interval=5.0,
+                 error_threshold=0.05, latency_factor=2.0, decrease_factor=0.5, increase_step=1,
+                 min_samples=5, log=None):
+        """
+        Khởi tạo bộ điều khiển số luồng
+
+        Args:
+            resize (callable): Hàm resize(count) thay đổi số worker
+            current (callable): Hàm trả về số worker hiện tại
+            backlog (callable): Hàm trả về số task đang chờ trong queue
+            min_workers (int): Số worker tối thiểu
+            max_workers (int): Số worker tối đa
+            interval (float): Độ dài mỗi chu kỳ đánh giá (giây)
+            error_threshold (float): Tỷ lệ lỗi 5xx/timeout (0-1) vượt ngưỡng này thì giảm
+            latency_factor (float): Latency p50 vượt baseline * hệ số này thì giảm 1 luồng
+            decrease_factor (float): Hệ số giảm nhân khi bị throttle / lỗi
+            increase_step (int): Số luồng tăng thêm mỗi chu kỳ ổn định
+            min_samples (int): Số request tối thiểu trong chu kỳ để đánh giá latency
+            log (callable): Hàm ghi log (nếu có)
+        """
+        self.resize = resize
+        self.current = current
+        self.backlog = backlog
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        self.interval = interval
+        self.error_threshold = error_threshold
+        self.latency_factor = latency_factor
+        self.decrease_factor = decrease_factor
+        self.increase_step = max(1, int(increase_step))
+        self.min_samples = min_samples
+        self.log = log
+
+        self._lock = threading.Lock()
+        self._samples = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_time = None
+
+        self.baseline_latency = None
+        self.last_action = None
+        self.last_throughput = 0.0
+        self.timeline = []
+
+    def record(self, latency, outcome):
+        """
+        Ghi nhận kết quả một request
+
+        Args:
+            latency (float): Thời gian request (giây)
+            outcome (str): OUTCOME_OK, OUTCOME_THROTTLED (429/503) hoặc OUTCOME_ERROR (5xx, timeout, lỗi kết nối)
+        """
+        with self._lock:
+            self._samples.append((latency, outcome))
+
+    def start(self):
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                if self.log:
+                    self.log(f"⚠️ Lỗi điều chỉnh số luồng: {str(e)}")
+
+    def tick(self):
+        """
+        Đánh giá chu kỳ vừa qua và tăng/giảm số worker
+
+        Returns:
+            dict: Bản ghi timeline của chu kỳ
+        """
+        with self._lock:
+            samples, self._samples = self._samples, []
+
+        workers = self.current()
+        backlog = self.backlog()
+        latencies = [latency for latency, outcome in samples if outcome == OUTCOME_OK]
+        throttled = len([1 for _, outcome in samples if outcome == OUTCOME_THROTTLED])
+        errors = len([1 for _, outcome in samples if outcome == OUTCOME_ERROR])
+        error_rate = errors / len(samples) if samples else 0.0
+        throughput = len(latencies) / self.interval
+        p50 = percentile(latencies, 0.5)
+        p95 = percentile(latencies, 0.95)
+
+        if len(latencies) >= self.min_samples:
+            self.baseline_latency = p50 if self.baseline_latency is None else min(self.baseline_latency, p50)
+
+        target = workers
+        if not samples:
+            action = "giữ (chưa có request hoàn thành)"
+        elif self.last_action == 'decrease' and (throttled or error_rate > self.error_threshold):
+            # Lỗi của các request gửi trước lần giảm vừa rồi - chờ thêm một chu kỳ rồi mới giảm tiếp
+            action = "giữ (vừa giảm)"
+        elif throttled:
+            target = max(self.min_workers, int(workers * self.decrease_factor))
+            action = "giảm (bị throttle 429/503)"
+        elif error_rate > self.error_threshold:
+            target = max(self.min_workers, int(workers * self.decrease_factor))
+            action = "giảm (lỗi 5xx/timeout)"
+        elif (len(latencies) >= self.min_samples and self.baseline_latency
+              and p50 > self.baseline_latency * self.latency_factor):
+            target = max(self.min_workers, workers - 1)
+            action = "giảm (latency tăng)"
+        elif backlog > workers and workers < self.max_workers:
+            if self.last_action == 'increase' and throughput < self.last_throughput * 1.05:
+                # Lần tăng trước không làm throughput tăng - giữ nguyên, chu kỳ sau thử lại
+                action = "giữ (throughput không tăng)"
+            else:
+                target = min(self.max_workers, workers + self.increase_step)
+                action = "tăng"
+        else:
+            action = "giữ"
+
+        if target > workers:
+            self.last_action = 'increase'
+        elif target < workers:
+            self.last_action = 'decrease'
+        else:
+            self.last_action = 'hold'
+        self.last_throughput = throughput
+
+        entry = {
+            'elapsed': round(time.monotonic() - self._start_time, 1) if self._start_time else 0.0,
+            'workers': workers,
+            'requests': len(samples),
+            'throughput': round(throughput, 2),
+            'latency_p50': round(p50, 3),
+            'latency_p95': round(p95, 3),
+            'error_rate': round(error_rate * 100, 1),
+            'throttled': throttled,
+            'backlog': backlog,
+            'action': action,
+            'new_workers': target,
+        }
+        self.timeline.append(entry)
+
+        if target != workers:
+            if self.log:
+                self.log(f"🎚️ Tự điều chỉnh luồng: {action} - p50 {p50:.2f}s, lỗi {error_rate * 100:.0f}%, throttle {throttled}")
+            self.resize(target)
+        return entry
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chạy Image Crawler ở chế độ dòng lệnh (không cần Tkinter / màn hình) để dùng trên
+server Linux hoặc cron
+
+Ví dụ:
+    python crawler_cli.py "Link cào.xlsx" -o ./downloaded_images -t 8 --crawl-mode direct
+    python crawler_cli.py example_links.txt -o ./output --processing normal --resume
+    python crawler_cli.py example_links.txt --compare-browser-profiles 5
+    python crawler_cli.py example_links.txt --benchmark-presets 10
+
+Mã thoát:
+    0 - tất cả entries thành công
+    1 - có entry thất bại
+    2 - input hoặc tham số không hợp lệ
+    130 - bị dừng bằng Ctrl+C
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from crawler_engine import CrawlerEngine, DEFAULT_SETTINGS, InvalidInputError
+from browser_pool import PROFILE_LEAN, PROFILE_DEFAULT, compare_profiles
+from page_readiness import READY_STRATEGIES
+from image_processing import WEBP_PRESETS, benchmark_presets
+
+EXIT_OK = 0
+EXIT_FAILED_ENTRIES = 1
+EXIT_INVALID_INPUT = 2
+EXIT_INTERRUPTED = 130
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+class HeadlessCrawler(CrawlerEngine):
+    """Engine ghi log ra stdout (và file log nếu có) thay cho giao diện"""
+
+    def __init__(self, quiet=False, log_file=None):
+        super().__init__()
+        self.quiet = quiet
+        self.log_file = open(log_file, 'a', encoding='utf-8') if log_file else None
+        self._last_progress = -1
+
+    def log_message(self, message):
+        timestamp = time.strftime("%H:%M:%S")
+        log_entry = f"[{timestamp}] {message}"
+
+        if not self.quiet:
+            print(log_entry, flush=True)
+        if self.log_file:
+            self.log_file.write(log_entry + "\n")
+            self.log_file.flush()
+
+    def update_progress(self, progress):
+        # Chỉ in mỗi 10% để log không bị ngập khi có hàng nghìn entries
+        step = int(progress) // 10
+        if step != self._last_progress:
+            self._last_progress = step
+            self.log_message(f"📈 Tiến độ: {progress:.0f}%")
+
+    def close(self):
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Image Crawler - cào ảnh sản phẩm không cần giao diện"
+    )
+    parser.add_argument('input', help="File Excel (cột A: mã sản phẩm, cột B: link) hoặc file text mỗi dòng một link")
+    parser.add_argument('-o', '--output', default=DEFAULT_SETTINGS['save_path'], help="Thư mục lưu ảnh và báo cáo")
+    parser.add_argument('-t', '--threads', type=int, default=int(DEFAULT_SETTINGS['thread_count']),
+                        help="Số luồng download (1-256)")
+    parser.add_argument('--crawl-mode', choices=['direct', 'webpage', 'async'], default=DEFAULT_SETTINGS['crawl_mode'],
+                        help="direct: link ảnh trực tiếp, webpage: crawl từ trang web, async: link ảnh trực tiếp (asyncio)")
+    parser.add_argument('--processing', choices=['product', 'normal'], default=DEFAULT_SETTINGS['image_processing'],
+                        help="product: ảnh sản phẩm nền trắng, normal: ảnh thường")
+    parser.add_argument('--max-side', default=DEFAULT_SETTINGS['max_output_side'],
+                        help="Thu nhỏ ảnh output để cạnh dài nhất không vượt số px này (0 = giữ nguyên kích thước)")
+    parser.add_argument('--variants', default=DEFAULT_SETTINGS['size_variants'],
+                        help="Biến thể kích thước tạo thêm từ cùng một lần decode, dạng \"thumb:300,zoom:2000\" (file MÃ_thumb.webp...)")
+    parser.add_argument('--webp-preset', choices=list(WEBP_PRESETS), default=DEFAULT_SETTINGS['webp_preset'],
+                        help="fast: encode nhanh nhất, balanced: như cũ (quality 85), smallest: file nhỏ nhất, lossless: không mất dữ liệu")
+    parser.add_argument('--no-passthrough', action='store_true',
+                        help="Luôn encode lại kể cả khi ảnh gốc đã là WebP không trong suốt và không vượt cạnh tối đa")
+    parser.add_argument('--benchmark-presets', type=int, metavar='N',
+                        help="Chỉ tải N ảnh đầu tiên, đo thời gian encode và dung lượng của từng preset WebP rồi thoát (không crawl)")
+    parser.add_argument('--resume', action='store_true', help="Bỏ qua các entries đã thành công trong journal của lần chạy trước")
+
+    tuning = parser.add_argument_group("tinh chỉnh kết nối")
+    tuning.add_argument('--adaptive', action='store_true',
+                        help="Tự điều chỉnh số luồng theo latency và tỷ lệ 429/5xx, bắt đầu từ --threads")
+    tuning.add_argument('--adaptive-max-threads', default=DEFAULT_SETTINGS['adaptive_max_threads'],
+                        help="Số luồng tối đa khi tự điều chỉnh")
+    tuning.add_argument('--browsers', default=DEFAULT_SETTINGS['browser_count'],
+                        help="Số trình duyệt headless mở trang song song (tách riêng với --threads)")
+    tuning.add_argument('--browser-max-pages', default=DEFAULT_SETTINGS['browser_max_pages'],
+                        help="Khởi động lại trình duyệt sau số trang này (0 = không giới hạn)")
+    tuning.add_argument('--browser-profile', choices=[PROFILE_LEAN, PROFILE_DEFAULT], default=DEFAULT_SETTINGS['browser_profile'],
+                        help="lean: page load eager, chặn video/font/tracking (và ảnh nếu --page-wait khác img và --no-probe), tắt extension/GPU; default: tải đầy đủ trang")
+    tuning.add_argument('--compare-browser-profiles', type=int, metavar='N',
+                        help="Chỉ đo thời gian tải N trang đầu tiên với profile default và lean rồi thoát (không crawl)")
+    tuning.add_argument('--page-wait', choices=READY_STRATEGIES, default=DEFAULT_SETTINGS['page_wait'],
+                        help="Cách chờ trang sẵn sàng: scroll (cuộn để kích hoạt lazy-load), network_idle, img (chờ thẻ <img> đầu tiên)")
+    tuning.add_argument('--page-wait-seconds', default=DEFAULT_SETTINGS['page_wait_seconds'],
+                        help="Thời gian chờ trang sẵn sàng tối đa (giây)")
+    tuning.add_argument('--discovery-cache-hours', default=DEFAULT_SETTINGS['discovery_cache_hours'],
+                        help="Dùng lại link ảnh đã tìm trên trang web trong số giờ này, không tải lại trang (0 = tắt)")
+    tuning.add_argument('--no-revalidate', action='store_true',
+                        help="Không hỏi lại server (ETag / Last-Modified) khi cache trang hết hạn")
+    tuning.add_argument('--images-per-product', default=DEFAULT_SETTINGS['images_per_product'],
+                        help="Số ảnh xếp hạng cao nhất download cho mỗi trang sản phẩm (ảnh 2, 3... có hậu tố -2, -3)")
+    tuning.add_argument('--no-probe', action='store_true',
+                        help="Không đọc kích thước ảnh chưa biết bằng request Range khi xếp hạng ảnh")
+    tuning.add_argument('--no-link-probe', action='store_true',
+                        help="Phân loại link ảnh / trang web theo đuôi file thay vì hỏi Content-Type bằng HEAD")
+    tuning.add_argument('--image-workers', default=DEFAULT_SETTINGS['image_workers'],
+                        help="Số process decode / chèn nền trắng / encode WebP, tách khỏi luồng download (0 = số CPU)")
+    tuning.add_argument('--site-rules', default=DEFAULT_SETTINGS['site_rules_path'],
+                        help="File JSON rule theo site khi tìm ảnh trên trang web (HTML tĩnh / trình duyệt)")
+    tuning.add_argument('--pool-size', default=DEFAULT_SETTINGS['pool_size'], help="Số kết nối keep-alive mỗi host")
+    tuning.add_argument('--async-concurrency', default=DEFAULT_SETTINGS['async_concurrency'],
+                        help="Số request đồng thời tối đa ở chế độ async")
+    tuning.add_argument('--max-per-host', default=DEFAULT_SETTINGS['max_per_host'], help="Số request đồng thời mỗi host (0 = không giới hạn)")
+    tuning.add_argument('--host-delay-ms', default=DEFAULT_SETTINGS['host_delay_ms'], help="Delay tối thiểu giữa 2 request cùng host (ms)")
+    tuning.add_argument('--max-attempts', default=DEFAULT_SETTINGS['max_attempts'], help="Số lần thử tối đa mỗi ảnh")
+    tuning.add_argument('--breaker-threshold', default=DEFAULT_SETTINGS['breaker_threshold'],
+                        help="Số lỗi liên tiếp để tạm ngắt host (0 = tắt)")
+    tuning.add_argument('--cache-mb', default=DEFAULT_SETTINGS['cache_size_mb'], help="Dung lượng cache HTTP (0 = tắt)")
+    tuning.add_argument('--max-image-mb', default=DEFAULT_SETTINGS['max_image_mb'], help="Dung lượng ảnh tối đa (0 = không giới hạn)")
+
+    output = parser.add_argument_group("output")
+    output.add_argument('--no-package', action='store_true', help="Không tạo output package (ảnh + báo cáo) sau khi crawl")
+    output.add_argument('--log-file', help="Ghi log ra file")
+    output.add_argument('-q', '--quiet', action='store_true', help="Không in log ra màn hình, chỉ in tổng kết")
+    return parser
+
+
+def load_entries(crawler, input_path):
+    """
+    Đọc entries từ file Excel hoặc file danh sách link
+
+    Args:
+        crawler (CrawlerEngine): Engine dùng để đọc input
+        input_path (str): Đường dẫn file input
+
+    Returns:
+        list: Danh sách entries {'code', 'link', 'row'}
+
+    Raises:
+        InvalidInputError: File không tồn tại hoặc không đúng cấu trúc
+    """
+    if not os.path.isfile(input_path):
+        raise InvalidInputError(f"Không tìm thấy file input: {input_path}")
+
+    if input_path.lower().endswith(EXCEL_EXTENSIONS):
+        _, entries, _ = crawler.load_excel_entries(input_path)
+        return entries
+
+    with open(input_path, 'r', encoding='utf-8-sig') as f:
+        return crawler.parse_link_list(f.read())
+
+
+def apply_settings(crawler, args):
+    """Chép tham số dòng lệnh vào các biến cấu hình của engine"""
+    crawler.thread_count.set(str(args.threads))
+    crawler.save_path.set(args.output)
+    crawler.crawl_mode.set(args.crawl_mode)
+    crawler.image_processing.set(args.processing)
+    crawler.resume_run.set(args.resume)
+    crawler.pool_size.set(args.pool_size)
+    crawler.async_concurrency.set(args.async_concurrency)
+    crawler.max_per_host.set(args.max_per_host)
+    crawler.host_delay_ms.set(args.host_delay_ms)
+    crawler.max_attempts.set(args.max_attempts)
+    crawler.breaker_threshold.set(args.breaker_threshold)
+    crawler.cache_size_mb.set(args.cache_mb)
+    crawler.max_image_mb.set(args.max_image_mb)
+    crawler.adaptive_concurrency.set(args.adaptive)
+    crawler.adaptive_max_threads.set(args.adaptive_max_threads)
+    crawler.browser_count.set(args.browsers)
+    crawler.browser_max_pages.set(args.browser_max_pages)
+    crawler.site_rules_path.set(args.site_rules)
+    crawler.browser_profile.set(args.browser_profile)
+    crawler.page_wait.set(args.page_wait)
+    crawler.page_wait_seconds.set(args.page_wait_seconds)
+    crawler.discovery_cache_hours.set(args.discovery_cache_hours)
+    crawler.discovery_revalidate.set(not args.no_revalidate)
+    crawler.images_per_product.set(args.images_per_product)
+    crawler.rank_probe.set(not args.no_probe)
+    crawler.probe_link_type.set(not args.no_link_probe)
+    crawler.image_workers.set(args.image_workers)
+    crawler.max_output_side.set(args.max_side)
+    crawler.size_variants.set(args.variants)
+    crawler.webp_preset.set(args.webp_preset)
+    crawler.webp_passthrough.set(not args.no_passthrough)
+
+
+def run_profile_comparison(crawler, entries, count):
+    """
+    Đo thời gian tải trang của profile trình duyệt default và lean, in chênh lệch từng trang
+    
+    Args:
+        crawler (HeadlessCrawler): Engine dùng để ghi log
+        entries (list): Danh sách entries (lấy link trang web)
+        count (int): Số trang đầu tiên cần đo
+    
+    Returns:
+        int: Mã thoát
+    """
+    urls = [entry['link'] for entry in entries if entry['link'].startswith(('http://', 'https://'))][:max(1, count)]
+    crawler.log_message(f"⏱️ So sánh profile trình duyệt trên {len(urls)} trang...")
+    block_images = crawler.lean_blocks_images()
+    crawler.log_message("ℹ️ Profile lean chặn font/video/tracking" + (" và ảnh" if block_images else
+                        " (ảnh vẫn tải vì --page-wait img hoặc đọc kích thước ảnh đang bật)"))
+    timings = compare_profiles(urls, block_images=block_images, log=crawler.log_message)
+    
+    for timing in timings:
+        if timing['saved'] is None:
+            print(f"  {timing['url']}: không đo được")
+        else:
+            print(f"  {timing['url']}: default {timing[PROFILE_DEFAULT]:.2f}s | lean {timing[PROFILE_LEAN]:.2f}s "
+                  f"| tiết kiệm {timing['saved']:.2f}s")
+    
+    measured = [timing for timing in timings if timing['saved'] is not None]
+    if not measured:
+        print("❌ Không đo được trang nào", file=sys.stderr)
+        return EXIT_FAILED_ENTRIES
+    
+    avg_default = sum(t[PROFILE_DEFAULT] for t in measured) / len(measured)
+    avg_lean = sum(t[PROFILE_LEAN] for t in measured) / len(measured)
+    saved_percent = (avg_default - avg_lean) / avg_default * 100 if avg_default else 0.0
+    print(f"🎯 Trung bình mỗi trang: default {avg_default:.2f}s | lean {avg_lean:.2f}s "
+          f"| tiết kiệm {avg_default - avg_lean:.2f}s ({saved_percent:.0f}%)")
+    return EXIT_OK
+
+
+def run_preset_benchmark(crawler, entries, count):
+    """
+    Đo thời gian encode và dung lượng output của từng preset WebP trên các ảnh đầu tiên của input
+
+    Args:
+        crawler (HeadlessCrawler): Engine cung cấp HTTP session, cấu hình xử lý ảnh và log
+        entries (list): Danh sách entries (lấy link ảnh trực tiếp)
+        count (int): Số ảnh mẫu cần đo
+
+    Returns:
+        int: Mã thoát
+    """
+    session = crawler.get_http_session()
+    samples = []
+    for entry in entries:
+        if len(samples) >= max(1, count):
+            break
+        try:
+            response = session.get(entry['link'], timeout=30)
+            response.raise_for_status()
+        except Exception as e:
+            crawler.log_message(f"⚠️ Không tải được {entry['link']}: {str(e)}")
+            continue
+        if (response.headers.get('Content-Type') or '').lower().startswith('image/'):
+            samples.append(response.content)
+
+    crawler.log_message(f"⏱️ Đo preset WebP trên {len(samples)} ảnh...")
+    results = benchmark_presets(samples, crawler.image_processing.get(), crawler.get_max_output_side())
+    if not results or not results[0]['images']:
+        print("❌ Không có ảnh nào decode được", file=sys.stderr)
+        return EXIT_FAILED_ENTRIES
+
+    for result in results:
+        ratio = result['bytes'] / result['source_bytes'] * 100 if result['source_bytes'] else 0.0
+        print(f"  {result['preset']:<9}: encode TB {result['encode_time'] / result['images']:.3f}s/ảnh "
+              f"| tổng {result['bytes'] / 1024:.1f}KB ({ratio:.0f}% ảnh gốc)")
+    return EXIT_OK
+
+
+def run(args):
+    crawler = HeadlessCrawler(quiet=args.quiet, log_file=args.log_file)
+    try:
+        try:
+            entries = load_entries(crawler, args.input)
+        except InvalidInputError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return EXIT_INVALID_INPUT
+        except Exception as e:
+            print(f"❌ Không thể đọc file input: {e}", file=sys.stderr)
+            return EXIT_INVALID_INPUT
+
+        if not entries:
+            print("❌ Không có entry hợp lệ nào!", file=sys.stderr)
+            return EXIT_INVALID_INPUT
+
+        apply_settings(crawler, args)
+        
+        if args.compare_browser_profiles:
+            return run_profile_comparison(crawler, entries, args.compare_browser_profiles)
+        if args.benchmark_presets:
+            return run_preset_benchmark(crawler, entries, args.benchmark_presets)
+
+        interrupted = False
+        try:
+            crawler.run(entries, args.output)
+        except KeyboardInterrupt:
+            interrupted = True
+            crawler.stop_crawling()
+            if crawler.http_cache:
+                crawler.http_cache.save()
+            crawler.finish_run()
+
+        package_info = None
+        if not args.no_package and crawler.results:
+            package_info = crawler.create_output_package(args.output)
+
+        total = len(crawler.results)
+        success = len([r for r in crawler.results if r['status'] == 'success'])
+        print(f"🎯 Tổng entries: {total} | Thành công: {success} | Thất bại: {total - success}")
+        if package_info:
+            print(f"📁 Output package: {package_info['package_dir']}")
+
+        if interrupted:
+            return EXIT_INTERRUPTED
+        if total == 0 or success < total or crawler.failed_count:
+            return EXIT_FAILED_ENTRIES
+        return EXIT_OK
+    finally:
+        crawler.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
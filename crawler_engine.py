@@ -0,0 +1,2119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module engine crawl ảnh không phụ thuộc Tkinter: đọc input, download, xử lý ảnh và
+tạo báo cáo. Dùng chung cho giao diện (main.py) và chế độ dòng lệnh (crawler_cli.py)
+"""
+
+import threading
+import queue
+import os
+import pandas as pd
+import requests
+import time
+from urllib.parse import urlparse
+import re
+import json
+from datetime import datetime
+import shutil
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from http_session_pool import HttpSessionPool
+from async_downloader import AsyncImageDownloader
+from host_scheduler import HostScheduler, get_host
+from retry_policy import RetryPolicy, CircuitBreaker, CircuitOpenError, parse_retry_after
+from http_cache import ImageHttpCache
+from discovery_cache import DiscoveryCache
+from url_dedup import UrlDeduplicator
+from stream_download import DownloadRejected, read_image_stream, discard_response
+from progress_journal import ProgressJournal, JOURNAL_FILENAME, entry_key, latest_results, completed_results
+from browser_pool import ChromeDriverPool, PROFILE_LEAN, measure_eager_saving
+from static_extractor import (extract_image_candidates, extract_dom_image_candidates, fetch_page_html, read_page_html,
+                              page_validators, DOM_IMAGE_SCRIPT, LAZY_SRC_ATTRS)
+from image_ranking import rank_candidates, merge_candidates, probe_image_size
+from link_router import LinkRouter, ROUTE_IMAGE, ROUTE_PAGE
+from image_processing import ImageProcessingStage, parse_size_variants, WEBP_PRESETS, PRESET_BALANCED
+from site_rules import SiteRules, DEFAULT_RULES_FILE, MODE_BROWSER, MODE_STATIC
+from page_readiness import (READY_IMG, READY_NETWORK_IDLE, READY_SCROLL, READY_STRATEGIES, wait_for_img,
+                            wait_for_selector, wait_for_network_idle, scroll_for_lazy_images)
+from concurrency_controller import AdaptiveConcurrencyController, OUTCOME_OK, OUTCOME_THROTTLED, OUTCOME_ERROR
+
+# Giá trị mặc định của các cấu hình (GUI tạo tk.StringVar cùng tên từ các giá trị này)
+DEFAULT_SETTINGS = {
+    'thread_count': "5",
+    'save_path': "./downloaded_images",
+    'image_processing': "product",
+    'crawl_mode': "direct",
+    'pool_size': "10",
+    'async_concurrency': "100",
+    'max_per_host': "4",
+    'host_delay_ms': "0",
+    'max_attempts': "3",
+    'breaker_threshold': "5",
+    'cache_size_mb': "500",
+    'max_image_mb': "50",
+    'resume_run': False,
+    'adaptive_concurrency': False,
+    'adaptive_max_threads': "32",
+    'browser_count': "2",
+    'browser_max_pages': "50",
+    'browser_profile': PROFILE_LEAN,
+    'page_wait': READY_SCROLL,
+    'page_wait_seconds': "10",
+    'discovery_cache_hours': "24",
+    'discovery_revalidate': True,
+    'images_per_product': "1",
+    'rank_probe': True,
+    'probe_link_type': True,
+    'image_workers': "0",
+    'max_output_side': "0",
+    'size_variants': "",
+    'webp_preset': PRESET_BALANCED,
+    'webp_passthrough': True,
+    'site_rules_path': DEFAULT_RULES_FILE,
+}
+
+# Cách tìm ra ảnh của từng dòng (cột "Nguồn Ảnh" trong báo cáo)
+DISCOVERY_DIRECT = 'direct'
+DISCOVERY_STATIC = 'static'
+DISCOVERY_BROWSER = 'browser'
+DISCOVERY_BROWSER_RULE = 'browser_rule'
+DISCOVERY_CACHE = 'cache'
+DISCOVERY_LABELS = {
+    DISCOVERY_DIRECT: 'Link ảnh trực tiếp',
+    DISCOVERY_STATIC: 'HTML tĩnh',
+    DISCOVERY_BROWSER: 'Trình duyệt (HTML tĩnh không có ảnh)',
+    DISCOVERY_BROWSER_RULE: 'Trình duyệt (theo site rule)',
+    DISCOVERY_CACHE: 'Cache trang (không tải lại trang)',
+}
+
+
+class InvalidInputError(Exception):
+    """File input (Excel / danh sách link) không đúng cấu trúc"""
+
+
+class SettingValue:
+    """Giá trị cấu hình có get()/set() giống tk.StringVar để engine chạy được khi không có Tkinter"""
+
+    def __init__(self, value=""):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+class ImageNamingProcessor:
+    """Class xử lý đặt tên file ảnh theo logic từ JavaScript"""
+    
+    def __init__(self):
+        self.domain = "https://example.com/product/"
+        self.image_base = "https://cdn.example.com/images/"
+    
+    def standardize(self, text):
+        """Chuẩn hóa chuỗi theo logic từ JavaScript"""
+        if not text:
+            return ""
+        
+        # Thay ký tự không hợp lệ bằng '-'
+        standardized = re.sub(r'[\\/:*?"<>|,=\s]', '-', text)
+        
+        # Loại bỏ gạch ngang trùng
+        standardized = re.sub(r'-+', '-', standardized)
+        
+        # Chỉ giữ lại a-z, A-Z, 0-9, -, _
+        standardized = re.sub(r'[^a-zA-Z0-9\-_]', '', standardized)
+        
+        # Loại bỏ gạch đầu/cuối
+        standardized = re.sub(r'^-+|-+$', '', standardized)
+        
+        return standardized
+    
+    def process_product_code(self, code):
+        """Xử lý mã sản phẩm để tạo slug và image name"""
+        if not code:
+            return "", "", False
+        
+        # Kiểm tra có add-on kit không
+        had_addon_kit = bool(re.search(r'add[\s\-]*on[\s\-]*kit', code, re.IGNORECASE))
+        
+        # Làm sạch chuỗi, loại bỏ ghi chú coating, addon...
+        clean_code = code
+        clean_code = re.sub(r'\(with special coating\)', '', clean_code, flags=re.IGNORECASE)
+        clean_code = re.sub(r'\[with special coating\]', '', clean_code, flags=re.IGNORECASE)
+        clean_code = re.sub(r'add[\s\-]*on[\s\-]*kit', '', clean_code, flags=re.IGNORECASE)
+        clean_code = clean_code.strip()
+        
+        # Tạo slug (lowercase) và image name (uppercase)
+        slug = self.standardize(clean_code.lower())
+        if had_addon_kit:
+            slug += "-adk"
+        
+        image_name = self.standardize(clean_code.upper())
+        
+        return slug, image_name, had_addon_kit
+    
+    def generate_filename(self, code):
+        """Tạo tên file ảnh theo logic JavaScript"""
+        slug, image_name, had_addon = self.process_product_code(code)
+        return image_name + ".webp" if image_name else "unknown.webp"
+
+
+class CrawlerEngine:
+    """Pipeline crawl ảnh: queue + worker threads, download, xử lý ảnh, journal và báo cáo"""
+    
+    def __init__(self):
+        # Khởi tạo queue cho đa luồng (phân phối task xen kẽ theo host)
+        self.download_queue = HostScheduler()
+        self.worker_threads = []  # (thread, stop_event) của từng worker
+        self.worker_lock = threading.Lock()
+        self.max_workers = 5
+        self.max_worker_limit = 256
+        self.is_crawling = False
+        
+        # Pool HTTP session keep-alive cho các worker (tạo lại mỗi lần crawl)
+        self.session_pool = None
+        
+        # Retry/backoff và circuit breaker theo host (tạo lại mỗi lần crawl)
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = CircuitBreaker()
+        
+        # Cache HTTP trên đĩa (ETag / Last-Modified) trong thư mục lưu
+        self.http_cache = None
+        self.discovery_cache = None
+        self.link_router = None
+        
+        # Chống download trùng URL giữa các dòng Excel (reset mỗi lần crawl)
+        self.url_dedup = UrlDeduplicator()
+        
+        # Giới hạn dung lượng ảnh và thống kê download bị dừng sớm
+        self.max_download_bytes = 50 * 1024 * 1024
+        self.stats_lock = threading.Lock()
+        self.stream_stats = {'aborted': 0, 'bytes_saved': 0}
+        self.download_stats = {'downloads': 0, 'busy': 0.0}
+        
+        # Stage xử lý ảnh (decode / nền trắng / encode WebP) - process pool tạo mỗi lần crawl
+        self.image_stage = ImageProcessingStage(log=self.log_message)
+        self.output_variants = []
+        
+        # Journal tiến trình append-only trong thư mục lưu (mở khi bắt đầu crawl)
+        self.journal = None
+        
+        # Bộ tự điều chỉnh số luồng (chỉ tạo khi bật chế độ thích ứng)
+        self.concurrency_controller = None
+        
+        # Pool trình duyệt headless cho link trang web (tạo khi cần, đóng khi dừng / xong)
+        self.browser_pool = None
+        self.browser_pool_lock = threading.Lock()
+        
+        # Rule theo site khi tìm ảnh trên trang web (đọc lại mỗi lần crawl)
+        self.site_rules = SiteRules()
+        
+        # Thời gian từng bước khi tìm ảnh trên mỗi trang (sheet "Thời Gian Trang" trong báo cáo)
+        self.page_timings = []
+        self.ranking_stats = {'candidates': 0, 'selected': 0, 'probes': 0}
+        
+        # Cấu hình crawl (GUI thay bằng tk.StringVar cùng tên)
+        for name, value in DEFAULT_SETTINGS.items():
+            setattr(self, name, SettingValue(value))
+        
+        # Dữ liệu Excel để mapping mã sản phẩm
+        self.excel_data = None
+        self.product_codes = []  # List of all entries from Excel - no duplicate filtering
+        
+        # Result tracking system cho Excel reporting
+        self.results = []  # Detailed results for each entry
+        self.start_time = None
+        self.output_dir = None
+        self.total_links = 0
+        self.processed_count = 0
+        self.success_count = 0
+        self.failed_count = 0
+        
+        # Khởi tạo image naming processor
+        self.naming_processor = ImageNamingProcessor()
+    
+    def log_message(self, message):
+        timestamp = time.strftime("%H:%M:%S")
+        print(f"[{timestamp}] {message}", flush=True)
+    
+    def update_stats(self):
+        """Hook cập nhật thống kê (GUI override để hiển thị lên label)"""
+        pass
+    
+    def update_progress(self, progress):
+        """Hook cập nhật tiến độ (GUI override để cập nhật progress bar)"""
+        pass
+    
+    def on_crawl_finished(self):
+        """Hook được gọi từ crawl thread khi crawl xong (GUI override để chuyển về main loop)"""
+        self.finish_run()
+    
+    def load_excel_entries(self, filename):
+        """
+        Đọc file Excel thành danh sách entries (cột A: mã sản phẩm, cột B: link)
+        
+        Args:
+            filename (str): Đường dẫn file Excel
+            
+        Returns:
+            tuple: (DataFrame, danh sách entries {'code', 'link', 'row'}, số dòng bị bỏ qua)
+            
+        Raises:
+            InvalidInputError: File Excel có ít hơn 2 cột
+        """
+        # Đọc file Excel với nhiều cách khác nhau để đảm bảo nhận đầy đủ dữ liệu
+        try:
+            # Thử đọc bình thường trước
+            df = pd.read_excel(filename)
+            self.log_message(f"Đọc bình thường: {len(df)} dòng")
+        except:
+            df = pd.read_excel(filename, header=None)
+            self.log_message(f"Đọc không header: {len(df)} dòng")
+        
+        # Thử đọc với header=None để so sánh
+        try:
+            df_no_header = pd.read_excel(filename, header=None)
+            if len(df_no_header) > len(df):
+                df = df_no_header
+                self.log_message(f"Chuyển sang đọc không header: {len(df)} dòng")
+        except:
+            pass
+        
+        # Lưu dữ liệu để debug
+        self.last_excel_data = df
+        
+        # Hiển thị thông tin file
+        self.log_message(f"📊 Thông tin file Excel: {filename}")
+        self.log_message(f"📋 Tổng số cột: {len(df.columns)}")
+        self.log_message(f"📝 Tổng số dòng: {len(df)}")
+        
+        # Kiểm tra cấu trúc file
+        if len(df.columns) < 2:
+            raise InvalidInputError("File Excel phải có ít nhất 2 cột:\nCột A: Mã sản phẩm\nCột B: Link ảnh")
+        
+        # Lấy cột A (mã sản phẩm) và cột B (link)
+        product_codes = df.iloc[:, 0].tolist()
+        links = df.iloc[:, 1].tolist()
+        
+        # Hiển thị dữ liệu gốc
+        self.log_message(f"📋 Dữ liệu gốc từ Excel:")
+        for i, (code, link) in enumerate(zip(product_codes, links)):
+            self.log_message(f"   Dòng {i+1}: Mã='{code}' | Link='{link}'")
+        
+        # Tạo list entries (LOGIC ĐƠN GIẢN - KHÔNG PHÂN BIỆT DUPLICATE)
+        entries = []
+        skipped_count = 0
+        
+        self.log_message(f"🔧 BẮT ĐẦU XỬ LÝ {len(product_codes)} DÒNG DỮ LIỆU")
+        
+        for i, (code, link) in enumerate(zip(product_codes, links)):
+            # Kiểm tra và xử lý dữ liệu
+            code_str = str(code).strip() if pd.notna(code) else ""
+            link_str = str(link).strip() if pd.notna(link) else ""
+            
+            # Debug chi tiết từng dòng
+            self.log_message(f"🔍 Dòng {i+1}: Mã='{code_str}' | Link='{link_str}'")
+            
+            # LOGIC ĐƠN GIẢN: Chỉ bỏ qua dòng hoàn toàn trống
+            if not code_str and not link_str:
+                self.log_message(f"⚠️ Bỏ qua dòng {i+1}: Dòng trống hoàn toàn")
+                skipped_count += 1
+                continue
+            
+            # Nếu có link nhưng không có mã, tự tạo mã
+            if link_str and not code_str:
+                code_str = f"PRODUCT_{i+1:03d}"
+                self.log_message(f"⚠️ Dòng {i+1}: Tự tạo mã '{code_str}' cho link")
+            
+            # Nếu có mã nhưng không có link, tự tạo link
+            if code_str and not link_str:
+                link_str = f"https://example.com/product/{code_str}"
+                self.log_message(f"⚠️ Dòng {i+1}: Tự tạo link cho mã '{code_str}'")
+            
+            # THÊM TẤT CẢ ENTRIES VÀO LIST (KHÔNG PHÂN BIỆT DUPLICATE)
+            if link_str and code_str:
+                # Tạo entry object đơn giản
+                entry = {
+                    'code': code_str,
+                    'link': link_str,
+                    'row': i + 1
+                }
+                
+                # Thêm vào list - không kiểm tra duplicate
+                entries.append(entry)
+                self.log_message(f"✅ Dòng {i+1}: Mã='{code_str}' | Link='{link_str}' | Entry #{len(entries)}")
+            else:
+                self.log_message(f"⚠️ Dòng {i+1}: Thiếu thông tin")
+                skipped_count += 1
+        
+        # Hiển thị kết quả
+        self.log_message(f"📊 Kết quả xử lý Excel:")
+        self.log_message(f"   ✅ Tổng entries: {len(entries)}")
+        self.log_message(f"   ⚠️ Bỏ qua: {skipped_count} dòng")
+        self.log_message(f"   📋 Tổng cộng: {len(df)} dòng")
+        
+        return df, entries, skipped_count
+    
+    def parse_link_list(self, text):
+        """Chuyển danh sách link (mỗi dòng một link, bỏ qua dòng bắt đầu bằng '#') thành entries"""
+        links = [link.strip() for link in text.split('\n') if link.strip() and not link.startswith('#')]
+        return [{'code': f'manual_{i+1}', 'link': link, 'row': i+1} for i, link in enumerate(links)]
+    
+    def prepare_run(self, entries, save_dir):
+        """
+        Chuẩn bị một lần crawl: lọc entries đã xong (resume), reset thống kê,
+        tạo session pool, retry/breaker, cache, journal cho lần chạy mới
+        
+        Args:
+            entries (list): Danh sách entries {'code', 'link', 'row'}
+            save_dir (str): Thư mục lưu ảnh
+            
+        Returns:
+            list: Các entries cần crawl trong lần chạy này
+        """
+        # Tạo thư mục lưu
+        os.makedirs(save_dir, exist_ok=True)
+        
+        # Resume: bỏ qua các entries đã thành công trong journal của lần chạy trước
+        resumed_results = []
+        resumed_entries = 0
+        if self.resume_run.get():
+            completed = completed_results(os.path.join(save_dir, JOURNAL_FILENAME))
+            remaining = []
+            for entry in entries:
+                previous = completed.get(entry_key(entry['code'], entry['row']))
+                if previous:
+                    resumed_results.extend(previous)
+                else:
+                    remaining.append(entry)
+            resumed_entries = len(entries) - len(remaining)
+            self.log_message(f"⏩ Resume: bỏ qua {resumed_entries} entries đã hoàn thành "
+                             f"({len(resumed_results)} ảnh), còn {len(remaining)} entries")
+            entries = remaining
+        
+        self.is_crawling = True
+        
+        # Reset stats và khởi tạo tracking
+        self.total_links = len(entries)
+        self.processed_count = 0
+        self.success_count = len(resumed_results)
+        self.failed_count = 0
+        self.results = list(resumed_results)  # Reset results tracking (giữ kết quả đã resume)
+        self.start_time = time.time()  # Set start time for reporting
+        self.output_dir = save_dir  # Store output directory
+        
+        # Số worker theo cấu hình "Số luồng xử lý"
+        self.resize_workers(self.get_int_setting(self.thread_count, 5, 1, self.max_worker_limit))
+        
+        # Tạo pool session mới cho lần crawl này (thống kê kết nối tính riêng từng lần)
+        if self.session_pool:
+            self.session_pool.close()
+        self.session_pool = HttpSessionPool(pool_maxsize=self.get_int_setting(self.pool_size, 10, 1, 50))
+        
+        # Cấu hình giới hạn theo host cho scheduler
+        self.download_queue.configure(
+            max_per_host=self.get_int_setting(self.max_per_host, 4, 0, 100),
+            min_delay=self.get_int_setting(self.host_delay_ms, 0, 0, 10000) / 1000.0
+        )
+        self.download_queue.reset_stats()
+        
+        # Retry policy và circuit breaker cho lần crawl này
+        self.retry_policy = RetryPolicy(max_attempts=self.get_int_setting(self.max_attempts, 3, 1, 10))
+        self.circuit_breaker = CircuitBreaker(failure_threshold=self.get_int_setting(self.breaker_threshold, 5, 0, 100))
+        
+        # Cache HTTP trong thư mục lưu (0 MB = tắt cache)
+        cache_mb = self.get_int_setting(self.cache_size_mb, 500, 0, 100000)
+        self.http_cache = ImageHttpCache(os.path.join(save_dir, ".http_cache"), cache_mb * 1024 * 1024) if cache_mb else None
+        
+        # Cache link trang -> link ảnh của các lần chạy trước (0 giờ = tắt)
+        cache_hours = self.get_int_setting(self.discovery_cache_hours, 24, 0, 24 * 365)
+        self.discovery_cache = DiscoveryCache(save_dir, cache_hours * 3600, log=self.log_message) if cache_hours else None
+        
+        self.url_dedup = UrlDeduplicator()
+        
+        # Phân loại link ảnh / trang web theo Content-Type thật (tắt = đoán theo đuôi file như trước)
+        self.link_router = LinkRouter(self.get_http_session, self.is_valid_image_url) if self.probe_link_type.get() else None
+        
+        # Giới hạn dung lượng ảnh (0 = không giới hạn)
+        self.max_download_bytes = self.get_int_setting(self.max_image_mb, 50, 0, 2000) * 1024 * 1024
+        self.stream_stats = {'aborted': 0, 'bytes_saved': 0}
+        self.download_stats = {'downloads': 0, 'busy': 0.0}
+        
+        # Process pool xử lý ảnh riêng để Pillow không tranh GIL với luồng download (0 = số CPU)
+        self.image_stage.close()
+        image_workers = self.get_int_setting(self.image_workers, 0, 0, 64) or os.cpu_count() or 1
+        self.image_stage = ImageProcessingStage(image_workers, log=self.log_message).start()
+        
+        # Biến thể kích thước (thumbnail, zoom...) tạo cùng ảnh chính từ một lần decode
+        try:
+            self.output_variants = parse_size_variants(self.size_variants.get())
+        except ValueError as e:
+            self.log_message(f"⚠️ Cấu hình biến thể kích thước không hợp lệ, chỉ lưu ảnh chính: {str(e)}")
+            self.output_variants = []
+        
+        # Journal ghi từng kết quả ngay khi có để không mất tiến trình khi app bị tắt
+        if self.journal:
+            self.journal.close()
+        self.journal = ProgressJournal(save_dir, resume=self.resume_run.get())
+        self.journal.start_run(len(entries), resumed_entries)
+        
+        # Rule theo site cho việc tìm ảnh trên trang web
+        try:
+            self.site_rules = SiteRules.load(self.site_rules_path.get())
+        except (OSError, ValueError) as e:
+            self.log_message(f"⚠️ Không đọc được site rules ({self.site_rules_path.get()}): {str(e)}")
+            self.site_rules = SiteRules()
+        
+        self.page_timings = []
+        self.ranking_stats = {'candidates': 0, 'selected': 0, 'probes': 0}
+        
+        # Pool trình duyệt của lần chạy trước đã đóng - tạo lại khi gặp link trang web đầu tiên
+        self.close_browser_pool()
+        self.browser_pool = None
+        
+        # Tự điều chỉnh số luồng theo latency và tỷ lệ 429/5xx (AIMD), bắt đầu từ "Số luồng xử lý"
+        if self.concurrency_controller:
+            self.concurrency_controller.stop()
+        self.concurrency_controller = None
+        if self.adaptive_concurrency.get():
+            self.concurrency_controller = AdaptiveConcurrencyController(
+                resize=self.resize_workers,
+                current=lambda: self.max_workers,
+                backlog=self.download_queue.qsize,
+                max_workers=self.get_int_setting(self.adaptive_max_threads, 32, 1, self.max_worker_limit),
+                log=self.log_message
+            )
+            self.concurrency_controller.start()
+            self.log_message(f"🎚️ Bật tự điều chỉnh số luồng: {self.max_workers} → tối đa {self.concurrency_controller.max_workers}")
+        
+        return entries
+    
+    def run(self, entries, save_dir):
+        """Crawl toàn bộ entries ngay trong thread hiện tại, trả về khi đã download xong"""
+        entries = self.prepare_run(entries, save_dir)
+        self.update_stats()
+        self.log_message(f"Bắt đầu crawl {len(entries)} entries...")
+        self.crawl_entries(entries, save_dir)
+    
+    def finish_run(self):
+        """
+        Kết thúc lần crawl: đóng journal và ghi log tổng kết
+        
+        Returns:
+            str: Thông báo tổng kết
+        """
+        self.is_crawling = False
+        if self.journal:
+            self.journal.close()
+        if self.discovery_cache:
+            self.discovery_cache.save()
+            discovery_stats = self.discovery_cache.get_stats()
+            if discovery_stats['lookups']:
+                self.log_message(f"🗂️ Cache trang: HIT {discovery_stats['hits'] + discovery_stats['revalidated']}/{discovery_stats['lookups']} "
+                                 f"({discovery_stats['hit_rate']:.0f}%) - các trang HIT không phải tải lại")
+        if self.concurrency_controller:
+            self.concurrency_controller.stop()
+        self.close_browser_pool()
+        self.image_stage.close()
+        
+        basic_message = f"Crawl hoàn thành! Đã xử lý {self.processed_count} entries, thành công {self.success_count}, thất bại {self.failed_count}"
+        self.log_message(basic_message)
+        return basic_message
+    
+    def get_int_setting(self, variable, default, minimum, maximum):
+        """Đọc giá trị số nguyên từ biến cấu hình, giới hạn trong [minimum, maximum]"""
+        try:
+            value = int(str(variable.get()).strip())
+        except ValueError:
+            return default
+        return max(minimum, min(maximum, value))
+    
+    def get_http_session(self):
+        """Lấy session keep-alive của worker thread hiện tại"""
+        if self.session_pool is None:
+            self.session_pool = HttpSessionPool()
+        return self.session_pool.get_session()
+    
+    def start_worker_threads(self):
+        self.resize_workers(self.get_int_setting(self.thread_count, 5, 1, self.max_worker_limit))
+    
+    def resize_workers(self, count):
+        """
+        Thay đổi số worker thread, kể cả khi đang crawl
+        
+        Args:
+            count (int): Số worker mong muốn. Khi giảm, worker thừa xử lý xong task
+                hiện tại rồi mới dừng (không bỏ dở ảnh đang tải)
+        """
+        count = max(1, min(self.max_worker_limit, int(count)))
+        with self.worker_lock:
+            # Bỏ các worker đã dừng hẳn khỏi danh sách
+            self.worker_threads = [(worker, stop_event) for worker, stop_event in self.worker_threads
+                                   if worker.is_alive() and not stop_event.is_set()]
+            current = len(self.worker_threads)
+            
+            if count > current:
+                for i in range(count - current):
+                    stop_event = threading.Event()
+                    worker = threading.Thread(target=self.worker_function, args=(stop_event,), daemon=True)
+                    worker.start()
+                    self.worker_threads.append((worker, stop_event))
+            elif count < current:
+                for worker, stop_event in self.worker_threads[count:]:
+                    stop_event.set()
+                self.worker_threads = self.worker_threads[:count]
+            
+            self.max_workers = count
+        
+        if count != current:
+            self.log_message(f"🧵 Số luồng xử lý: {current} → {count}")
+    
+    def worker_function(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                task = self.download_queue.get(timeout=1)
+                if task is None:
+                    break
+                
+                try:
+                    # Task (link, save_dir, product_code[, row_number[, meta]])
+                    link, save_dir, product_code = task[:3]
+                    row_number = task[3] if len(task) > 3 else None
+                    meta = task[4] if len(task) > 4 else None
+                    self.process_single_link(link, save_dir, product_code, row_number, meta)
+                finally:
+                    self.download_queue.task_done()
+                
+            except queue.Empty:
+                continue
+            except Exception as e:
+                self.log_message(f"Lỗi worker thread: {str(e)}")
+        
+        # Worker bị giảm bớt: đóng session keep-alive riêng của thread
+        if self.session_pool:
+            self.session_pool.release_session()
+    
+    def crawl_entries(self, entries, save_dir):
+        try:
+            if self.crawl_mode.get() == "direct":
+                # Chế độ link ảnh trực tiếp
+                self.log_message("Chế độ: Link ảnh trực tiếp")
+                for i, entry in enumerate(entries):
+                    if not self.is_crawling:
+                        break
+                    
+                    try:
+                        link = entry['link']
+                        product_code = entry['code']
+                        row = entry['row']
+                        
+                        self.log_message(f"Đang xử lý entry {i+1}/{len(entries)}: {product_code} -> {link} (row {row})")
+                        
+                        # Thêm vào queue download - XỬ LÝ TỪNG ENTRY
+                        self.download_queue.put((link, save_dir, product_code, row))
+                        self.log_message(f"Entry được thêm vào queue: {product_code} -> {link}")
+                        
+                        # Cập nhật progress
+                        progress = ((i + 1) / len(entries)) * 100
+                        self.update_progress(progress)
+                        
+                    except Exception as e:
+                        self.log_message(f"Lỗi khi xử lý entry {entry}: {str(e)}")
+                        self.failed_count += 1
+                    
+                    self.processed_count += 1
+                    self.update_stats()
+            elif self.crawl_mode.get() == "async":
+                # Chế độ link ảnh trực tiếp trên event loop asyncio
+                self.crawl_entries_async(entries, save_dir)
+            else:
+                # Chế độ crawl từ trang web (nhiều trình duyệt song song)
+                self.crawl_entries_webpage(entries, save_dir)
+            
+            # Chờ tất cả download hoàn thành
+            self.download_queue.join()
+            
+            # Lưu index cache HTTP cho lần chạy sau
+            if self.http_cache:
+                self.http_cache.save()
+            
+            self.on_crawl_finished()
+            
+        except Exception as e:
+            self.log_message(f"Lỗi trong quá trình crawl: {str(e)}")
+            self.on_crawl_finished()
+    
+    def crawl_entries_webpage(self, entries, save_dir):
+        """Tìm ảnh trên các trang web bằng N trình duyệt song song; ảnh của trang nào tìm xong
+        được đưa ngay vào download_queue để worker download trong lúc các trang khác đang tải"""
+        browser_pool = self.get_browser_pool()
+        # Trang HTML tĩnh không cần trình duyệt nên số luồng tìm ảnh có thể nhiều hơn số trình duyệt
+        discovery_count = min(max(browser_pool.max_drivers, self.max_workers), len(entries))
+        self.log_message(f"Chế độ: Crawl từ trang web - {discovery_count} luồng tìm ảnh, tối đa {browser_pool.max_drivers} trình duyệt song song")
+        
+        pending = queue.Queue()
+        for i, entry in enumerate(entries):
+            pending.put((i, entry))
+        discovered = [0]
+        
+        def discovery_worker():
+            while self.is_crawling:
+                try:
+                    i, entry = pending.get_nowait()
+                except queue.Empty:
+                    return
+                
+                self.discover_page(browser_pool, entry, i, len(entries), save_dir)
+                
+                with self.stats_lock:
+                    discovered[0] += 1
+                    self.processed_count += 1
+                    progress = (discovered[0] / len(entries)) * 100
+                self.update_progress(progress)
+                self.update_stats()
+        
+        threads = [threading.Thread(target=discovery_worker, daemon=True) for _ in range(discovery_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    def discover_page(self, browser_pool, entry, index, total, save_dir):
+        """Tìm ảnh của một trang (HTML tĩnh trước, trình duyệt khi cần) và đưa vào download_queue"""
+        link = entry['link']
+        product_code = entry['code']
+        row = entry['row']
+        discovery_path = None
+        
+        try:
+            self.log_message(f"Đang xử lý entry {index+1}/{total}: {product_code} -> {link} (row {row})")
+            
+            # Link trong sheet trang web nhưng thật ra là ảnh - download luôn, không mở trang
+            if self.link_router and self.is_direct_image_link(link):
+                self.download_queue.put((link, save_dir, product_code, row, {'discovery_path': DISCOVERY_DIRECT}))
+                return
+            
+            images, discovery_path = self.discover_images(link, browser_pool)
+            
+            if images:
+                # Chỉ download N ảnh xếp hạng cao nhất (ảnh 2, 3... lưu với hậu tố -2, -3)
+                selected = self.select_images(images)
+                if self.journal:
+                    self.journal.start_entry(product_code, row, len(selected))
+                for rank, img_url in enumerate(selected, 1):
+                    meta = {'discovery_path': discovery_path, 'image_rank': rank}
+                    self.download_queue.put((img_url, save_dir, product_code, row, meta))
+                
+                self.log_message(f"Tìm thấy {len(images)} ảnh từ entry: {product_code}, chọn {len(selected)} ảnh tốt nhất "
+                                 f"({DISCOVERY_LABELS[discovery_path]})")
+                return
+            
+            self.log_message(f"Không tìm thấy ảnh nào từ entry: {product_code}")
+            error_reason = "Không tìm thấy ảnh nào trên trang web"
+            
+        except Exception as e:
+            self.log_message(f"Lỗi khi xử lý entry {entry}: {str(e)}")
+            error_reason = f"Web Crawl Error: {str(e)}"
+        
+        # Ghi kết quả lỗi cho trang không có ảnh để dòng này vẫn có trong báo cáo
+        result_entry = self.create_result_entry(link, product_code, row)
+        result_entry['error_reason'] = error_reason
+        result_entry['discovery_path'] = discovery_path
+        with self.stats_lock:
+            self.failed_count += 1
+        self.record_result(result_entry)
+    
+    def discover_images(self, link, browser_pool=None):
+        """
+        Tìm link ảnh trên trang: đọc HTML tĩnh trước, chỉ mở trình duyệt khi HTML tĩnh
+        không có ảnh dùng được hoặc site rule yêu cầu
+        
+        Args:
+            link (str): URL trang
+            browser_pool (ChromeDriverPool): Pool trình duyệt (mặc định pool của lần chạy)
+            
+        Returns:
+            tuple: (danh sách URL ảnh, cách tìm - DISCOVERY_STATIC / DISCOVERY_BROWSER /
+                    DISCOVERY_BROWSER_RULE / DISCOVERY_CACHE)
+        """
+        rule = self.site_rules.for_url(link)
+        rule_signature = json.dumps(rule, sort_keys=True)
+        started = time.time()
+        timing = {'link': link, 'static': 0.0, 'load': 0.0, 'wait': 0.0, 'extract': 0.0,
+                  'strategy': '', 'scroll_rounds': 0, 'saved': None}
+        
+        # Trang đã tìm ảnh ở lần chạy trước và chưa thay đổi: download luôn, không tải lại trang
+        cached_images, page = self.lookup_discovery_cache(link, rule_signature, read_html=rule['mode'] != MODE_BROWSER)
+        if cached_images:
+            timing['static'] = time.time() - started
+            self.record_page_timing(timing, DISCOVERY_CACHE, cached_images, started)
+            return cached_images, DISCOVERY_CACHE
+        
+        # Trang đã đổi: dùng luôn response 200 của lần kiểm tra lại, không tải trang lần nữa
+        validators = page[2] if page else None
+        if rule['mode'] != MODE_BROWSER:
+            try:
+                html, final_url, validators = page or fetch_page_html(self.get_http_session(), link)
+                candidates = extract_image_candidates(html, final_url, rule['exclude']) if html else []
+                candidates = [c for c in candidates if self.is_valid_image_url(c['url'])]
+            except requests.exceptions.RequestException as e:
+                self.log_message(f"⚠️ Không tải được HTML tĩnh {link}: {str(e)}")
+                candidates = []
+            images = self.rank_images(candidates)
+            timing['static'] = time.time() - started
+            
+            if images or rule['mode'] == MODE_STATIC:
+                self.record_page_timing(timing, DISCOVERY_STATIC, images, started)
+                if self.discovery_cache:
+                    self.discovery_cache.store(link, images, DISCOVERY_STATIC, rule_signature, validators)
+                return images, DISCOVERY_STATIC
+            discovery_path = DISCOVERY_BROWSER
+        else:
+            discovery_path = DISCOVERY_BROWSER_RULE
+        
+        # Trang render bằng JavaScript - dùng trình duyệt mượn từ pool
+        browser_pool = browser_pool or self.get_browser_pool()
+        with browser_pool.driver() as driver:
+            candidates = self.crawl_images_from_link(driver, link, browser_pool, rule, timing)
+        images = self.rank_images(candidates)
+        self.record_page_timing(timing, discovery_path, images, started)
+        
+        if self.discovery_cache and images:
+            if validators is None and self.discovery_revalidate.get():
+                validators = self.fetch_page_validators(link)
+            self.discovery_cache.store(link, images, discovery_path, rule_signature, validators)
+        return images, discovery_path
+    
+    def rank_images(self, candidates):
+        """
+        Xếp hạng ảnh ứng viên (ảnh sản phẩm chính trước), đọc kích thước ảnh chưa biết của nhóm
+        đầu bảng bằng request Range nhỏ nếu bật
+        
+        Args:
+            candidates (list): Các ứng viên (image_ranking.new_candidate)
+            
+        Returns:
+            list: Link ảnh theo thứ hạng
+        """
+        if not candidates:
+            return []
+        
+        probe = None
+        if self.rank_probe.get():
+            probe = lambda url: probe_image_size(self.get_http_session(), url)
+        top_n = self.get_int_setting(self.images_per_product, 1, 1, 50)
+        ranked, probes = rank_candidates(candidates, probe, probe_limit=min(8, top_n + 2))
+        
+        with self.stats_lock:
+            self.ranking_stats['probes'] += probes
+        return [candidate['url'] for candidate in ranked]
+    
+    def select_images(self, images):
+        """Lấy N ảnh xếp hạng cao nhất theo cấu hình số ảnh mỗi sản phẩm"""
+        selected = images[:self.get_int_setting(self.images_per_product, 1, 1, 50)]
+        with self.stats_lock:
+            self.ranking_stats['candidates'] += len(images)
+            self.ranking_stats['selected'] += len(selected)
+        return selected
+    
+    def lookup_discovery_cache(self, link, rule_signature, read_html=True):
+        """
+        Lấy link ảnh đã tìm được ở lần chạy trước: mục còn hạn dùng ngay, mục hết hạn được
+        kiểm tra lại bằng request có điều kiện (304 = trang chưa đổi)
+        
+        Args:
+            link (str): URL trang
+            rule_signature (str): Site rule đang áp dụng
+            read_html (bool): Đọc luôn HTML khi server trả 200 (False = chỉ lấy validators, trang mở bằng trình duyệt)
+            
+        Returns:
+            tuple: (các link ảnh đã cache hoặc None nếu phải tìm lại,
+                    (html, final_url, validators) của response 200 khi kiểm tra lại hoặc None)
+        """
+        if not self.discovery_cache:
+            return None, None
+        
+        entry, fresh = self.discovery_cache.lookup(link, rule_signature)
+        if entry and fresh:
+            self.discovery_cache.record_hit(link)
+            return entry['images'], None
+        
+        page = None
+        headers = DiscoveryCache.conditional_headers(entry) if entry else {}
+        if headers and self.discovery_revalidate.get():
+            try:
+                response = self.get_http_session().get(link, headers=headers, timeout=15, stream=True)
+                if response.status_code == 304:
+                    response.close()
+                    self.discovery_cache.record_hit(link, revalidated=True)
+                    return entry['images'], None
+                if read_html:
+                    page = read_page_html(response)
+                else:
+                    response.close()
+                    if response.ok:
+                        page = (None, response.url, page_validators(response.headers))
+            except requests.exceptions.RequestException:
+                pass
+        
+        self.discovery_cache.record_miss()
+        return None, page
+    
+    def fetch_page_validators(self, link):
+        """Lấy ETag / Last-Modified của trang bằng HEAD (trang mở thẳng bằng trình duyệt chưa có header)"""
+        try:
+            response = self.get_http_session().head(link, timeout=10, allow_redirects=True)
+            return page_validators(response.headers) if response.ok else None
+        except requests.exceptions.RequestException:
+            return None
+    
+    def record_page_timing(self, timing, discovery_path, images, started):
+        """Ghi thời gian các bước tìm ảnh của một trang cho báo cáo"""
+        timing['discovery_path'] = discovery_path
+        timing['images'] = len(images)
+        timing['total'] = time.time() - started
+        with self.stats_lock:
+            self.page_timings.append(timing)
+    
+    def crawl_entries_async(self, entries, save_dir):
+        """Download toàn bộ entries bằng engine asyncio (link trang web vẫn đi qua worker thread)"""
+        if not AsyncImageDownloader.is_available():
+            self.log_message("⚠️ Chưa cài aiohttp - chuyển sang chế độ đa luồng")
+            for entry in entries:
+                if not self.is_crawling:
+                    break
+                self.download_queue.put((entry['link'], save_dir, entry['code'], entry['row']))
+                self.processed_count += 1
+            self.update_stats()
+            return
+        
+        max_in_flight = self.get_int_setting(self.async_concurrency, 100, 1, 1000)
+        self.log_message(f"Chế độ: Link ảnh trực tiếp (asyncio) - tối đa {max_in_flight} request đồng thời")
+        
+        downloader = AsyncImageDownloader(self, max_in_flight=max_in_flight,
+                                          limit_per_host=self.download_queue.max_per_host)
+        downloader.run(entries, save_dir)
+        self.update_stats()
+    
+    def get_browser_pool(self):
+        """Lấy pool trình duyệt của lần chạy hiện tại (tạo khi gặp link trang web đầu tiên)"""
+        with self.browser_pool_lock:
+            if self.browser_pool is None:
+                self.browser_pool = ChromeDriverPool(
+                    max_drivers=self.get_int_setting(self.browser_count, 2, 1, 16),
+                    max_pages=self.get_int_setting(self.browser_max_pages, 50, 0, 10000),
+                    profile=self.browser_profile.get(),
+                    block_images=self.lean_blocks_images(),
+                    log=self.log_message
+                )
+            return self.browser_pool
+    
+    def lean_blocks_images(self):
+        """
+        Profile lean có chặn ảnh không: chỉ khi chờ trang không theo <img> và không đọc kích thước ảnh
+        bằng Range - cả hai cần ảnh tải thật (naturalWidth/naturalHeight), chặn ảnh sẽ làm xếp hạng kém đi
+        """
+        return (self.browser_profile.get() == PROFILE_LEAN and self.page_wait.get() != READY_IMG
+                and not self.rank_probe.get())
+    
+    def close_browser_pool(self):
+        """Đóng toàn bộ trình duyệt (giữ lại object pool để lấy thống kê cho báo cáo)"""
+        with self.browser_pool_lock:
+            browser_pool = self.browser_pool
+        if browser_pool:
+            browser_pool.close_all()
+    
+    def crawl_images_from_link(self, driver, link, browser_pool=None, rule=None, timing=None):
+        """
+        Mở trang bằng trình duyệt, chờ trang sẵn sàng rồi lấy link ảnh trong DOM
+        
+        Args:
+            driver (WebDriver): Driver đã mượn từ pool
+            link (str): URL trang
+            browser_pool (ChromeDriverPool): Pool của driver (để ghi nhận thời gian tải trang)
+            rule (dict): Site rule ('exclude', 'wait', 'wait_selector')
+            timing (dict): Nếu có - ghi thời gian tải / chờ / lấy ảnh (giây) và số lần cuộn vào đây
+            
+        Returns:
+            list: Các ảnh ứng viên hợp lệ (image_ranking.new_candidate), chưa xếp hạng
+        """
+        rule = rule or self.site_rules.for_url(link)
+        timing = timing if timing is not None else {}
+        strategy = rule.get('wait') if rule.get('wait') in READY_STRATEGIES else self.page_wait.get()
+        timeout = self.get_int_setting(self.page_wait_seconds, 10, 1, 120)
+        timing['strategy'] = strategy
+        
+        def collect():
+            # Lấy toàn bộ ứng viên (currentSrc, srcset, lazy-load, ảnh nền CSS) trong một lần gọi, lọc ở phía Python
+            result = driver.execute_script(DOM_IMAGE_SCRIPT, list(LAZY_SRC_ATTRS))
+            return merge_candidates([c for c in extract_dom_image_candidates(result, rule['exclude'])
+                                     if self.is_valid_image_url(c['url'])])
+        
+        try:
+            started = time.time()
+            if browser_pool:
+                browser_pool.load_page(driver, link)
+            else:
+                driver.get(link)
+            timing['load'] = time.time() - started
+            
+            # Chờ phần tử riêng của site (vd gallery sản phẩm) trước, rồi áp dụng chiến lược chờ chung
+            started = time.time()
+            if rule.get('wait_selector'):
+                wait_for_selector(driver, rule['wait_selector'], timeout)
+            
+            candidates = None
+            if strategy == READY_SCROLL:
+                candidates, timing['scroll_rounds'] = scroll_for_lazy_images(driver, collect, timeout)
+            elif strategy == READY_NETWORK_IDLE:
+                wait_for_network_idle(driver, timeout)
+            elif not rule.get('wait_selector'):
+                wait_for_img(driver, timeout)
+            timing['wait'] = time.time() - started
+            
+            started = time.time()
+            if candidates is None:
+                candidates = collect()
+            timing['extract'] = time.time() - started
+            
+            if browser_pool and browser_pool.profile == PROFILE_LEAN:
+                try:
+                    timing['saved'] = measure_eager_saving(driver)
+                except Exception:
+                    pass
+            
+            return candidates
+            
+        except Exception as e:
+            self.log_message(f"Lỗi khi crawl link {link}: {str(e)}")
+            return []
+    
+    def is_direct_image_link(self, url):
+        """
+        Link trong input là ảnh (download trực tiếp) hay trang web (phải tìm ảnh trên trang)
+        
+        Args:
+            url (str): Link trong input
+            
+        Returns:
+            bool: True nếu là ảnh
+        """
+        if self.link_router:
+            return self.link_router.route(url) == ROUTE_IMAGE
+        return self.is_valid_image_url(url)
+    
+    def is_valid_image_url(self, url):
+        if not url:
+            return False
+        
+        # Kiểm tra xem có phải là URL không
+        if not url.startswith(('http://', 'https://')):
+            return False
+        
+        # Kiểm tra extension
+        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.JPG', '.JPEG', '.PNG', '.GIF', '.BMP', '.WEBP']
+        parsed_url = urlparse(url)
+        path = parsed_url.path.lower()
+        
+        # Kiểm tra extension trong path
+        has_valid_extension = any(path.endswith(ext.lower()) for ext in valid_extensions)
+        
+        # Kiểm tra query parameters có chứa extension
+        query_has_extension = any(ext.lower() in parsed_url.query.lower() for ext in valid_extensions)
+        
+        # Kiểm tra fragment có chứa extension
+        fragment_has_extension = any(ext.lower() in parsed_url.fragment.lower() for ext in valid_extensions)
+        
+        # Nếu có extension ở bất kỳ đâu, coi như hợp lệ
+        if has_valid_extension or query_has_extension or fragment_has_extension:
+            return True
+        
+        # Kiểm tra một số pattern đặc biệt
+        special_patterns = [
+            'cdn', 'images', 'img', 'photo', 'picture', 'upload', 'media',
+            'static', 'assets', 'content', 'files', 'storage'
+        ]
+        
+        url_lower = url.lower()
+        has_special_pattern = any(pattern in url_lower for pattern in special_patterns)
+        
+        # Nếu có pattern đặc biệt, coi như hợp lệ
+        if has_special_pattern:
+            return True
+        
+        return False
+    
+    def create_result_entry(self, img_url, product_code, row_number=None, direct=False):
+        """Tạo result entry mặc định (failed) cho một link (direct=True: link ảnh trực tiếp)"""
+        return {
+            'product_code': product_code,
+            'link': img_url, 
+            'row': row_number,
+            'status': 'failed',
+            'filename': None,
+            'file_size': None,
+            'error_reason': None,
+            'download_time': None,
+            'attempts': 0,
+            'cache_status': None,
+            'deduplicated': False,
+            'discovery_path': DISCOVERY_DIRECT if direct else None,
+            'image_rank': None,
+            'variants': [],
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    def record_result(self, result_entry):
+        """Lưu result entry vào danh sách kết quả và cập nhật thống kê"""
+        self.results.append(result_entry)
+        if self.journal:
+            self.journal.append(result_entry)
+        self.update_stats()
+    
+    def save_image_content(self, content, save_dir, product_code, image_rank=None):
+        """
+        Xử lý bytes ảnh (nền trắng nếu cần), lưu WebP cùng các biến thể kích thước
+        
+        Returns:
+            tuple: (filename, file_size, variants) - variants là các {'name', 'filename', 'file_size'}
+        """
+        # Tạo tên file theo mã sản phẩm (ảnh thứ 2, 3... của sản phẩm thêm hậu tố -2, -3)
+        filename = self.generate_filename(product_code, image_rank)
+        filepath = os.path.join(save_dir, filename)
+        variant_files = [(name, self.generate_filename(product_code, image_rank, name), side)
+                         for name, side in self.output_variants]
+        
+        # Decode / chèn nền trắng / encode WebP trên process pool, process con ghi file trực tiếp
+        file_size, variant_sizes = self.image_stage.process(
+            content, filepath, self.image_processing.get(), self.get_max_output_side(),
+            [(os.path.join(save_dir, variant_filename), side) for _, variant_filename, side in variant_files],
+            self.get_webp_preset(), bool(self.webp_passthrough.get()))
+        
+        variants = [{'name': name, 'filename': variant_filename, 'file_size': size}
+                    for (name, variant_filename, _), size in zip(variant_files, variant_sizes)]
+        return filename, file_size, variants
+    
+    def fetch_with_retry(self, url, result_entry, headers=None):
+        """Download URL bằng session của worker, retry lỗi tạm thời với backoff + jitter
+        và tôn trọng Retry-After; host lỗi liên tiếp quá ngưỡng sẽ bị ngắt (CircuitOpenError).
+        Body được đọc streaming, trả về (response, content) - content là None khi nhận 304"""
+        host = get_host(url)
+        attempt = 0
+        
+        while True:
+            allowed = self.circuit_breaker.allow(host)
+            if not allowed:
+                raise CircuitOpenError(host)
+            
+            attempt += 1
+            result_entry['attempts'] = result_entry.get('attempts', 0) + 1
+            retry_after = None
+            
+            started = time.monotonic()
+            try:
+                response = self.get_http_session().get(url, headers=headers, timeout=30, stream=True)
+                if response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    self.download_queue.record_throttled(url, retry_after)
+                if response.status_code >= 400:
+                    discard_response(response)
+                response.raise_for_status()
+                
+                # Host đã phản hồi bình thường - body bị từ chối (quá dung lượng, không phải ảnh) không phải lỗi của host
+                self.circuit_breaker.record_success(host)
+                if response.status_code == 304:
+                    response.content  # Body rỗng - trả kết nối về pool
+                    content = None
+                else:
+                    content = read_image_stream(response, self.max_download_bytes)
+                self.record_request_outcome(started, OUTCOME_OK)
+                return response, content
+            
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.HTTPError) as e:
+                if isinstance(e, requests.exceptions.HTTPError):
+                    status_code = e.response.status_code
+                    retryable = self.retry_policy.is_retryable_status(status_code)
+                    if status_code in (429, 503):
+                        self.record_request_outcome(started, OUTCOME_THROTTLED)
+                    else:
+                        self.record_request_outcome(started, OUTCOME_ERROR if retryable else OUTCOME_OK)
+                else:
+                    retryable = True
+                    self.record_request_outcome(started, OUTCOME_ERROR)
+                
+                if not retryable:
+                    # Lỗi vĩnh viễn (404...) - host vẫn phản hồi bình thường
+                    self.circuit_breaker.record_success(host)
+                    raise
+                
+                if self.circuit_breaker.record_failure(host):
+                    self.log_message(f"⛔ Ngắt host {host} sau {self.circuit_breaker.failure_threshold} lỗi liên tiếp")
+                
+                if attempt >= self.retry_policy.max_attempts or not self.is_crawling:
+                    raise
+                
+                delay = self.retry_policy.compute_delay(attempt, retry_after)
+                self.log_message(f"🔁 Thử lại lần {attempt + 1}/{self.retry_policy.max_attempts} sau {delay:.1f}s: {url} ({type(e).__name__})")
+                time.sleep(delay)
+            
+            finally:
+                if allowed == CircuitBreaker.PROBE:
+                    self.circuit_breaker.end_probe(host)
+    
+    def record_request_outcome(self, started, outcome):
+        """Gửi latency và kết quả request cho bộ tự điều chỉnh số luồng (nếu đang bật)"""
+        if self.concurrency_controller:
+            self.concurrency_controller.record(time.monotonic() - started, outcome)
+    
+    def fetch_image_bytes(self, url, result_entry):
+        """Download bytes ảnh; nếu bật cache thì gửi request có điều kiện và dùng body đã cache khi nhận 304"""
+        started = time.monotonic()
+        try:
+            return self._fetch_image_bytes(url, result_entry)
+        finally:
+            self.record_download_time(started)
+    
+    def _fetch_image_bytes(self, url, result_entry):
+        cache = self.http_cache
+        headers = cache.conditional_headers(url) if cache else None
+        response, content = self.fetch_with_retry(url, result_entry, headers)
+        
+        if cache and response.status_code == 304:
+            content = cache.get_body(url)
+            if content is not None:
+                result_entry['cache_status'] = 'hit'
+                return content
+            # Body trong cache không còn - tải lại đầy đủ
+            response, content = self.fetch_with_retry(url, result_entry)
+        
+        if cache:
+            cache.store(url, response.headers, content)
+            result_entry['cache_status'] = 'miss'
+        return content
+    
+    def record_download_time(self, started):
+        """Cộng dồn thời gian stage download (tính mức sử dụng từng stage trong báo cáo)"""
+        with self.stats_lock:
+            self.download_stats['downloads'] += 1
+            self.download_stats['busy'] += time.monotonic() - started
+    
+    def record_download_rejected(self, error):
+        """Cộng dồn thống kê download bị dừng sớm (không phải ảnh / quá lớn)"""
+        with self.stats_lock:
+            self.stream_stats['aborted'] += 1
+            self.stream_stats['bytes_saved'] += error.bytes_saved
+    
+    def get_max_output_side(self):
+        """Cạnh dài nhất tối đa của ảnh output (px), 0 = giữ nguyên kích thước"""
+        return self.get_int_setting(self.max_output_side, 0, 0, 20000)
+    
+    def get_webp_preset(self):
+        """Preset encode WebP đang chọn (giá trị lạ thì dùng balanced)"""
+        preset = str(self.webp_preset.get()).strip()
+        return preset if preset in WEBP_PRESETS else PRESET_BALANCED
+    
+    def output_signature(self, filename):
+        """Chuỗi mô tả cấu hình xử lý ảnh output - khác nhau thì phải encode lại"""
+        max_side = self.get_max_output_side()
+        size_part = f"|max:{max_side}" if max_side else ""
+        if self.output_variants:
+            size_part += "|variants:" + ",".join(f"{name}={side}" for name, side in self.output_variants)
+        if self.webp_passthrough.get():
+            size_part += "|passthrough"
+        return f"{self.image_processing.get()}|webp:{self.get_webp_preset()}{size_part}|{filename}"
+    
+    def save_entry_image(self, url, content, save_dir, product_code, result_entry):
+        """Lưu ảnh cho entry; bỏ qua encode nếu ảnh không đổi (304) và file output đã tạo với cùng cấu hình"""
+        cache = self.http_cache
+        image_rank = result_entry.get('image_rank')
+        filename = self.generate_filename(product_code, image_rank)
+        filepath = os.path.join(save_dir, filename)
+        signature = self.output_signature(filename)
+        variants = [{'name': name, 'filename': self.generate_filename(product_code, image_rank, name)}
+                    for name, _ in self.output_variants]
+        
+        if (cache and result_entry.get('cache_status') == 'hit'
+                and cache.output_matches(url, signature) and os.path.exists(filepath)
+                and all(os.path.exists(os.path.join(save_dir, v['filename'])) for v in variants)):
+            cache.record_skipped_encode()
+            result_entry['cache_status'] = 'hit_reused'
+            for variant in variants:
+                variant['file_size'] = os.path.getsize(os.path.join(save_dir, variant['filename']))
+            result_entry['variants'] = variants
+            return filename, os.path.getsize(filepath)
+        
+        filename, file_size, result_entry['variants'] = self.save_image_content(content, save_dir, product_code, image_rank)
+        if cache:
+            cache.record_output(url, signature)
+        return filename, file_size
+    
+    def record_deduplicated(self, img_url, outcome, save_dir, product_code, row_number=None, image_rank=None):
+        """Ghi kết quả cho dòng trùng URL bằng cách dùng lại ảnh đã xử lý của task đầu tiên"""
+        start_time = time.time()
+        result_entry = self.create_result_entry(img_url, product_code, row_number)
+        result_entry['deduplicated'] = True
+        result_entry['image_rank'] = image_rank
+        # Nguồn ảnh / trạng thái cache của dòng trùng là của lần download đầu tiên
+        result_entry['discovery_path'] = outcome.get('discovery_path')
+        result_entry['cache_status'] = outcome.get('cache_status')
+        
+        if outcome['status'] == 'success':
+            try:
+                filename = self.generate_filename(product_code, image_rank)
+                filepath = os.path.join(save_dir, filename)
+                if os.path.abspath(filepath) != os.path.abspath(outcome['filepath']):
+                    shutil.copyfile(outcome['filepath'], filepath)
+                
+                # Biến thể kích thước của ảnh gốc được copy theo tên của dòng này
+                for variant in outcome.get('variants') or []:
+                    variant_filename = self.generate_filename(product_code, image_rank, variant['name'])
+                    variant_path = os.path.join(save_dir, variant_filename)
+                    if os.path.abspath(variant_path) != os.path.abspath(variant['filepath']):
+                        shutil.copyfile(variant['filepath'], variant_path)
+                    result_entry['variants'].append({'name': variant['name'], 'filename': variant_filename,
+                                                     'file_size': os.path.getsize(variant_path)})
+                
+                result_entry.update({
+                    'status': 'success',
+                    'filename': filename,
+                    'file_size': os.path.getsize(filepath),
+                })
+                self.success_count += 1
+                self.log_message(f"♻️ Dùng lại ảnh trùng URL: {filename} (Mã: {product_code})")
+            except Exception as e:
+                result_entry['error_reason'] = f"Dedup Copy Error: {str(e)}"
+                self.failed_count += 1
+                self.log_message(f"❌ Không thể dùng lại ảnh trùng URL cho {product_code}: {str(e)}")
+        else:
+            result_entry['error_reason'] = outcome['error_reason']
+            self.failed_count += 1
+        
+        result_entry['download_time'] = time.time() - start_time
+        self.record_result(result_entry)
+    
+    def complete_deduplicated(self, img_url, result_entry, save_dir):
+        """Báo kết quả của task đầu tiên cho các dòng đang chờ cùng URL"""
+        outcome = {
+            'status': result_entry['status'],
+            'filepath': os.path.join(save_dir, result_entry['filename']) if result_entry['filename'] else None,
+            'error_reason': result_entry['error_reason'],
+            'discovery_path': result_entry.get('discovery_path'),
+            'cache_status': result_entry.get('cache_status'),
+            'variants': [{'name': v['name'], 'filepath': os.path.join(save_dir, v['filename'])}
+                         for v in result_entry.get('variants') or []],
+        }
+        for waiter_save_dir, waiter_code, waiter_row, waiter_rank in self.url_dedup.complete(img_url, outcome):
+            self.record_deduplicated(img_url, outcome, waiter_save_dir, waiter_code, waiter_row, waiter_rank)
+    
+    def process_single_link(self, img_url, save_dir, product_code, row_number=None, meta=None):
+        # URL trùng trong cùng lần crawl: dùng lại kết quả của task đầu tiên
+        image_rank = meta.get('image_rank') if meta else None
+        state, outcome = self.url_dedup.claim(img_url, (save_dir, product_code, row_number, image_rank))
+        if state == UrlDeduplicator.WAITING:
+            return
+        if state == UrlDeduplicator.COMPLETED:
+            self.record_deduplicated(img_url, outcome, save_dir, product_code, row_number, image_rank)
+            return
+        
+        # Initialize result tracking
+        start_time = time.time()
+        result_entry = self.create_result_entry(img_url, product_code, row_number)
+        result_entry['image_rank'] = image_rank
+        if meta:
+            result_entry['discovery_path'] = meta.get('discovery_path')
+        
+        try:
+            # Kiểm tra xem có phải link ảnh trực tiếp không (theo Content-Type, nhớ theo mẫu URL);
+            # ảnh tìm được trên trang web thì không cần kiểm tra lại
+            if result_entry['discovery_path'] or self.is_direct_image_link(img_url):
+                if not result_entry['discovery_path']:
+                    result_entry['discovery_path'] = DISCOVERY_DIRECT
+                # Download ảnh trực tiếp
+                self.log_message(f"🖼️ Download ảnh trực tiếp: {img_url}")
+                
+                try:
+                    # Dùng session keep-alive của worker, tự retry lỗi tạm thời
+                    content = self.fetch_image_bytes(img_url, result_entry)
+                    
+                    # Xử lý ảnh và lưu dưới dạng WebP
+                    filename, file_size = self.save_entry_image(img_url, content, save_dir, product_code, result_entry)
+                    
+                    # Update result entry for success
+                    result_entry.update({
+                        'status': 'success',
+                        'filename': filename,
+                        'file_size': file_size,
+                        'download_time': time.time() - start_time
+                    })
+                    
+                    self.success_count += 1
+                    self.log_message(f"✅ Đã lưu ảnh: {filename} (Mã: {product_code}) - {file_size/1024:.1f}KB")
+                    
+                except CircuitOpenError as e:
+                    result_entry['error_reason'] = f"Circuit Breaker: {str(e)}"
+                    self.failed_count += 1
+                    self.log_message(f"⛔ Bỏ qua (host bị ngắt): {img_url}")
+                    
+                except DownloadRejected as e:
+                    self.record_download_rejected(e)
+                    if result_entry['discovery_path'] == DISCOVERY_DIRECT and self.reroute_rejected_link(img_url):
+                        # Quyết định nhớ theo mẫu URL bị sai - link thật ra là trang web
+                        result_entry['discovery_path'] = None
+                        self.download_from_webpage(img_url, save_dir, product_code, result_entry, start_time)
+                    else:
+                        result_entry['error_reason'] = f"Download Rejected: {e.reason}"
+                        self.failed_count += 1
+                        self.log_message(f"🚫 Dừng download sớm: {img_url} - {e.reason}")
+                    
+                except requests.exceptions.Timeout:
+                    result_entry['error_reason'] = "Timeout - Link không phản hồi trong 30s"
+                    self.failed_count += 1
+                    self.log_message(f"❌ Timeout khi download: {img_url}")
+                    
+                except requests.exceptions.HTTPError as e:
+                    result_entry['error_reason'] = f"HTTP Error {e.response.status_code}: {e.response.reason}"
+                    self.failed_count += 1
+                    self.log_message(f"❌ HTTP Error {e.response.status_code}: {img_url}")
+                    
+                except requests.exceptions.RequestException as e:
+                    result_entry['error_reason'] = f"Network Error: {str(e)}"
+                    self.failed_count += 1
+                    self.log_message(f"❌ Network Error: {img_url}")
+                    
+                except Exception as e:
+                    result_entry['error_reason'] = f"Image Processing Error: {str(e)}"
+                    self.failed_count += 1
+                    self.log_message(f"❌ Image Error: {img_url} - {str(e)}")
+                
+            else:
+                # Link không phải ảnh trực tiếp - thử crawl từ trang web
+                self.download_from_webpage(img_url, save_dir, product_code, result_entry, start_time)
+            
+        except Exception as e:
+            result_entry['error_reason'] = f"General Error: {str(e)}"
+            self.failed_count += 1
+            self.log_message(f"❌ Lỗi khi xử lý link {img_url}: {str(e)}")
+        
+        finally:
+            # Ensure download time is set
+            if result_entry['download_time'] is None:
+                result_entry['download_time'] = time.time() - start_time
+            
+            # Add result to tracking list
+            self.record_result(result_entry)
+            self.complete_deduplicated(img_url, result_entry, save_dir)
+    
+    def download_from_webpage(self, img_url, save_dir, product_code, result_entry, start_time):
+        """Tìm ảnh trên trang web (HTML tĩnh / trình duyệt), download ảnh xếp hạng cao nhất và cập nhật result entry"""
+        self.log_message(f"🌐 Thử crawl từ trang web: {img_url}")
+        try:
+            # HTML tĩnh trước, trình duyệt mượn từ pool khi cần (trả lại ngay sau khi tìm ảnh)
+            images, result_entry['discovery_path'] = self.discover_images(img_url)
+            
+            if images:
+                # Lưu ảnh xếp hạng cao nhất (ảnh sản phẩm chính, không phải logo / sprite)
+                img_url_direct = self.select_images(images)[0]
+                self.log_message(f"🖼️ Tìm thấy ảnh: {img_url_direct}")
+                
+                # Ảnh thường nằm trên CDN khác host của trang - giới hạn mỗi host tính theo host của ảnh
+                self.download_queue.switch_host(img_url_direct)
+                
+                # Dùng session keep-alive của worker, tự retry lỗi tạm thời
+                content = self.fetch_image_bytes(img_url_direct, result_entry)
+                
+                # Xử lý ảnh và lưu dưới dạng WebP
+                filename, file_size = self.save_entry_image(img_url_direct, content, save_dir, product_code, result_entry)
+                
+                # Update result entry for success
+                result_entry.update({
+                    'status': 'success',
+                    'filename': filename,
+                    'file_size': file_size,
+                    'download_time': time.time() - start_time
+                })
+                
+                self.success_count += 1
+                self.log_message(f"✅ Đã lưu ảnh từ trang web: {filename} (Mã: {product_code}) - {file_size/1024:.1f}KB")
+            else:
+                result_entry['error_reason'] = "Không tìm thấy ảnh nào trên trang web"
+                self.log_message(f"⚠️ Không tìm thấy ảnh nào từ trang web: {img_url}")
+                self.failed_count += 1
+            
+        except DownloadRejected as e:
+            result_entry['error_reason'] = f"Download Rejected: {e.reason}"
+            self.record_download_rejected(e)
+            self.failed_count += 1
+            self.log_message(f"🚫 Dừng download sớm: {img_url} - {e.reason}")
+            
+        except Exception as e:
+            result_entry['error_reason'] = f"Web Crawl Error: {str(e)}"
+            self.log_message(f"❌ Lỗi khi crawl từ trang web {img_url}: {str(e)}")
+            self.failed_count += 1
+    
+    def reroute_rejected_link(self, url):
+        """
+        Link được phân loại là ảnh nhưng server trả về nội dung không phải ảnh: bỏ quyết định đã nhớ
+        (theo mẫu URL) và hỏi lại Content-Type
+        
+        Returns:
+            bool: True nếu link thật ra là trang web
+        """
+        if not self.link_router:
+            return False
+        if self.link_router.reprobe(url) == ROUTE_PAGE:
+            self.log_message(f"🔀 Link không phải ảnh như đã phân loại, chuyển sang tìm ảnh trên trang: {url}")
+            return True
+        return False
+    
+    def generate_filename(self, product_code, image_rank=None, variant=None):
+        """
+        Tạo tên file theo logic JavaScript (ảnh thứ 2 trở đi của sản phẩm thêm hậu tố -2, -3...;
+        biến thể kích thước thêm hậu tố _tên, vd MÃ_thumb.webp, MÃ-2_zoom.webp)
+        """
+        filename = self.naming_processor.generate_filename(str(product_code))
+        name, extension = os.path.splitext(filename)
+        if image_rank and image_rank > 1:
+            name = f"{name}-{image_rank}"
+        if variant:
+            name = f"{name}_{variant}"
+        return f"{name}{extension}"
+    
+    def generate_report_from_journal(self, journal_path, output_dir=None):
+        """Tạo Excel report từ journal (mỗi ảnh của mỗi entry lấy kết quả mới nhất)"""
+        results = latest_results(journal_path)
+        if not results:
+            return None
+        
+        self.log_message(f"📄 Đọc {len(results)} entries từ journal: {journal_path}")
+        return self.generate_excel_report(output_dir or os.path.dirname(os.path.abspath(journal_path)), results)
+    
+    def generate_excel_report(self, output_dir, results=None):
+        """Tạo Excel report với color coding cho results"""
+        if results is None:
+            results = self.results
+        try:
+            self.log_message("📊 Đang tạo Excel report...")
+            
+            # Tạo workbook
+            wb = Workbook()
+            
+            # Remove default sheet
+            wb.remove(wb.active)
+            
+            # === SHEET 1: DETAILED RESULTS ===
+            details_ws = wb.create_sheet("Chi Tiết Kết Quả")
+            
+            # Headers
+            headers = [
+                'STT', 'Mã Sản Phẩm', 'Link', 'Trạng Thái', 'Tên File', 
+                'Kích Thước (KB)', 'Lý Do Lỗi', 'Thời Gian DL (s)', 'Row Excel', 'Timestamp',
+                'Số Lần Thử', 'Cache', 'Trùng URL', 'Nguồn Ảnh', 'Ảnh Số', 'Biến Thể Kích Thước'
+            ]
+            cache_labels = {'hit': 'HIT (304)', 'hit_reused': 'HIT (giữ file cũ)', 'miss': 'MISS'}
+            
+            # Style definitions
+            header_font = Font(bold=True, color="FFFFFF")
+            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+            success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+            failed_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+            border = Border(
+                left=Side(style='thin'),
+                right=Side(style='thin'),
+                top=Side(style='thin'),
+                bottom=Side(style='thin')
+            )
+            center_alignment = Alignment(horizontal='center', vertical='center')
+            
+            # Add headers
+            for col, header in enumerate(headers, 1):
+                cell = details_ws.cell(row=1, column=col, value=header)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.border = border
+                cell.alignment = center_alignment
+            
+            # Add data rows
+            for idx, result in enumerate(results, 2):
+                # STT
+                details_ws.cell(row=idx, column=1, value=idx-1)
+                
+                # Mã Sản Phẩm
+                details_ws.cell(row=idx, column=2, value=result['product_code'])
+                
+                # Link
+                details_ws.cell(row=idx, column=3, value=result['link'])
+                
+                # Trạng Thái
+                status_cell = details_ws.cell(row=idx, column=4, value=result['status'].upper())
+                status_cell.font = Font(bold=True)
+                
+                # Tên File
+                details_ws.cell(row=idx, column=5, value=result['filename'] or 'N/A')
+                
+                # Kích Thước
+                if result['file_size']:
+                    size_kb = round(result['file_size'] / 1024, 1)
+                    details_ws.cell(row=idx, column=6, value=size_kb)
+                else:
+                    details_ws.cell(row=idx, column=6, value='N/A')
+                
+                # Lý Do Lỗi
+                details_ws.cell(row=idx, column=7, value=result['error_reason'] or 'N/A')
+                
+                # Thời Gian Download
+                if result['download_time']:
+                    dl_time = round(result['download_time'], 2)
+                    details_ws.cell(row=idx, column=8, value=dl_time)
+                else:
+                    details_ws.cell(row=idx, column=8, value='N/A')
+                
+                # Row Excel
+                details_ws.cell(row=idx, column=9, value=result['row'] or 'N/A')
+                
+                # Timestamp
+                details_ws.cell(row=idx, column=10, value=result['timestamp'])
+                
+                # Số Lần Thử
+                details_ws.cell(row=idx, column=11, value=result.get('attempts', 0))
+                
+                # Cache
+                details_ws.cell(row=idx, column=12, value=cache_labels.get(result.get('cache_status'), 'N/A'))
+                
+                # Trùng URL (dùng lại ảnh của dòng khác)
+                details_ws.cell(row=idx, column=13, value='Có' if result.get('deduplicated') else 'Không')
+                
+                # Nguồn Ảnh (link trực tiếp / HTML tĩnh / trình duyệt)
+                details_ws.cell(row=idx, column=14, value=DISCOVERY_LABELS.get(result.get('discovery_path'), 'N/A'))
+                
+                # Ảnh Số (thứ hạng trong các ảnh được chọn của trang)
+                details_ws.cell(row=idx, column=15, value=result.get('image_rank') or '')
+                
+                # Biến thể kích thước (thumbnail, zoom...) tạo cùng ảnh chính
+                variants_text = ', '.join(f"{v['name']}: {v['filename']} ({v['file_size'] / 1024:.1f}KB)"
+                                          for v in result.get('variants') or [])
+                details_ws.cell(row=idx, column=16, value=variants_text)
+                
+                # Apply row coloring and borders
+                for col in range(1, len(headers) + 1):
+                    cell = details_ws.cell(row=idx, column=col)
+                    cell.border = border
+                    cell.alignment = Alignment(vertical='center')
+                    
+                    if result['status'] == 'success':
+                        cell.fill = success_fill
+                    else:
+                        cell.fill = failed_fill
+            
+            # Auto-adjust column widths
+            for col in range(1, len(headers) + 1):
+                column_letter = get_column_letter(col)
+                max_length = 0
+                for row in details_ws[f'{column_letter}1:{column_letter}{len(results)+1}']:
+                    for cell in row:
+                        try:
+                            if len(str(cell.value)) > max_length:
+                                max_length = len(str(cell.value))
+                        except:
+                            pass
+                adjusted_width = min(max_length + 2, 50)
+                details_ws.column_dimensions[column_letter].width = adjusted_width
+            
+            # === SHEET 2: SUMMARY STATISTICS ===
+            summary_ws = wb.create_sheet("Tổng Kết")
+            
+            # Calculate statistics
+            total_entries = len(results)
+            success_count = len([r for r in results if r['status'] == 'success'])
+            failed_count = total_entries - success_count
+            success_rate = (success_count / total_entries * 100) if total_entries > 0 else 0
+            
+            # Processing time
+            if self.start_time:
+                total_time = time.time() - self.start_time
+                avg_time_per_entry = total_time / total_entries if total_entries > 0 else 0
+            else:
+                total_time = 0
+                avg_time_per_entry = 0
+            
+            # Error breakdown
+            error_breakdown = {}
+            for result in results:
+                if result['status'] == 'failed' and result['error_reason']:
+                    error_type = result['error_reason'].split(':')[0]
+                    error_breakdown[error_type] = error_breakdown.get(error_type, 0) + 1
+            
+            # Summary content
+            summary_data = [
+                ['📊 BÁO CÁO TỔNG KẾT CRAWLER', ''],
+                ['', ''],
+                ['Thống Kê Chung', ''],
+                ['Tổng số entries', total_entries],
+                ['Thành công', success_count],
+                ['Thất bại', failed_count],
+                ['Tỷ lệ thành công', f'{success_rate:.1f}%'],
+                ['Dùng lại ảnh trùng URL', len([r for r in results if r.get('deduplicated')])],
+                ['', ''],
+                ['Thời Gian Xử Lý', ''],
+                ['Tổng thời gian', f'{total_time:.1f}s'],
+                ['Trung bình/entry', f'{avg_time_per_entry:.2f}s'],
+                ['', ''],
+            ]
+            
+            # Connection reuse statistics
+            if self.session_pool:
+                conn_stats = self.session_pool.connection_stats()
+                summary_data.extend([
+                    ['Kết Nối HTTP', ''],
+                    ['Tổng HTTP request', conn_stats['requests']],
+                    ['Kết nối mới (handshake)', conn_stats['new_connections']],
+                    ['Kết nối tái sử dụng', conn_stats['reused_connections']],
+                    ['Tỷ lệ tái sử dụng', f"{conn_stats['reuse_rate']:.1f}%"],
+                    ['Số session (worker)', conn_stats['sessions']],
+                    ['', ''],
+                ])
+            
+            # Retry statistics
+            total_attempts = sum(r.get('attempts', 0) for r in results)
+            retried_entries = [r for r in results if r.get('attempts', 0) > 1]
+            recovered_count = len([r for r in retried_entries if r['status'] == 'success'])
+            breaker_stats = self.circuit_breaker.stats()
+            summary_data.extend([
+                ['Thử Lại', ''],
+                ['Tổng số lần gửi request', total_attempts],
+                ['Entries phải thử lại', len(retried_entries)],
+                ['Thành công sau khi thử lại', recovered_count],
+                ['Số host bị ngắt (circuit breaker)', len([h for h in breaker_stats.values() if h['trips']])],
+                ['', ''],
+            ])
+            
+            # HTTP cache statistics
+            if self.http_cache:
+                cache_stats = self.http_cache.get_stats()
+                cache_requests = cache_stats['hits'] + cache_stats['misses']
+                hit_rate = (cache_stats['hits'] / cache_requests * 100) if cache_requests > 0 else 0
+                summary_data.extend([
+                    ['Cache HTTP', ''],
+                    ['Cache hit (304)', cache_stats['hits']],
+                    ['Cache miss (tải đầy đủ)', cache_stats['misses']],
+                    ['Tỷ lệ hit', f'{hit_rate:.1f}%'],
+                    ['Bỏ qua encode lại', cache_stats['skipped_encodes']],
+                    ['Dung lượng không phải tải (MB)', round(cache_stats['bytes_saved'] / 1024 / 1024, 2)],
+                    ['Mục bị xóa (LRU)', cache_stats['evicted']],
+                    ['Dung lượng cache (MB)', round(cache_stats['size_bytes'] / 1024 / 1024, 2)],
+                    ['', ''],
+                ])
+            
+            # Page discovery statistics (mỗi dòng Excel tính một lần)
+            discovery_rows = {}
+            for result in results:
+                if result.get('discovery_path') in (DISCOVERY_STATIC, DISCOVERY_BROWSER, DISCOVERY_BROWSER_RULE, DISCOVERY_CACHE):
+                    discovery_rows[entry_key(result['product_code'], result['row'])] = result['discovery_path']
+            if discovery_rows:
+                paths = list(discovery_rows.values())
+                static_rows = paths.count(DISCOVERY_STATIC)
+                summary_data.extend([
+                    ['Tìm Ảnh Trên Trang', ''],
+                    ['Số trang', len(paths)],
+                    ['HTML tĩnh (không cần trình duyệt)', static_rows],
+                    ['Trình duyệt (HTML tĩnh không có ảnh)', paths.count(DISCOVERY_BROWSER)],
+                    ['Trình duyệt (theo site rule)', paths.count(DISCOVERY_BROWSER_RULE)],
+                    ['Cache trang (không tải lại trang)', paths.count(DISCOVERY_CACHE)],
+                    ['Tỷ lệ HTML tĩnh', f'{static_rows / len(paths) * 100:.1f}%'],
+                ])
+                if self.ranking_stats['candidates']:
+                    summary_data.extend([
+                        ['Ảnh ứng viên tìm thấy', self.ranking_stats['candidates']],
+                        ['Ảnh được chọn để download', self.ranking_stats['selected']],
+                        ['Ảnh không phải download', self.ranking_stats['candidates'] - self.ranking_stats['selected']],
+                        ['Số lần đọc kích thước (Range)', self.ranking_stats['probes']],
+                    ])
+                browser_timings = [t for t in self.page_timings
+                                   if t['discovery_path'] in (DISCOVERY_BROWSER, DISCOVERY_BROWSER_RULE)]
+                if browser_timings:
+                    count = len(browser_timings)
+                    summary_data.extend([
+                        ['Trình duyệt - tải trang TB', f"{sum(t['load'] for t in browser_timings) / count:.2f}s"],
+                        ['Trình duyệt - chờ sẵn sàng TB', f"{sum(t['wait'] for t in browser_timings) / count:.2f}s"],
+                        ['Trình duyệt - lấy ảnh TB', f"{sum(t['extract'] for t in browser_timings) / count:.2f}s"],
+                    ])
+                    saved_timings = [t['saved'] for t in browser_timings if t.get('saved') is not None]
+                    if saved_timings:
+                        summary_data.append(['Trình duyệt - page load eager tiết kiệm TB (ước tính)',
+                                             f"{sum(saved_timings) / len(saved_timings):.2f}s/trang"])
+                summary_data.append(['', ''])
+            
+            # Link routing statistics
+            if self.link_router:
+                router_stats = self.link_router.get_stats()
+                if router_stats['images'] + router_stats['pages']:
+                    summary_data.extend([
+                        ['Phân Loại Link', ''],
+                        ['Link ảnh (download trực tiếp)', router_stats['images']],
+                        ['Link trang web (tìm ảnh trên trang)', router_stats['pages']],
+                        ['Hỏi server (HEAD / Range)', router_stats['probe']],
+                        ['Dùng lại theo mẫu URL', router_stats['pattern']],
+                        ['Đoán theo đuôi file (server không trả lời)', router_stats['heuristic']],
+                        ['Khác với đoán theo đuôi file', router_stats['corrected']],
+                        ['Hỏi lại do download không phải ảnh', router_stats['reprobed']],
+                        ['', ''],
+                    ])
+            
+            # Page discovery cache statistics
+            if self.discovery_cache:
+                discovery_stats = self.discovery_cache.get_stats()
+                if discovery_stats['lookups']:
+                    summary_data.extend([
+                        ['Cache Trang', ''],
+                        ['Số trang tra cache', discovery_stats['lookups']],
+                        ['HIT (còn hạn)', discovery_stats['hits']],
+                        ['HIT (kiểm tra lại - 304)', discovery_stats['revalidated']],
+                        ['MISS (tìm lại ảnh)', discovery_stats['misses']],
+                        ['Tỷ lệ HIT', f"{discovery_stats['hit_rate']:.1f}%"],
+                        ['Số trang trong cache', discovery_stats['entries']],
+                        ['', ''],
+                    ])
+            
+            # Browser pool statistics
+            if self.browser_pool:
+                browser_stats = self.browser_pool.get_stats()
+                summary_data.extend([
+                    ['Trình Duyệt', ''],
+                    ['Cấu hình trình duyệt', browser_stats['profile']],
+                    ['Chặn tải ảnh', 'Có' if browser_stats['block_images'] else 'Không'],
+                    ['Số trình duyệt đã khởi động', browser_stats['started']],
+                    ['Thời gian khởi động TB', f"{browser_stats['avg_startup']:.1f}s"],
+                    ['Số trang đã mở', browser_stats['pages']],
+                    ['Thời gian tải trang TB', f"{browser_stats['avg_load']:.2f}s"],
+                    ['Khởi động lại (đủ số trang)', browser_stats['recycled']],
+                    ['Thay thế do lỗi', browser_stats['unhealthy']],
+                    ['Dùng đồng thời cao nhất', browser_stats['peak_in_use']],
+                    ['', ''],
+                ])
+            
+            # Adaptive concurrency statistics
+            timeline = self.concurrency_controller.timeline if self.concurrency_controller else []
+            if timeline:
+                worker_counts = [point['workers'] for point in timeline] + [timeline[-1]['new_workers']]
+                summary_data.extend([
+                    ['Số Luồng Thích Ứng', ''],
+                    ['Số luồng ban đầu', worker_counts[0]],
+                    ['Số luồng thấp nhất', min(worker_counts)],
+                    ['Số luồng cao nhất', max(worker_counts)],
+                    ['Số luồng cuối cùng', worker_counts[-1]],
+                    ['Số lần điều chỉnh', len([p for p in timeline if p['new_workers'] != p['workers']])],
+                    ['', ''],
+                ])
+            
+            # Streaming download statistics
+            summary_data.extend([
+                ['Download Streaming', ''],
+                ['Dừng sớm (không phải ảnh / quá lớn)', self.stream_stats['aborted']],
+                ['Dung lượng không phải tải (MB)', round(self.stream_stats['bytes_saved'] / 1024 / 1024, 2)],
+                ['', ''],
+            ])
+            
+            # Per-stage utilization (download vs xử lý ảnh trên process pool)
+            stage_stats = self.image_stage.get_stats()
+            if stage_stats['images'] or self.download_stats['downloads']:
+                elapsed = stage_stats['elapsed'] or total_time
+                download_slots = (self.get_int_setting(self.async_concurrency, 100, 1, 1000)
+                                  if self.crawl_mode.get() == "async" else self.max_workers)
+                download_count = self.download_stats['downloads']
+                download_utilization = (min(100.0, self.download_stats['busy'] / (elapsed * download_slots) * 100)
+                                        if elapsed > 0 else 0.0)
+                summary_data.extend([
+                    ['Xử Lý Ảnh', ''],
+                    ['Số process xử lý ảnh', stage_stats['workers'] or 'Trong luồng download'],
+                    ['Preset encode WebP', self.get_webp_preset()],
+                    ['Download - số ảnh', download_count],
+                    ['Download - thời gian TB', f"{self.download_stats['busy'] / download_count if download_count else 0:.2f}s"],
+                    ['Download - mức sử dụng luồng', f"{download_utilization:.1f}% ({download_slots} luồng)"],
+                    ['Xử lý ảnh - số ảnh', stage_stats['images']],
+                    ['Xử lý ảnh - thời gian TB (decode + encode)', f"{stage_stats['avg_busy']:.3f}s"],
+                    ['Xử lý ảnh - chờ process rảnh TB', f"{stage_stats['avg_queue_wait']:.3f}s"],
+                    ['Xử lý ảnh - mức sử dụng process', f"{stage_stats['utilization']:.1f}%"],
+                    ['Xử lý ảnh - đồng thời cao nhất', stage_stats['peak_in_flight']],
+                    ['Xử lý trong luồng download (không dùng process)', stage_stats['inline']],
+                    ['Bỏ qua chèn nền trắng (ảnh không trong suốt)', stage_stats['composite_skipped']],
+                    ['Thu nhỏ theo cạnh tối đa', stage_stats['resized']],
+                    ['Ảnh biến thể kích thước đã tạo', stage_stats['variants']],
+                    ['Giữ nguyên file WebP gốc (không encode lại)', stage_stats['passthrough']],
+                    ['', ''],
+                ])
+            
+            summary_data.append(['Phân Tích Lỗi', ''])
+            
+            # Add error breakdown
+            for error_type, count in error_breakdown.items():
+                summary_data.append([error_type, count])
+            
+            # Add summary data
+            for row_idx, (label, value) in enumerate(summary_data, 1):
+                summary_ws.cell(row=row_idx, column=1, value=label)
+                summary_ws.cell(row=row_idx, column=2, value=value)
+                
+                # Style headers
+                if label in ['📊 BÁO CÁO TỔNG KẾT CRAWLER', 'Thống Kê Chung', 'Thời Gian Xử Lý', 'Kết Nối HTTP', 'Thử Lại', 'Cache HTTP', 'Phân Loại Link', 'Tìm Ảnh Trên Trang', 'Cache Trang', 'Trình Duyệt', 'Số Luồng Thích Ứng', 'Download Streaming', 'Xử Lý Ảnh', 'Phân Tích Lỗi']:
+                    summary_ws.cell(row=row_idx, column=1).font = Font(bold=True, size=14)
+                    summary_ws.cell(row=row_idx, column=1).fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
+            
+            # Per-host scheduler statistics
+            host_stats = self.download_queue.host_stats()
+            for host in breaker_stats:
+                host_stats.setdefault(host, {'dispatched': 0, 'blocked': 0, 'throttled': 0, 'peak_in_flight': 0})
+            if host_stats:
+                host_row = len(summary_data) + 2
+                summary_ws.cell(row=host_row, column=1, value='Thống Kê Theo Host').font = Font(bold=True, size=14)
+                summary_ws.cell(row=host_row, column=1).fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
+                
+                host_headers = ['Host', 'Request', 'Bị chặn (giới hạn host)', 'Bị throttle (429/503)', 'Đồng thời cao nhất',
+                                'Số lần ngắt', 'Bỏ qua do ngắt']
+                for col, header in enumerate(host_headers, 1):
+                    cell = summary_ws.cell(row=host_row + 1, column=col, value=header)
+                    cell.font = Font(bold=True)
+                    cell.border = border
+                
+                for offset, (host, stats) in enumerate(sorted(host_stats.items()), 2):
+                    breaker = breaker_stats.get(host, {'trips': 0, 'rejected': 0})
+                    values = [host or 'N/A', stats['dispatched'], stats['blocked'], stats['throttled'], stats['peak_in_flight'],
+                              breaker['trips'], breaker['rejected']]
+                    for col, value in enumerate(values, 1):
+                        summary_ws.cell(row=host_row + offset, column=col, value=value).border = border
+            
+            # Auto-adjust summary columns
+            summary_ws.column_dimensions['A'].width = 25
+            summary_ws.column_dimensions['B'].width = 15
+            summary_ws.column_dimensions['C'].width = 22
+            summary_ws.column_dimensions['D'].width = 22
+            summary_ws.column_dimensions['E'].width = 18
+            summary_ws.column_dimensions['F'].width = 14
+            summary_ws.column_dimensions['G'].width = 16
+            
+            # === SHEET 3: CONCURRENCY TIMELINE ===
+            if timeline:
+                timeline_ws = wb.create_sheet("Luồng Thích Ứng")
+                timeline_headers = ['Thời Điểm (s)', 'Số Luồng', 'Request', 'Throughput (req/s)', 'Latency p50 (s)',
+                                    'Latency p95 (s)', 'Tỷ Lệ Lỗi (%)', 'Bị Throttle', 'Hàng Đợi', 'Hành Động', 'Số Luồng Mới']
+                timeline_keys = ['elapsed', 'workers', 'requests', 'throughput', 'latency_p50',
+                                 'latency_p95', 'error_rate', 'throttled', 'backlog', 'action', 'new_workers']
+                for col, header in enumerate(timeline_headers, 1):
+                    cell = timeline_ws.cell(row=1, column=col, value=header)
+                    cell.font = header_font
+                    cell.fill = header_fill
+                    cell.border = border
+                    cell.alignment = center_alignment
+                
+                for row_idx, point in enumerate(timeline, 2):
+                    for col, key in enumerate(timeline_keys, 1):
+                        timeline_ws.cell(row=row_idx, column=col, value=point[key]).border = border
+                
+                for col, header in enumerate(timeline_headers, 1):
+                    timeline_ws.column_dimensions[get_column_letter(col)].width = max(12, len(header) + 2)
+                timeline_ws.column_dimensions['J'].width = 30
+            
+            # === SHEET 4: PAGE TIMINGS ===
+            if self.page_timings:
+                timing_ws = wb.create_sheet("Thời Gian Trang")
+                timing_headers = ['Link Trang', 'Nguồn Ảnh', 'Chiến Lược Chờ', 'HTML Tĩnh (s)', 'Tải Trang (s)',
+                                  'Chờ Sẵn Sàng (s)', 'Lấy Ảnh (s)', 'Số Lần Cuộn', 'Số Ảnh', 'Tổng (s)',
+                                  'Chế Độ Nhẹ Tiết Kiệm (s)']
+                for col, header in enumerate(timing_headers, 1):
+                    cell = timing_ws.cell(row=1, column=col, value=header)
+                    cell.font = header_font
+                    cell.fill = header_fill
+                    cell.border = border
+                    cell.alignment = center_alignment
+                
+                for row_idx, timing in enumerate(self.page_timings, 2):
+                    values = [timing['link'], DISCOVERY_LABELS[timing['discovery_path']], timing['strategy'] or '-',
+                              round(timing['static'], 3), round(timing['load'], 3), round(timing['wait'], 3),
+                              round(timing['extract'], 3), timing['scroll_rounds'], timing['images'],
+                              round(timing['total'], 3),
+                              round(timing['saved'], 3) if timing.get('saved') is not None else '-']
+                    for col, value in enumerate(values, 1):
+                        timing_ws.cell(row=row_idx, column=col, value=value).border = border
+                
+                for col, header in enumerate(timing_headers, 1):
+                    timing_ws.column_dimensions[get_column_letter(col)].width = max(12, len(header) + 2)
+                timing_ws.column_dimensions['A'].width = 60
+                timing_ws.column_dimensions['B'].width = 36
+            
+            # Save file
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            report_filename = f"crawler_report_{timestamp}.xlsx"
+            report_path = os.path.join(output_dir, report_filename)
+            
+            wb.save(report_path)
+            
+            self.log_message(f"✅ Đã tạo Excel report: {report_filename}")
+            return report_path
+            
+        except Exception as e:
+            self.log_message(f"❌ Lỗi khi tạo Excel report: {str(e)}")
+            return None
+    
+    def create_output_package(self, base_save_dir):
+        """Tạo organized output package với folder structure và files"""
+        try:
+            self.log_message("📁 Đang tạo output package...")
+            
+            # Tạo timestamp cho folder
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            package_name = f"crawler_output_{timestamp}"
+            package_dir = os.path.join(base_save_dir, package_name)
+            
+            # Tạo folder structure
+            images_dir = os.path.join(package_dir, "images")
+            os.makedirs(images_dir, exist_ok=True)
+            
+            self.log_message(f"📁 Tạo folder: {package_dir}")
+            
+            # Copy successful images to images folder
+            copied_count = 0
+            for result in self.results:
+                if result['status'] == 'success' and result['filename']:
+                    source_path = os.path.join(base_save_dir, result['filename'])
+                    dest_path = os.path.join(images_dir, result['filename'])
+                    
+                    try:
+                        if os.path.exists(source_path):
+                            # Copy file thay vì move để giữ nguyên file gốc
+                            shutil.copy2(source_path, dest_path)
+                            copied_count += 1
+                        
+                        # Biến thể kích thước của ảnh
+                        for variant in result.get('variants') or []:
+                            variant_path = os.path.join(base_save_dir, variant['filename'])
+                            if os.path.exists(variant_path):
+                                shutil.copy2(variant_path, os.path.join(images_dir, variant['filename']))
+                                copied_count += 1
+                    except Exception as e:
+                        self.log_message(f"⚠️ Không thể copy {result['filename']}: {str(e)}")
+            
+            self.log_message(f"📁 Đã copy {copied_count} ảnh vào folder images/")
+            
+            # Generate Excel report
+            excel_path = self.generate_excel_report(package_dir)
+            
+            # Generate text summary
+            summary_path = self.generate_text_summary(package_dir)
+            
+            # Generate package info
+            package_info = {
+                'package_dir': package_dir,
+                'package_name': package_name,
+                'images_dir': images_dir,
+                'excel_path': excel_path,
+                'summary_path': summary_path,
+                'total_files': copied_count + (2 if excel_path and summary_path else 1 if excel_path or summary_path else 0),
+                'images_count': copied_count
+            }
+            
+            self.log_message(f"✅ Tạo output package thành công: {package_name}")
+            return package_info
+            
+        except Exception as e:
+            self.log_message(f"❌ Lỗi khi tạo output package: {str(e)}")
+            return None
+    
+    def generate_text_summary(self, output_dir):
+        """Tạo text summary file"""
+        try:
+            # Calculate statistics
+            total_entries = len(self.results)
+            success_count = len([r for r in self.results if r['status'] == 'success'])
+            failed_count = total_entries - success_count
+            success_rate = (success_count / total_entries * 100) if total_entries > 0 else 0
+            
+            # Processing time
+            if self.start_time:
+                total_time = time.time() - self.start_time
+            else:
+                total_time = 0
+            
+            # Error breakdown
+            error_breakdown = {}
+            for result in self.results:
+                if result['status'] == 'failed' and result['error_reason']:
+                    error_type = result['error_reason'].split(':')[0]
+                    error_breakdown[error_type] = error_breakdown.get(error_type, 0) + 1
+            
+            # Create summary content
+            summary_content = f"""🖼️ IMAGE CRAWLER - BÁO CÁO TÓM TẮT
+{'='*60}
+
+📊 THỐNG KÊ TỔNG QUAN:
+    • Tổng số entries đã xử lý: {total_entries}
+    • Thành công: {success_count} ảnh ({success_rate:.1f}%)
+    • Thất bại: {failed_count} ảnh ({100-success_rate:.1f}%)
+    • Thời gian xử lý: {total_time:.1f} giây
+
+{self.format_connection_summary()}📁 KẾT QUẢ OUTPUT:
+    • Folder ảnh: images/ ({success_count} files)
+    • Báo cáo Excel: crawler_report_*.xlsx
+    • File tóm tắt: summary.txt (file này)
+
+"""
+
+            if error_breakdown:
+                summary_content += "❌ PHÂN TÍCH LỖI:\n"
+                for error_type, count in error_breakdown.items():
+                    summary_content += f"    • {error_type}: {count} lỗi\n"
+                summary_content += "\n"
+
+            if success_count > 0:
+                summary_content += "✅ DANH SÁCH ẢNH THÀNH CÔNG:\n"
+                for result in self.results:
+                    if result['status'] == 'success':
+                        size_kb = round(result['file_size'] / 1024, 1) if result['file_size'] else 0
+                        summary_content += f"    • {result['filename']} ({size_kb}KB) - {result['product_code']}\n"
+                summary_content += "\n"
+
+            if failed_count > 0:
+                summary_content += "❌ DANH SÁCH LỖI:\n"
+                for result in self.results:
+                    if result['status'] == 'failed':
+                        summary_content += f"    • {result['product_code']}: {result['error_reason']}\n"
+
+            summary_content += f"\n🕒 Tạo báo cáo: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+
+            # Save summary file
+            summary_filename = "summary.txt"
+            summary_path = os.path.join(output_dir, summary_filename)
+            
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                f.write(summary_content)
+            
+            self.log_message(f"✅ Đã tạo text summary: {summary_filename}")
+            return summary_path
+            
+        except Exception as e:
+            self.log_message(f"❌ Lỗi khi tạo text summary: {str(e)}")
+            return None
+    
+    def format_connection_summary(self):
+        """Tạo đoạn thống kê kết nối HTTP cho text summary"""
+        if not self.session_pool:
+            return ""
+        
+        conn_stats = self.session_pool.connection_stats()
+        return (f"🔌 KẾT NỐI HTTP:\n"
+                f"    • Tổng HTTP request: {conn_stats['requests']}\n"
+                f"    • Kết nối mới: {conn_stats['new_connections']}\n"
+                f"    • Kết nối tái sử dụng: {conn_stats['reused_connections']} ({conn_stats['reuse_rate']:.1f}%)\n\n")
+    
+    def stop_crawling(self):
+        self.is_crawling = False
+        self.log_message("Đang dừng quá trình crawl...")
+        
+        if self.concurrency_controller:
+            self.concurrency_controller.stop()
+        self.close_browser_pool()
+        
+        # Clear queue
+        self.download_queue.clear()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module cache kết quả tìm ảnh trên trang web (link trang -> danh sách link ảnh) lưu trên đĩa
+để lần chạy sau không phải render lại trang chưa thay đổi: mục còn hạn (TTL) được dùng ngay,
+mục hết hạn có ETag / Last-Modified được kiểm tra lại bằng request có điều kiện
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class DiscoveryCache:
+    FILENAME = ".discovery_cache.json"
+
+    def __init__(self, cache_dir, ttl=24 * 3600, log=None):
+        """
+        Khởi tạo cache và đọc từ đĩa (nếu có)
+
+        Args:
+            cache_dir (str): Thư mục chứa file cache (thường là thư mục lưu ảnh)
+            ttl (float): Thời gian một mục còn hạn (giây)
+            log (callable): Hàm ghi log (nếu có)
+        """
+        self.path = os.path.join(cache_dir, self.FILENAME)
+        self.ttl = ttl
+        self.log = log
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = {}
+        self._dirty = 0
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0}
+
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+        with self._lock:
+            self._entries = entries if isinstance(entries, dict) else {}
+
+    def save(self):
+        """Ghi cache xuống đĩa (ghi file tạm rồi thay thế để không hỏng file)"""
+        # Các luồng tìm ảnh cùng gọi save() - ghi lần lượt để không dùng chung file tạm
+        # và bản cache cũ hơn không ghi đè bản mới hơn
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self._entries, ensure_ascii=False)
+                self._dirty = 0
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+    def lookup(self, url, rule_signature):
+        """
+        Tìm kết quả đã cache của trang
+
+        Args:
+            url (str): URL trang
+            rule_signature (str): Site rule đang áp dụng - rule đổi thì mục cũ không còn dùng được
+
+        Returns:
+            tuple: (entry, fresh) - entry là None nếu chưa cache; fresh = False nếu đã hết hạn
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if not entry or entry.get('rule') != rule_signature or not entry.get('images'):
+                return None, False
+            return dict(entry), time.time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        Tạo headers request có điều kiện từ validator của trang đã cache
+
+        Args:
+            entry (dict): Mục cache
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since (rỗng nếu server không trả validator)
+        """
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_hit(self, url, revalidated=False):
+        """Ghi nhận dùng lại mục cache; mục vừa được server xác nhận (304) được gia hạn thêm TTL"""
+        with self._lock:
+            if revalidated:
+                self.stats['revalidated'] += 1
+                entry = self._entries.get(url)
+                if entry:
+                    entry['stored_at'] = time.time()
+                    self._dirty += 1
+            else:
+                self.stats['hits'] += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.stats['misses'] += 1
+
+    def store(self, url, images, discovery_path, rule_signature, validators=None):
+        """
+        Lưu kết quả tìm ảnh của trang
+
+        Args:
+            url (str): URL trang
+            images (list): Các link ảnh tìm được
+            discovery_path (str): Cách đã tìm ra ảnh (static / browser / browser_rule)
+            rule_signature (str): Site rule đã áp dụng
+            validators (dict): ETag / Last-Modified của trang (nếu có)
+        """
+        if not images:
+            return
+        validators = validators or {}
+
+        with self._lock:
+            self._entries[url] = {
+                'images': list(images),
+                'discovery_path': discovery_path,
+                'rule': rule_signature,
+                'etag': validators.get('etag'),
+                'last_modified': validators.get('last_modified'),
+                'stored_at': time.time(),
+            }
+            self.stats['stored'] += 1
+            # Lưu định kỳ để không mất cache khi app bị tắt giữa chừng
+            self._dirty += 1
+            needs_save = self._dirty >= 50
+
+        if needs_save:
+            # Lỗi ghi file cache không làm hỏng kết quả tìm ảnh của trang
+            try:
+                self.save()
+            except OSError as e:
+                if self.log:
+                    self.log(f"⚠️ Không lưu được cache tìm ảnh: {str(e)}")
+
+    def get_stats(self):
+        """
+        Thống kê cache cho báo cáo
+
+        Returns:
+            dict: hits, revalidated, misses, stored, lookups, hit_rate (%), entries
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        stats['lookups'] = stats['hits'] + stats['revalidated'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['revalidated']) / stats['lookups'] * 100 if stats['lookups'] else 0.0
+        return stats
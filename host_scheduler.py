@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module lập lịch download theo host: giới hạn request đồng thời mỗi host,
+delay tối thiểu giữa các request cùng host và xen kẽ các host (round-robin)
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+
+
+def get_host(url):
+    """
+    Lấy host (netloc) từ URL
+
+    Args:
+        url (str): URL cần phân tích
+
+    Returns:
+        str: Host viết thường, hoặc chuỗi rỗng nếu URL không hợp lệ
+    """
+    try:
+        return urlparse(str(url)).netloc.lower()
+    except Exception:
+        return ""
+
+
+class HostScheduler:
+    """Hàng đợi thay thế queue.Queue cho download_queue, phân phối task theo host"""
+
+    def __init__(self, max_per_host=4, min_delay=0.0):
+        """
+        Khởi tạo scheduler
+
+        Args:
+            max_per_host (int): Số request đang chạy tối đa cho mỗi host (0 = không giới hạn)
+            min_delay (float): Khoảng cách tối thiểu (giây) giữa 2 lần gửi request tới cùng host
+        """
+        self.max_per_host = max_per_host
+        self.min_delay = min_delay
+
+        self._cond = threading.Condition()
+        self._control = deque()         # Task đặc biệt (None) luôn được trả trước
+        self._pending = OrderedDict()   # host -> deque task
+        self._in_flight = {}            # host -> số task đang xử lý
+        self._next_allowed = {}         # host -> thời điểm sớm nhất được gửi tiếp
+        self._was_blocked = set()       # host có task phải chờ vì giới hạn
+        self._leases = {}               # thread id -> host đang xử lý
+        self._unfinished = 0
+        self._stats = {}
+
+    def configure(self, max_per_host=None, min_delay=None):
+        """Cập nhật giới hạn mỗi host (áp dụng ngay cho các task tiếp theo)"""
+        with self._cond:
+            if max_per_host is not None:
+                self.max_per_host = max(0, int(max_per_host))
+            if min_delay is not None:
+                self.min_delay = max(0.0, float(min_delay))
+            self._cond.notify_all()
+
+    def reset_stats(self):
+        """Xóa thống kê theo host (gọi khi bắt đầu lần crawl mới)"""
+        with self._cond:
+            self._stats = {}
+
+    def _host_stats(self, host):
+        if host not in self._stats:
+            self._stats[host] = {'dispatched': 0, 'blocked': 0, 'throttled': 0, 'peak_in_flight': 0}
+        return self._stats[host]
+
+    def put(self, task, block=True, timeout=None):
+        """Thêm task (link, save_dir, product_code, ...) vào hàng đợi của host tương ứng"""
+        with self._cond:
+            if task is None:
+                self._control.append(task)
+            else:
+                host = get_host(task[0])
+                self._pending.setdefault(host, deque()).append(task)
+            self._unfinished += 1
+            self._cond.notify()
+
+    def _is_ready(self, host, now):
+        if self.max_per_host and self._in_flight.get(host, 0) >= self.max_per_host:
+            return False
+        return now >= self._next_allowed.get(host, 0)
+
+    def _pop_ready(self):
+        """Lấy task của host kế tiếp theo vòng round-robin, trả về (có task, task, thời gian chờ gợi ý)"""
+        if self._control:
+            return True, self._control.popleft(), None
+
+        now = time.monotonic()
+        wait = None
+        for host in list(self._pending.keys()):
+            tasks = self._pending[host]
+            if self._is_ready(host, now):
+                task = tasks.popleft()
+                # Đưa host xuống cuối vòng để xen kẽ các host
+                if tasks:
+                    self._pending.move_to_end(host)
+                else:
+                    del self._pending[host]
+                self._dispatch(host, now)
+                return True, task, None
+
+            self._was_blocked.add(host)
+            if not self.max_per_host or self._in_flight.get(host, 0) < self.max_per_host:
+                host_wait = self._next_allowed.get(host, 0) - now
+                wait = host_wait if wait is None else min(wait, host_wait)
+
+        return False, None, wait
+
+    def _dispatch(self, host, now):
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        if self.min_delay:
+            self._next_allowed[host] = max(self._next_allowed.get(host, 0), now + self.min_delay)
+
+        stats = self._host_stats(host)
+        stats['dispatched'] += 1
+        stats['peak_in_flight'] = max(stats['peak_in_flight'], self._in_flight[host])
+        if host in self._was_blocked:
+            stats['blocked'] += 1
+            self._was_blocked.discard(host)
+
+        self._leases[threading.get_ident()] = host
+
+    def get(self, block=True, timeout=None):
+        """Lấy task sẵn sàng tiếp theo, raise queue.Empty nếu hết thời gian chờ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                found, task, wait = self._pop_ready()
+                if found:
+                    return task
+                if not block:
+                    raise queue.Empty
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        """Đánh dấu task của thread hiện tại đã xong và giải phóng slot của host"""
+        with self._cond:
+            host = self._leases.pop(threading.get_ident(), None)
+            if host is not None and self._in_flight.get(host, 0) > 0:
+                self._in_flight[host] -= 1
+            if self._unfinished <= 0:
+                raise ValueError('task_done() called too many times')
+            self._unfinished -= 1
+            self._cond.notify_all()
+
+    def try_send(self, url):
+        """
+        Cho engine asyncio (không lấy task từ scheduler): kiểm tra delay tối thiểu / lùi do 429-503 của host
+        và đặt chỗ lần gửi nếu tới lượt. Số request đồng thời mỗi host do connector aiohttp giới hạn
+
+        Args:
+            url (str): URL sắp gửi request
+
+        Returns:
+            float: 0 nếu được gửi ngay (đã tính vào thống kê host), ngược lại số giây cần chờ rồi gọi lại
+        """
+        host = get_host(url)
+        with self._cond:
+            now = time.monotonic()
+            wait = self._next_allowed.get(host, 0) - now
+            if wait > 0:
+                self._was_blocked.add(host)
+                return wait
+
+            if self.min_delay:
+                self._next_allowed[host] = now + self.min_delay
+            stats = self._host_stats(host)
+            stats['dispatched'] += 1
+            if host in self._was_blocked:
+                stats['blocked'] += 1
+                self._was_blocked.discard(host)
+            return 0.0
+
+    def switch_host(self, url):
+        """
+        Chuyển slot của thread hiện tại sang host thật sự được gọi khi khác host của task
+        (vd link trang web nhưng ảnh nằm trên CDN): trả slot host cũ rồi chờ tới lượt host mới
+        theo cùng giới hạn request đồng thời / delay. Thread không giữ slot (không lấy task
+        từ scheduler) thì bỏ qua
+
+        Args:
+            url (str): URL sắp được download
+
+        Returns:
+            bool: True nếu đã chuyển slot sang host mới
+        """
+        host = get_host(url)
+        ident = threading.get_ident()
+        with self._cond:
+            previous = self._leases.get(ident)
+            if previous is None or previous == host:
+                return False
+
+            # Trả slot cũ trước khi chờ để thread không giữ 2 slot cùng lúc
+            del self._leases[ident]
+            if self._in_flight.get(previous, 0) > 0:
+                self._in_flight[previous] -= 1
+            self._cond.notify_all()
+
+            while True:
+                now = time.monotonic()
+                if self._is_ready(host, now):
+                    self._dispatch(host, now)
+                    return True
+                self._was_blocked.add(host)
+                wait = None
+                if not self.max_per_host or self._in_flight.get(host, 0) < self.max_per_host:
+                    wait = self._next_allowed.get(host, 0) - now
+                self._cond.wait(wait)
+
+    def join(self):
+        """Chờ tới khi mọi task đã put đều được task_done"""
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def clear(self):
+        """Bỏ tất cả task đang chờ (dùng khi dừng crawl)"""
+        with self._cond:
+            dropped = sum(len(tasks) for tasks in self._pending.values()) + len(self._control)
+            self._pending.clear()
+            self._control.clear()
+            self._was_blocked.clear()
+            self._unfinished -= dropped
+            self._cond.notify_all()
+            return dropped
+
+    def empty(self):
+        with self._cond:
+            return not self._control and not self._pending
+
+    def qsize(self):
+        with self._cond:
+            return len(self._control) + sum(len(tasks) for tasks in self._pending.values())
+
+    def record_throttled(self, url, retry_after=None):
+        """
+        Ghi nhận host trả về 429/503 và lùi lần gửi tiếp theo tới host đó
+
+        Args:
+            url (str): URL (hoặc host) bị throttle
+            retry_after (float): Số giây server yêu cầu chờ (nếu có)
+        """
+        host = get_host(url) if '://' in str(url) else str(url).lower()
+        pause = retry_after if retry_after is not None else max(self.min_delay, 1.0)
+        with self._cond:
+            self._host_stats(host)['throttled'] += 1
+            self._next_allowed[host] = max(self._next_allowed.get(host, 0), time.monotonic() + pause)
+
+    def host_stats(self):
+        """
+        Thống kê theo host
+
+        Returns:
+            dict: host -> {'dispatched', 'blocked', 'throttled', 'peak_in_flight'}
+        """
+        with self._cond:
+            return {host: dict(stats) for host, stats in self._stats.items()}
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module cache HTTP trên đĩa cho ảnh đã download: lưu body kèm ETag / Last-Modified
+để lần chạy sau gửi request có điều kiện (If-None-Match / If-Modified-Since)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ImageHttpCache:
+    INDEX_FILENAME = "index.json"
+
+    def __init__(self, cache_dir, max_bytes=500 * 1024 * 1024):
+        """
+        Khởi tạo cache và đọc index từ đĩa (nếu có)
+
+        Args:
+            cache_dir (str): Thư mục chứa cache (thường là <thư mục lưu>/.http_cache)
+            max_bytes (int): Dung lượng tối đa của cache, vượt quá sẽ xóa mục ít dùng nhất (LRU)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, self.INDEX_FILENAME)
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # Thứ tự các key trong _entries là thứ tự LRU (ít dùng nhất ở đầu), _total_size là tổng 'size'
+        self._entries = {}
+        self._total_size = 0
+        self._dirty = 0
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0,
+                      'skipped_encodes': 0, 'bytes_saved': 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load()
+
+    @staticmethod
+    def cache_key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    def load(self):
+        """Đọc index từ đĩa, bỏ qua mục không còn file body"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+        entries = sorted(((key, entry) for key, entry in entries.items() if os.path.exists(self._body_path(key))),
+                         key=lambda item: item[1].get('last_access', 0))
+        with self._lock:
+            self._entries = dict(entries)
+            self._total_size = sum(entry['size'] for entry in self._entries.values())
+
+    def save(self):
+        """Ghi index xuống đĩa (ghi file tạm rồi thay thế để không hỏng index)"""
+        # Các luồng download cùng gọi save() - ghi lần lượt để không dùng chung file tạm
+        # và bản index cũ hơn không ghi đè bản mới hơn
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self._entries, ensure_ascii=False)
+                self._dirty = 0
+
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+
+    def _mark_dirty(self):
+        # Lưu index định kỳ để không mất cache khi app bị tắt giữa chừng
+        self._dirty += 1
+        return self._dirty >= 50
+
+    def conditional_headers(self, url):
+        """
+        Tạo headers request có điều kiện cho URL đã có trong cache
+
+        Args:
+            url (str): URL ảnh
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since (rỗng nếu chưa cache)
+        """
+        with self._lock:
+            entry = self._entries.get(self.cache_key(url))
+            if not entry:
+                return {}
+
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def get_body(self, url):
+        """
+        Lấy body đã cache sau khi server trả 304 Not Modified
+
+        Args:
+            url (str): URL ảnh
+
+        Returns:
+            bytes: Nội dung ảnh, hoặc None nếu cache không còn
+        """
+        key = self.cache_key(url)
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                content = f.read()
+        except OSError:
+            with self._lock:
+                self._remove_locked(key)
+            return None
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                entry['last_access'] = time.time()
+                self._entries[key] = entry
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += len(content)
+        return content
+
+    def store(self, url, headers, content):
+        """
+        Lưu response 200 vào cache nếu server có trả validator (ETag / Last-Modified)
+
+        Args:
+            url (str): URL ảnh
+            headers (Mapping): Response headers
+            content (bytes): Body của response
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+
+        with self._lock:
+            self.stats['misses'] += 1
+        if not etag and not last_modified:
+            return
+        if self.max_bytes and len(content) > self.max_bytes:
+            return
+
+        key = self.cache_key(url)
+        tmp_path = self._body_path(key) + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, self._body_path(key))
+
+        with self._lock:
+            self._remove_locked(key)
+            self._total_size += len(content)
+            self._entries[key] = {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'size': len(content),
+                'last_access': time.time(),
+                'output_signature': None,
+            }
+            self.stats['stored'] += 1
+            self._evict_locked()
+            needs_save = self._mark_dirty()
+
+        if needs_save:
+            self.save()
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._total_size -= entry['size']
+        return entry
+
+    def _evict_locked(self):
+        """Xóa các mục ít được dùng nhất (đầu _entries) tới khi tổng dung lượng <= max_bytes"""
+        if not self.max_bytes:
+            return
+
+        while self._total_size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+            self._remove_locked(key)
+            self.stats['evicted'] += 1
+
+    def output_matches(self, url, signature):
+        """Kiểm tra file output đã được tạo từ body này với cùng cấu hình xử lý chưa"""
+        with self._lock:
+            entry = self._entries.get(self.cache_key(url))
+            return bool(entry) and entry.get('output_signature') == signature
+
+    def record_output(self, url, signature):
+        """Ghi nhận cấu hình xử lý đã dùng để tạo file output từ body đã cache"""
+        with self._lock:
+            entry = self._entries.get(self.cache_key(url))
+            if entry:
+                entry['output_signature'] = signature
+                self._mark_dirty()
+
+    def record_skipped_encode(self):
+        with self._lock:
+            self.stats['skipped_encodes'] += 1
+
+    def get_stats(self):
+        """
+        Thống kê cache cho báo cáo
+
+        Returns:
+            dict: hits, misses, stored, evicted, skipped_encodes, bytes_saved, entries, size_bytes
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['size_bytes'] = self._total_size
+            return stats
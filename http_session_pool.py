@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module quản lý HTTP session dùng chung (keep-alive) cho các worker download
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Headers mặc định dùng chung cho mọi request (bypass 403 Forbidden)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Referer': 'https://www.fotekexpress.com/',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+def build_counting_pool_classes(adapter):
+    """
+    Tạo các lớp connection pool đếm số lần mở kết nối (handshake) thực tế
+
+    Args:
+        adapter (CountingHTTPAdapter): Adapter nhận số liệu đếm
+
+    Returns:
+        dict: Mapping scheme -> lớp connection pool
+    """
+    class CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            adapter.count_connection()
+            return super().connect()
+
+    class CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            adapter.count_connection()
+            return super().connect()
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {'http': CountingHTTPConnectionPool, 'https': CountingHTTPSConnectionPool}
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter đếm số request và số kết nối mở mới để thống kê tái sử dụng kết nối"""
+
+    def __init__(self, *args, **kwargs):
+        self.num_requests = 0
+        self.num_connections = 0
+        self._count_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = build_counting_pool_classes(self)
+
+    def count_connection(self):
+        with self._count_lock:
+            self.num_connections += 1
+
+    def send(self, request, **kwargs):
+        with self._count_lock:
+            self.num_requests += 1
+        return super().send(request, **kwargs)
+
+    def connection_counts(self):
+        """
+        Đếm số request và số kết nối mới đã tạo qua adapter
+
+        Returns:
+            tuple: (num_requests, num_connections)
+        """
+        with self._count_lock:
+            return self.num_requests, self.num_connections
+
+
+class HttpSessionPool:
+    def __init__(self, pool_maxsize=10, pool_connections=10, headers=None):
+        """
+        Khởi tạo pool session, mỗi worker thread có một session keep-alive riêng
+
+        Args:
+            pool_maxsize (int): Số kết nối tối đa giữ lại cho mỗi host
+            pool_connections (int): Số host được giữ connection pool cùng lúc
+            headers (dict): Headers mặc định (nếu None thì dùng DEFAULT_HEADERS)
+        """
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.pool_connections = max(1, int(pool_connections))
+        self.headers = dict(headers or DEFAULT_HEADERS)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def create_session(self):
+        """
+        Tạo một requests.Session mới với adapter đếm kết nối
+
+        Returns:
+            requests.Session: Session đã cấu hình headers và pool
+        """
+        session = requests.Session()
+        session.headers.update(self.headers)
+
+        adapter = CountingHTTPAdapter(pool_connections=self.pool_connections,
+                                      pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.counting_adapter = adapter
+        return session
+
+    def get_session(self):
+        """
+        Lấy session của thread hiện tại (tạo mới nếu chưa có)
+
+        Returns:
+            requests.Session: Session keep-alive dành riêng cho thread
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self.create_session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def release_session(self):
+        """Đóng session của thread hiện tại khi worker dừng (vẫn giữ số liệu cho thống kê)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            return
+        self._local.session = None
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def connection_stats(self):
+        """
+        Thống kê tái sử dụng kết nối của tất cả session
+
+        Returns:
+            dict: requests, new_connections, reused_connections, reuse_rate, sessions
+        """
+        with self._lock:
+            sessions = list(self._sessions)
+
+        total_requests = 0
+        total_connections = 0
+        for session in sessions:
+            num_requests, num_connections = session.counting_adapter.connection_counts()
+            total_requests += num_requests
+            total_connections += num_connections
+
+        reused = max(0, total_requests - total_connections)
+        reuse_rate = (reused / total_requests * 100) if total_requests > 0 else 0
+
+        return {
+            'requests': total_requests,
+            'new_connections': total_connections,
+            'reused_connections': reused,
+            'reuse_rate': reuse_rate,
+            'sessions': len(sessions),
+        }
+
+    def close(self):
+        """Đóng tất cả session và giải phóng kết nối"""
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions = []
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
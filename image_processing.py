@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module xử lý ảnh (decode, chèn nền trắng, encode WebP) chạy trên process pool riêng thay vì
+trong luồng download: công việc Pillow nặng CPU không còn tranh GIL với network I/O.
+Worker chỉ gửi bytes ảnh gốc sang process con; process con tự ghi file WebP và chỉ trả về
+dung lượng + thời gian xử lý (không gửi ảnh đã encode ngược lại)
+"""
+
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+PROCESSING_PRODUCT = 'product'
+
+VARIANT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Preset encode WebP: method 0 (nhanh nhất) .. 6 (nén kỹ nhất, chậm); với lossless, quality là mức công sức nén.
+# balanced cho đúng file như cấu hình cũ quality=85 (method mặc định 4)
+PRESET_FAST = 'fast'
+PRESET_BALANCED = 'balanced'
+PRESET_SMALLEST = 'smallest'
+PRESET_LOSSLESS = 'lossless'
+WEBP_PRESETS = {
+    PRESET_FAST: {'quality': 85, 'method': 0, 'lossless': False},
+    PRESET_BALANCED: {'quality': 85, 'method': 4, 'lossless': False},
+    PRESET_SMALLEST: {'quality': 75, 'method': 6, 'lossless': False},
+    PRESET_LOSSLESS: {'quality': 80, 'method': 4, 'lossless': True},
+}
+
+
+def parse_size_variants(text):
+    """
+    Đọc cấu hình biến thể kích thước ảnh output
+
+    Args:
+        text (str): Dạng "tên:cạnh_tối_đa" cách nhau dấu phẩy, vd "thumb:300, zoom:2000" (rỗng = không tạo)
+
+    Returns:
+        list: Các (tên, cạnh dài nhất px) theo thứ tự cấu hình
+
+    Raises:
+        ValueError: Cấu hình sai định dạng / trùng tên
+    """
+    variants = []
+    for part in (text or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, side = part.partition(':')
+        name = name.strip()
+        if not VARIANT_NAME_PATTERN.match(name):
+            raise ValueError(f"Tên biến thể không hợp lệ: '{name}' (chỉ dùng chữ, số, '-' và '_')")
+        if name in [existing for existing, _ in variants]:
+            raise ValueError(f"Trùng tên biến thể: '{name}'")
+        try:
+            side = int(side.strip())
+        except ValueError:
+            raise ValueError(f"Biến thể '{name}' thiếu cạnh tối đa (px), vd {name}:300")
+        if side <= 0:
+            raise ValueError(f"Cạnh tối đa của biến thể '{name}' phải lớn hơn 0")
+        variants.append((name, side))
+    return variants
+
+
+def has_transparency(img):
+    """
+    Kiểm tra ảnh có pixel trong suốt thật hay không (chỉ khi đó mới cần chèn nền trắng)
+
+    Args:
+        img (PIL.Image.Image): Ảnh gốc
+
+    Returns:
+        bool: True nếu ảnh có khóa màu trong suốt (info "transparency") hoặc kênh alpha có pixel < 255
+    """
+    if 'transparency' in img.info:
+        return True
+    bands = img.getbands()
+    for alpha_band in ('A', 'a'):
+        if alpha_band in bands:
+            # Kênh alpha toàn 255 (PNG RGBA nhưng đục hoàn toàn) - chèn nền trắng không đổi gì
+            return img.getchannel(alpha_band).getextrema()[0] < 255
+    return False
+
+
+def flatten_on_white(img):
+    """
+    Đưa ảnh về RGB nền trắng; ảnh không trong suốt (JPEG...) convert thẳng sang RGB,
+    không tạo canvas trắng và bản RGBA
+
+    Args:
+        img (PIL.Image.Image): Ảnh gốc
+
+    Returns:
+        tuple: (ảnh RGB, True nếu đã chèn nền trắng / False nếu bỏ qua)
+    """
+    if not has_transparency(img):
+        return (img if img.mode == 'RGB' else img.convert('RGB')), False
+    return composite_on_white(img), True
+
+
+def composite_on_white(img):
+    """
+    Chèn ảnh lên nền trắng, giữ nguyên kích thước
+
+    Args:
+        img (PIL.Image.Image): Ảnh gốc
+
+    Returns:
+        PIL.Image.Image: Ảnh RGB nền trắng
+    """
+    # Tạo ảnh nền trắng với kích thước gốc
+    white_bg = Image.new('RGB', img.size, (255, 255, 255))
+
+    # Convert ảnh gốc sang RGBA nếu cần rồi paste lên nền trắng (alpha làm mask)
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    white_bg.paste(img, (0, 0), img)
+    return white_bg
+
+
+def limit_image_size(img, max_side):
+    """
+    Thu nhỏ ảnh để cạnh dài nhất không vượt max_side (giữ tỷ lệ). Ảnh JPEG được decode luôn ở
+    1/2, 1/4, 1/8 kích thước gốc (draft - DCT scaling) nên ảnh 6000px không bao giờ phải decode đầy đủ,
+    sau đó resize LANCZOS tới kích thước đích
+
+    Args:
+        img (PIL.Image.Image): Ảnh vừa mở (chưa load pixel)
+        max_side (int): Cạnh dài nhất tối đa (px), 0 = giữ nguyên
+
+    Returns:
+        tuple: (ảnh, True nếu đã thu nhỏ)
+    """
+    if not max_side or max(img.size) <= max_side:
+        return img, False
+
+    scale = max_side / max(img.size)
+    target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+
+    if img.format == 'JPEG':
+        # Giữ ảnh decode >= 2 lần kích thước đích để resize LANCZOS vẫn nét
+        img.draft(None, (target[0] * 2, target[1] * 2))
+
+    # Ảnh palette chỉ resize được kiểu NEAREST - chuyển sang RGB(A) trước
+    if img.mode in ('P', '1'):
+        img = img.convert('RGBA' if has_transparency(img) else 'RGB')
+
+    return img.resize(target, Image.LANCZOS, reducing_gap=2.0), True
+
+
+def prepare_image(img, processing, decode_side=0):
+    """
+    Decode ảnh ở kích thước cần dùng, chèn nền trắng (chế độ "product") và đưa về RGB
+
+    Args:
+        img (PIL.Image.Image): Ảnh vừa mở (chưa load pixel)
+        processing (str): Chế độ xử lý ảnh
+        decode_side (int): Cạnh dài nhất lớn nhất mà các output cần (px), 0 = kích thước gốc
+
+    Returns:
+        tuple: (ảnh, True nếu bỏ qua chèn nền trắng vì ảnh không trong suốt, cảnh báo hoặc None)
+    """
+    warning = None
+    composite_skipped = False
+    img, _ = limit_image_size(img, decode_side)
+
+    if processing == PROCESSING_PRODUCT:
+        try:
+            img, composited = flatten_on_white(img)
+            composite_skipped = not composited
+        except Exception as e:
+            # Giữ ảnh gốc nếu không chèn được nền trắng
+            warning = f"Lỗi khi xử lý ảnh sản phẩm: {str(e)}"
+
+    # Convert RGBA sang RGB nếu cần
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    return img, composite_skipped, warning
+
+
+def can_passthrough(img, max_side=0):
+    """
+    Ảnh nguồn dùng được nguyên bytes làm output: đã là WebP tĩnh, không có pixel trong suốt
+    (không cần chèn nền trắng / bỏ alpha) và không vượt cạnh tối đa
+
+    Args:
+        img (PIL.Image.Image): Ảnh vừa mở
+        max_side (int): Cạnh dài nhất tối đa (px), 0 = không giới hạn
+
+    Returns:
+        bool: True nếu ghi thẳng bytes gốc được
+    """
+    if img.format != 'WEBP' or getattr(img, 'n_frames', 1) > 1:
+        return False
+    if max_side and max(img.size) > max_side:
+        return False
+    return not has_transparency(img)
+
+
+def save_webp(img, filepath, max_side=0, preset=PRESET_BALANCED):
+    """Thu nhỏ (nếu cần) và lưu ảnh RGB đã xử lý thành WebP theo preset, trả về dung lượng file"""
+    img, _ = limit_image_size(img, max_side)
+    img.save(filepath, 'WEBP', **WEBP_PRESETS.get(preset, WEBP_PRESETS[PRESET_BALANCED]))
+    return os.path.getsize(filepath)
+
+
+def encode_image_file(content, filepath, processing, max_side=0, variants=(), preset=PRESET_BALANCED,
+                      passthrough=False):
+    """
+    Decode bytes ảnh, xử lý theo chế độ và lưu WebP (chạy trong process con hoặc ngay trong luồng gọi)
+
+    Args:
+        content (bytes): Bytes ảnh gốc đã download
+        filepath (str): Đường dẫn file WebP output
+        processing (str): Chế độ xử lý ảnh ("product" = chèn nền trắng, "normal")
+        max_side (int): Cạnh dài nhất tối đa của ảnh output (px), 0 = giữ nguyên kích thước
+        variants (iterable): Các biến thể kích thước (đường dẫn file, cạnh dài nhất px) tạo từ cùng một lần decode
+        preset (str): Preset encode WebP (key của WEBP_PRESETS)
+        passthrough (bool): Ghi nguyên bytes gốc cho ảnh chính nếu nguồn đã là WebP phù hợp (can_passthrough)
+
+    Returns:
+        dict: {'file_size', 'variant_sizes' (dung lượng từng biến thể), 'busy' (giây xử lý),
+              'composite_skipped' (ảnh không trong suốt, không cần chèn nền trắng),
+              'resized' (ảnh chính đã thu nhỏ theo max_side), 'passthrough' (ảnh chính giữ nguyên bytes gốc),
+              'warning' (lỗi chèn nền trắng hoặc None)}
+    """
+    started = time.perf_counter()
+    warning = None
+    composite_skipped = False
+    img = Image.open(io.BytesIO(content))
+    resized = bool(max_side) and max(img.size) > max_side
+
+    outputs = [(filepath, max_side)] + list(variants)
+    passed = passthrough and can_passthrough(img, max_side)
+    if passed:
+        # Nguồn đã là WebP đúng yêu cầu - encode lại chỉ tốn CPU và giảm chất lượng
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        outputs = outputs[1:]
+
+    sizes = []
+    if outputs:
+        # Decode một lần ở kích thước lớn nhất cần dùng (ảnh chính / biến thể), thu nhỏ trước khi
+        # chèn nền trắng / encode để các bước sau chỉ xử lý ảnh nhỏ
+        sides = [side for _, side in outputs]
+        decode_side = max(sides) if all(sides) else 0
+        img, composite_skipped, warning = prepare_image(img, processing, decode_side)
+
+        if len(outputs) == 1:
+            sizes = [save_webp(img, outputs[0][0], outputs[0][1], preset)]
+        else:
+            # Pillow nhả GIL khi resize / encode WebP - các biến thể được encode song song bằng thread
+            img.load()
+            with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+                sizes = list(executor.map(lambda output: save_webp(img, output[0], output[1], preset), outputs))
+
+    if passed:
+        sizes.insert(0, len(content))
+
+    return {'file_size': sizes[0], 'variant_sizes': sizes[1:], 'busy': time.perf_counter() - started,
+            'composite_skipped': composite_skipped, 'resized': resized, 'passthrough': passed, 'warning': warning}
+
+
+def benchmark_presets(samples, processing=PROCESSING_PRODUCT, max_side=0, presets=None):
+    """
+    Đo thời gian encode và dung lượng output của từng preset WebP trên cùng các ảnh mẫu
+    (ảnh được decode / chèn nền trắng một lần, chỉ tính thời gian encode)
+
+    Args:
+        samples (list): Bytes các ảnh mẫu
+        processing (str): Chế độ xử lý ảnh
+        max_side (int): Cạnh dài nhất tối đa (px), 0 = giữ nguyên kích thước
+        presets (iterable): Các preset cần đo (mặc định tất cả WEBP_PRESETS)
+
+    Returns:
+        list: Mỗi preset một dict {'preset', 'images', 'encode_time' (giây), 'bytes', 'source_bytes'}
+    """
+    prepared = []
+    source_bytes = 0
+    for content in samples:
+        try:
+            img, _, _ = prepare_image(Image.open(io.BytesIO(content)), processing, max_side)
+            img.load()
+        except Exception:
+            # Không phải ảnh decode được - bỏ qua mẫu này
+            continue
+        prepared.append(img)
+        source_bytes += len(content)
+
+    results = []
+    for preset in presets or WEBP_PRESETS:
+        encode_time = 0.0
+        total_bytes = 0
+        for img in prepared:
+            buffer = io.BytesIO()
+            started = time.perf_counter()
+            img.save(buffer, 'WEBP', **WEBP_PRESETS[preset])
+            encode_time += time.perf_counter() - started
+            total_bytes += buffer.tell()
+        results.append({'preset': preset, 'images': len(prepared), 'encode_time': encode_time,
+                        'bytes': total_bytes, 'source_bytes': source_bytes})
+    return results
+
+
+class ImageProcessingStage:
+    def __init__(self, workers=None, log=print):
+        """
+        Khởi tạo stage xử lý ảnh
+
+        Args:
+            workers (int): Số process xử lý ảnh (None = xử lý ngay trong luồng gọi, không tạo process)
+            log (callable): Hàm ghi log
+        """
+        self.workers = workers
+        self.log = log
+        self.executor = None
+
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._finished = None
+        self.stats = {'images': 0, 'inline': 0, 'busy': 0.0, 'queue_wait': 0.0, 'in_flight': 0, 'peak_in_flight': 0,
+                      'composite_skipped': 0, 'resized': 0, 'variants': 0, 'passthrough': 0}
+
+    def start(self):
+        """Tạo process pool (không tạo được thì xử lý ngay trong luồng download như trước)"""
+        if self.workers:
+            try:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            except (OSError, ValueError, NotImplementedError) as e:
+                self.log(f"⚠️ Không tạo được process pool xử lý ảnh, xử lý trong luồng download: {str(e)}")
+                self.executor = None
+        self._started = time.monotonic()
+        self._finished = None
+        return self
+
+    def process(self, content, filepath, processing, max_side=0, variants=(), preset=PRESET_BALANCED,
+                passthrough=False):
+        """
+        Xử lý và lưu một ảnh; luồng gọi chờ kết quả nhưng nhả GIL nên các luồng khác vẫn download
+
+        Args:
+            content (bytes): Bytes ảnh gốc
+            filepath (str): Đường dẫn file WebP output
+            processing (str): Chế độ xử lý ảnh
+            max_side (int): Cạnh dài nhất tối đa của ảnh output (px), 0 = giữ nguyên
+            variants (iterable): Các biến thể kích thước (đường dẫn file, cạnh dài nhất px)
+            preset (str): Preset encode WebP
+            passthrough (bool): Ghi nguyên bytes gốc nếu nguồn đã là WebP phù hợp
+
+        Returns:
+            tuple: (dung lượng file output, danh sách dung lượng từng biến thể) - bytes
+        """
+        submitted = time.perf_counter()
+        with self._lock:
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+
+        try:
+            executor = self.executor
+            future = None
+            result = None
+            if executor is not None:
+                try:
+                    future = executor.submit(encode_image_file, content, filepath, processing, max_side, variants,
+                                             preset, passthrough)
+                except RuntimeError as e:
+                    # Pool đã đóng hoặc đã hỏng (BrokenProcessPool cũng là RuntimeError)
+                    self._abandon(executor, e)
+            if future is not None:
+                try:
+                    # Lỗi của chính ảnh (file hỏng...) được ném tiếp cho luồng download như một ảnh lỗi
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # Process con bị kill - ảnh này và các ảnh còn lại xử lý trong luồng download
+                    self._abandon(executor, e)
+            if result is None:
+                result = encode_image_file(content, filepath, processing, max_side, variants, preset, passthrough)
+                with self._lock:
+                    self.stats['inline'] += 1
+        finally:
+            with self._lock:
+                self.stats['in_flight'] -= 1
+
+        with self._lock:
+            self.stats['images'] += 1
+            self.stats['busy'] += result['busy']
+            self.stats['composite_skipped'] += int(result['composite_skipped'])
+            self.stats['resized'] += int(result['resized'])
+            self.stats['variants'] += len(result['variant_sizes'])
+            self.stats['passthrough'] += int(result['passthrough'])
+            self.stats['queue_wait'] += max(0.0, time.perf_counter() - submitted - result['busy'])
+
+        if result['warning']:
+            self.log(result['warning'])
+        return result['file_size'], result['variant_sizes']
+
+    def _abandon(self, executor, error):
+        """Bỏ process pool bị lỗi: các ảnh sau xử lý trong luồng download, pool cũ được shutdown"""
+        with self._lock:
+            if self.executor is not executor:
+                return
+            self.executor = None
+        self.log(f"⚠️ Process pool xử lý ảnh bị lỗi, chuyển sang xử lý trong luồng download: {str(error)}")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Đóng process pool (chờ các ảnh đang xử lý xong)"""
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if self._finished is None:
+            self._finished = time.monotonic()
+
+    def get_stats(self):
+        """
+        Thống kê stage cho báo cáo
+
+        Returns:
+            dict: workers, images, inline, busy, avg_busy, avg_queue_wait, peak_in_flight, composite_skipped,
+                  resized, variants, passthrough, elapsed, utilization (% thời gian các process bận)
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        elapsed = (self._finished or time.monotonic()) - self._started
+        slots = self.workers or 1
+        stats['workers'] = self.workers or 0
+        stats['elapsed'] = elapsed
+        stats['avg_busy'] = stats['busy'] / stats['images'] if stats['images'] else 0.0
+        stats['avg_queue_wait'] = stats['queue_wait'] / stats['images'] if stats['images'] else 0.0
+        stats['utilization'] = min(100.0, stats['busy'] / (elapsed * slots) * 100) if elapsed > 0 else 0.0
+        return stats
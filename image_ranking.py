@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module xếp hạng ảnh ứng viên tìm được trên trang để chọn ảnh sản phẩm chính mà không cần
+download tất cả: chấm điểm theo nguồn (og:image, srcset, lazy-load...), kích thước hiển thị /
+srcset / kích thước trong URL và từ khóa trong URL (logo, icon, sprite...). Ảnh chưa biết kích
+thước có thể được đọc header ảnh bằng request Range nhỏ
+"""
+
+import math
+import re
+
+from PIL import ImageFile
+
+# Điểm theo nguồn của link ảnh trong trang
+SOURCE_SCORES = {
+    'meta': 3.0,        # og:image / twitter:image - thường chính là ảnh sản phẩm
+    'lazy': 1.0,        # data-src, data-zoom-image... - ảnh thật của gallery
+    'srcset': 1.0,
+    'img': 0.5,
+    'source': 0.5,
+    'background': -1.0,  # ảnh nền CSS - thường là banner / trang trí
+}
+
+NEGATIVE_KEYWORDS = ('logo', 'icon', 'sprite', 'banner', 'avatar', 'badge', 'payment', 'social', 'facebook',
+                     'twitter', 'zalo', 'flag', 'rating', 'star', 'arrow', 'btn', 'button', 'loading', 'favicon')
+POSITIVE_KEYWORDS = ('product', 'zoom', 'large', 'original', 'full', 'main', 'gallery', 'master', 'detail', 'hero')
+
+# Kích thước trong URL: ..._800x800.jpg, /1200x1200/, ?w=1000, &width=800
+URL_SIZE_PATTERN = re.compile(r'(?<!\d)(\d{2,4})x(\d{2,4})(?!\d)')
+URL_WIDTH_PATTERN = re.compile(r'[?&/_-](?:w|width)[=_-]?(\d{2,4})(?!\d)', re.IGNORECASE)
+
+REFERENCE_AREA = 300 * 300
+TINY_SIDE = 100
+
+PROBE_BYTES = 64 * 1024
+
+
+def new_candidate(url, source, width=0, height=0, srcset_width=0):
+    """
+    Tạo ứng viên ảnh
+
+    Args:
+        url (str): Link ảnh tuyệt đối
+        source (str): Nguồn trong trang (key của SOURCE_SCORES)
+        width (int): Chiều rộng đã biết (hiển thị / naturalWidth / thuộc tính width), 0 nếu chưa biết
+        height (int): Chiều cao đã biết, 0 nếu chưa biết
+        srcset_width (int): Descriptor "w" trong srcset, 0 nếu không có
+
+    Returns:
+        dict: {'url', 'source', 'width', 'height', 'srcset_width'}
+    """
+    return {'url': url, 'source': source, 'width': int(width or 0), 'height': int(height or 0),
+            'srcset_width': int(srcset_width or 0)}
+
+
+def merge_candidates(candidates):
+    """
+    Gộp ứng viên trùng URL (giữ thứ tự xuất hiện đầu tiên, nguồn điểm cao nhất, kích thước lớn nhất)
+
+    Args:
+        candidates (list): Các ứng viên (có thể trùng URL)
+
+    Returns:
+        list: Ứng viên không trùng URL
+    """
+    merged = {}
+    for candidate in candidates:
+        existing = merged.get(candidate['url'])
+        if existing is None:
+            merged[candidate['url']] = dict(candidate)
+            continue
+        if SOURCE_SCORES.get(candidate['source'], 0) > SOURCE_SCORES.get(existing['source'], 0):
+            existing['source'] = candidate['source']
+        for key in ('width', 'height', 'srcset_width'):
+            existing[key] = max(existing[key], candidate[key])
+    return list(merged.values())
+
+
+def known_size(candidate):
+    """
+    Kích thước tốt nhất đã biết của ứng viên
+
+    Returns:
+        tuple: (width, height) - 0 nếu chưa biết
+    """
+    width, height = candidate['width'], candidate['height']
+    if candidate['srcset_width'] > width:
+        # Chỉ biết chiều rộng từ srcset - giả định ảnh vuông như đa số ảnh sản phẩm
+        width = candidate['srcset_width']
+        height = height or width
+    if not width:
+        match = URL_SIZE_PATTERN.search(candidate['url'])
+        if match:
+            width, height = int(match.group(1)), int(match.group(2))
+        else:
+            match = URL_WIDTH_PATTERN.search(candidate['url'])
+            if match:
+                width = height = int(match.group(1))
+    return width, height or width
+
+
+def score_candidate(candidate, position=0):
+    """
+    Chấm điểm ứng viên (càng cao càng giống ảnh sản phẩm chính)
+
+    Args:
+        candidate (dict): Ứng viên ảnh
+        position (int): Thứ tự xuất hiện trong trang (ảnh xuất hiện trước được ưu tiên khi bằng điểm)
+
+    Returns:
+        float: Điểm
+    """
+    score = SOURCE_SCORES.get(candidate['source'], 0.0)
+
+    width, height = known_size(candidate)
+    if width and height:
+        if width < TINY_SIDE and height < TINY_SIDE:
+            score -= 5.0
+        else:
+            score += max(-4.0, min(4.0, math.log2(width * height / REFERENCE_AREA)))
+
+    url_lower = candidate['url'].lower()
+    score -= 3.0 * len([word for word in NEGATIVE_KEYWORDS if word in url_lower])
+    score += 1.5 * min(2, len([word for word in POSITIVE_KEYWORDS if word in url_lower]))
+
+    return score - 0.01 * position
+
+
+def probe_image_size(session, url, timeout=10, max_bytes=PROBE_BYTES):
+    """
+    Đọc kích thước ảnh từ header file bằng request Range (chỉ tải vài KB đầu)
+
+    Args:
+        session (requests.Session): Session keep-alive của worker
+        url (str): Link ảnh
+        timeout (int): Timeout (giây)
+        max_bytes (int): Số byte tối đa đọc
+
+    Returns:
+        tuple: (width, height), hoặc None nếu không đọc được
+    """
+    response = session.get(url, headers={'Range': f'bytes=0-{max_bytes - 1}'}, timeout=timeout, stream=True)
+    try:
+        if response.status_code not in (200, 206):
+            return None
+
+        # Server bỏ qua Range trả 200 - vẫn chỉ đọc max_bytes rồi đóng kết nối
+        parser = ImageFile.Parser()
+        received = 0
+        for chunk in response.iter_content(8 * 1024):
+            try:
+                parser.feed(chunk)
+            except Exception:
+                return None
+            if parser.image is not None:
+                return parser.image.size
+            received += len(chunk)
+            if received >= max_bytes:
+                break
+        return None
+    finally:
+        response.close()
+
+
+def rank_candidates(candidates, probe=None, probe_limit=4):
+    """
+    Xếp hạng ứng viên ảnh, tốt nhất trước
+
+    Args:
+        candidates (list): Các ứng viên (new_candidate), theo thứ tự xuất hiện trong trang
+        probe (callable): Hàm probe(url) -> (width, height) | None để đọc kích thước ảnh chưa biết
+        probe_limit (int): Số ứng viên đầu bảng chưa biết kích thước được probe tối đa
+
+    Returns:
+        tuple: (danh sách ứng viên đã xếp hạng, số lần probe)
+    """
+    candidates = merge_candidates(candidates)
+    positions = {candidate['url']: index for index, candidate in enumerate(candidates)}
+
+    def ranked():
+        return sorted(candidates, key=lambda c: -score_candidate(c, positions[c['url']]))
+
+    ordered = ranked()
+    probes = 0
+    if probe and probe_limit:
+        # Chỉ probe nhóm đầu bảng - ảnh xếp cuối không đáng tốn request
+        for candidate in ordered[:probe_limit * 2]:
+            if probes >= probe_limit:
+                break
+            if all(known_size(candidate)):
+                continue
+            probes += 1
+            try:
+                size = probe(candidate['url'])
+            except Exception:
+                size = None
+            if size:
+                candidate['width'], candidate['height'] = size
+        if probes:
+            ordered = ranked()
+    return ordered, probes
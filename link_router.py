@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module phân loại link: ảnh (download trực tiếp) hay trang web (cần tìm ảnh trên trang) dựa trên
+Content-Type thật của server (HEAD, hoặc GET Range 1 byte khi server không hỗ trợ HEAD) thay vì
+đoán theo đuôi file. Kết quả được nhớ theo host + mẫu đường dẫn (kể cả dạng tên file) để các link
+cùng dạng không phải hỏi lại server; link không có đuôi file chỉ được nhớ theo đúng URL
+"""
+
+import re
+import threading
+from urllib.parse import urlparse
+
+import requests
+
+ROUTE_IMAGE = 'image'
+ROUTE_PAGE = 'page'
+
+# Cách ra quyết định (thống kê trong báo cáo)
+DECIDED_PROBE = 'probe'
+DECIDED_PATTERN = 'pattern'
+DECIDED_HEURISTIC = 'heuristic'
+
+PAGE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+DIGITS_PATTERN = re.compile(r'\d+')
+LETTERS_PATTERN = re.compile(r'[^\W\d_]+')
+
+
+def url_pattern(url):
+    """
+    Mẫu của URL để nhớ quyết định: host + thư mục (số thay bằng #) + dạng tên file (chuỗi chữ thay
+    bằng "a", chuỗi số thay bằng #) kèm đuôi file
+
+    Ví dụ: https://cdn.shop.vn/img/2024/05/sp-123.jpg?w=800 -> ('cdn.shop.vn', '/img/#/#/', 'a-#.jpg')
+
+    Args:
+        url (str): URL
+
+    Returns:
+        tuple: (host, thư mục, dạng tên file), hoặc None nếu tên file không có đuôi - các link
+               /p/ao-thun và /p/anh-123 không đủ giống nhau để dùng chung một quyết định
+    """
+    parsed = urlparse(url)
+    directory, _, name = parsed.path.rpartition('/')
+    stem, dot, extension = name.lower().rpartition('.')
+    if not dot or not stem or not extension:
+        return None
+    shape = LETTERS_PATTERN.sub('a', DIGITS_PATTERN.sub('#', stem))
+    return (parsed.netloc.lower(), DIGITS_PATTERN.sub('#', directory) + '/', f"{shape}.{extension}")
+
+
+def classify_content_type(content_type):
+    """
+    Phân loại theo Content-Type
+
+    Returns:
+        str: ROUTE_IMAGE, ROUTE_PAGE hoặc None nếu không rõ
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type.startswith('image/'):
+        return ROUTE_IMAGE
+    if content_type in PAGE_CONTENT_TYPES:
+        return ROUTE_PAGE
+    return None
+
+
+class LinkRouter:
+    def __init__(self, get_session, heuristic, timeout=5):
+        """
+        Khởi tạo bộ phân loại link (mỗi lần crawl một bộ)
+
+        Args:
+            get_session (callable): Hàm trả về requests.Session của thread hiện tại
+            heuristic (callable): Hàm heuristic(url) -> True nếu đoán là ảnh (dùng khi server không trả lời rõ)
+            timeout (float): Timeout mỗi request kiểm tra (giây)
+        """
+        self.get_session = get_session
+        self.heuristic = heuristic
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._patterns = {}
+        self.stats = {DECIDED_PROBE: 0, DECIDED_PATTERN: 0, DECIDED_HEURISTIC: 0,
+                      'corrected': 0, 'reprobed': 0, 'images': 0, 'pages': 0}
+
+    def probe(self, url):
+        """
+        Hỏi server Content-Type của link
+
+        Returns:
+            str: ROUTE_IMAGE, ROUTE_PAGE hoặc None nếu không xác định được
+        """
+        session = self.get_session()
+        try:
+            response = session.head(url, timeout=self.timeout, allow_redirects=True)
+            route = classify_content_type(response.headers.get('Content-Type')) if response.ok else None
+            if route:
+                return route
+
+            # Server không hỗ trợ HEAD (405/403/501) hoặc không trả Content-Type - thử GET 1 byte
+            response = session.get(url, headers={'Range': 'bytes=0-0'}, timeout=self.timeout, stream=True)
+            try:
+                if response.status_code in (200, 206):
+                    return classify_content_type(response.headers.get('Content-Type'))
+            finally:
+                response.close()
+        except requests.exceptions.RequestException:
+            pass
+        return None
+
+    def route(self, url):
+        """
+        Phân loại link
+
+        Args:
+            url (str): Link trong input
+
+        Returns:
+            str: ROUTE_IMAGE hoặc ROUTE_PAGE
+        """
+        pattern = url_pattern(url)
+        with self._lock:
+            route = self._urls.get(url) or (self._patterns.get(pattern) if pattern else None)
+            if route:
+                self._count(route, DECIDED_PATTERN)
+                return route
+
+        guessed = ROUTE_IMAGE if self.heuristic(url) else ROUTE_PAGE
+        route = self.probe(url)
+
+        with self._lock:
+            if route:
+                self._urls[url] = route
+                if pattern:
+                    self._patterns[pattern] = route
+                if route != guessed:
+                    self.stats['corrected'] += 1
+                self._count(route, DECIDED_PROBE)
+                return route
+
+            self._count(guessed, DECIDED_HEURISTIC)
+            return guessed
+
+    def reprobe(self, url):
+        """
+        Quyết định đã nhớ tỏ ra sai khi download (vd link "ảnh" trả về HTML): bỏ quyết định của URL
+        và mẫu URL rồi hỏi lại server
+
+        Args:
+            url (str): Link trong input
+
+        Returns:
+            str: ROUTE_IMAGE / ROUTE_PAGE theo server, hoặc None nếu server không trả lời rõ
+        """
+        pattern = url_pattern(url)
+        with self._lock:
+            previous = self._urls.pop(url, None) or (self._patterns.get(pattern) if pattern else None)
+            if pattern and self._patterns.get(pattern) == previous:
+                self._patterns.pop(pattern, None)
+
+        route = self.probe(url)
+
+        with self._lock:
+            self.stats['reprobed'] += 1
+            if route:
+                self._urls[url] = route
+                if pattern:
+                    self._patterns[pattern] = route
+                if previous and route != previous:
+                    self.stats['corrected'] += 1
+        return route
+
+    def _count(self, route, decided_by):
+        self.stats[decided_by] += 1
+        self.stats['images' if route == ROUTE_IMAGE else 'pages'] += 1
+
+    def get_stats(self):
+        """
+        Thống kê cho báo cáo
+
+        Returns:
+            dict: probe, pattern, heuristic, corrected, reprobed, images, pages, patterns
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['patterns'] = len(self._patterns)
+        return stats
@@ -1,107 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
-import queue
 import os
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from PIL import Image, ImageOps
-import requests
-import io
 import time
-from urllib.parse import urlparse
-import re
-from datetime import datetime
-import zipfile
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from crawler_engine import CrawlerEngine, InvalidInputError
 
-class ImageNamingProcessor:
-    """Class xử lý đặt tên file ảnh theo logic từ JavaScript"""
-    
-    def __init__(self):
-        self.domain = "https://example.com/product/"
-        self.image_base = "https://cdn.example.com/images/"
-    
-    def standardize(self, text):
-        """Chuẩn hóa chuỗi theo logic từ JavaScript"""
-        if not text:
-            return ""
-        
-        # Thay ký tự không hợp lệ bằng '-'
-        standardized = re.sub(r'[\\/:*?"<>|,=\s]', '-', text)
-        
-        # Loại bỏ gạch ngang trùng
-        standardized = re.sub(r'-+', '-', standardized)
-        
-        # Chỉ giữ lại a-z, A-Z, 0-9, -, _
-        standardized = re.sub(r'[^a-zA-Z0-9\-_]', '', standardized)
-        
-        # Loại bỏ gạch đầu/cuối
-        standardized = re.sub(r'^-+|-+$', '', standardized)
-        
-        return standardized
-    
-    def process_product_code(self, code):
-        """Xử lý mã sản phẩm để tạo slug và image name"""
-        if not code:
-            return "", "", False
-        
-        # Kiểm tra có add-on kit không
-        had_addon_kit = bool(re.search(r'add[\s\-]*on[\s\-]*kit', code, re.IGNORECASE))
-        
-        # Làm sạch chuỗi, loại bỏ ghi chú coating, addon...
-        clean_code = code
-        clean_code = re.sub(r'\(with special coating\)', '', clean_code, flags=re.IGNORECASE)
-        clean_code = re.sub(r'\[with special coating\]', '', clean_code, flags=re.IGNORECASE)
-        clean_code = re.sub(r'add[\s\-]*on[\s\-]*kit', '', clean_code, flags=re.IGNORECASE)
-        clean_code = clean_code.strip()
-        
-        # Tạo slug (lowercase) và image name (uppercase)
-        slug = self.standardize(clean_code.lower())
-        if had_addon_kit:
-            slug += "-adk"
-        
-        image_name = self.standardize(clean_code.upper())
-        
-        return slug, image_name, had_addon_kit
-    
-    def generate_filename(self, code):
-        """Tạo tên file ảnh theo logic JavaScript"""
-        slug, image_name, had_addon = self.process_product_code(code)
-        return image_name + ".webp" if image_name else "unknown.webp"
-
-class ImageCrawlerApp:
+class ImageCrawlerApp(CrawlerEngine):
     def __init__(self, root):
+        super().__init__()
         self.root = root
+        self.max_worker_limit = 32
         self.root.title("Image Crawler - Cào Ảnh Tự Động")
         self.root.geometry("1000x700")
         self.root.configure(bg='#f0f0f0')
         
-        # Khởi tạo queue cho đa luồng
-        self.download_queue = queue.Queue()
-        self.worker_threads = []
-        self.max_workers = 5
-        self.is_crawling = False
-        
-        # Dữ liệu Excel để mapping mã sản phẩm
-        self.excel_data = None
-        self.product_codes = []  # List of all entries from Excel - no duplicate filtering
-        
-        # Result tracking system cho Excel reporting
-        self.results = []  # Detailed results for each entry
-        self.start_time = None
-        self.output_dir = None
-        
-        # Khởi tạo image naming processor
-        self.naming_processor = ImageNamingProcessor()
-        
         # Tạo giao diện
         self.create_widgets()
         
@@ -161,19 +74,21 @@ class ImageCrawlerApp:
         config_frame.columnconfigure(1, weight=1)
         
         ttk.Label(config_frame, text="Số luồng xử lý:").grid(row=0, column=0, sticky=tk.W)
-        self.thread_count = tk.StringVar(value="5")
-        thread_spinbox = ttk.Spinbox(config_frame, from_=1, to=10, textvariable=self.thread_count, width=10)
+        self.thread_count = tk.StringVar(value=self.thread_count.get())
+        thread_spinbox = ttk.Spinbox(config_frame, from_=1, to=self.max_worker_limit, textvariable=self.thread_count, width=10)
         thread_spinbox.grid(row=0, column=1, sticky=tk.W, padx=(10, 0))
+        # Đổi số luồng khi đang crawl sẽ tăng/giảm worker ngay
+        self.thread_count.trace_add('write', self.on_thread_count_changed)
         
         ttk.Label(config_frame, text="Thư mục lưu:").grid(row=1, column=0, sticky=tk.W, pady=(10, 0))
-        self.save_path = tk.StringVar(value="./downloaded_images")
+        self.save_path = tk.StringVar(value=self.save_path.get())
         path_entry = ttk.Entry(config_frame, textvariable=self.save_path, width=50)
         path_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=(10, 0))
         ttk.Button(config_frame, text="Chọn", command=self.browse_folder).grid(row=1, column=2, padx=(10, 0), pady=(10, 0))
         
         # Xử lý ảnh sản phẩm
         ttk.Label(config_frame, text="Xử lý ảnh:").grid(row=2, column=0, sticky=tk.W, pady=(10, 0))
-        self.image_processing = tk.StringVar(value="product")
+        self.image_processing = tk.StringVar(value=self.image_processing.get())
         process_frame = ttk.Frame(config_frame)
         process_frame.grid(row=2, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
         ttk.Radiobutton(process_frame, text="Ảnh sản phẩm (có nền trắng)", variable=self.image_processing, 
@@ -183,13 +98,159 @@ class ImageCrawlerApp:
         
         # Crawl mode
         ttk.Label(config_frame, text="Chế độ crawl:").grid(row=3, column=0, sticky=tk.W, pady=(10, 0))
-        self.crawl_mode = tk.StringVar(value="direct")
+        self.crawl_mode = tk.StringVar(value=self.crawl_mode.get())
         crawl_frame = ttk.Frame(config_frame)
         crawl_frame.grid(row=3, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
         ttk.Radiobutton(crawl_frame, text="Link ảnh trực tiếp", variable=self.crawl_mode, 
                        value="direct").pack(side=tk.LEFT, padx=(0, 10))
         ttk.Radiobutton(crawl_frame, text="Crawl từ trang web", variable=self.crawl_mode, 
-                       value="webpage").pack(side=tk.LEFT)
+                       value="webpage").pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Radiobutton(crawl_frame, text="Link ảnh trực tiếp (asyncio)", variable=self.crawl_mode, 
+                       value="async").pack(side=tk.LEFT)
+        
+        # Số kết nối keep-alive giữ lại cho mỗi host
+        ttk.Label(config_frame, text="Kết nối mỗi host:").grid(row=4, column=0, sticky=tk.W, pady=(10, 0))
+        self.pool_size = tk.StringVar(value=self.pool_size.get())
+        pool_spinbox = ttk.Spinbox(config_frame, from_=1, to=50, textvariable=self.pool_size, width=10)
+        pool_spinbox.grid(row=4, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        
+        # Số request đồng thời cho chế độ asyncio
+        ttk.Label(config_frame, text="Request đồng thời (asyncio):").grid(row=5, column=0, sticky=tk.W, pady=(10, 0))
+        self.async_concurrency = tk.StringVar(value=self.async_concurrency.get())
+        async_spinbox = ttk.Spinbox(config_frame, from_=1, to=1000, textvariable=self.async_concurrency, width=10)
+        async_spinbox.grid(row=5, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        
+        # Giới hạn lịch sự theo host
+        ttk.Label(config_frame, text="Request tối đa mỗi host:").grid(row=6, column=0, sticky=tk.W, pady=(10, 0))
+        host_frame = ttk.Frame(config_frame)
+        host_frame.grid(row=6, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.max_per_host = tk.StringVar(value=self.max_per_host.get())
+        ttk.Spinbox(host_frame, from_=0, to=100, textvariable=self.max_per_host, width=10).pack(side=tk.LEFT)
+        ttk.Label(host_frame, text="Delay tối thiểu (ms):").pack(side=tk.LEFT, padx=(10, 5))
+        self.host_delay_ms = tk.StringVar(value=self.host_delay_ms.get())
+        ttk.Spinbox(host_frame, from_=0, to=10000, increment=100, textvariable=self.host_delay_ms, width=10).pack(side=tk.LEFT)
+        
+        # Retry và circuit breaker
+        ttk.Label(config_frame, text="Số lần thử tối đa:").grid(row=7, column=0, sticky=tk.W, pady=(10, 0))
+        retry_frame = ttk.Frame(config_frame)
+        retry_frame.grid(row=7, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.max_attempts = tk.StringVar(value=self.max_attempts.get())
+        ttk.Spinbox(retry_frame, from_=1, to=10, textvariable=self.max_attempts, width=10).pack(side=tk.LEFT)
+        ttk.Label(retry_frame, text="Ngắt host sau (lỗi liên tiếp):").pack(side=tk.LEFT, padx=(10, 5))
+        self.breaker_threshold = tk.StringVar(value=self.breaker_threshold.get())
+        ttk.Spinbox(retry_frame, from_=0, to=100, textvariable=self.breaker_threshold, width=10).pack(side=tk.LEFT)
+        
+        # Cache HTTP trên đĩa
+        ttk.Label(config_frame, text="Cache HTTP tối đa (MB):").grid(row=8, column=0, sticky=tk.W, pady=(10, 0))
+        self.cache_size_mb = tk.StringVar(value=self.cache_size_mb.get())
+        cache_spinbox = ttk.Spinbox(config_frame, from_=0, to=100000, increment=100, textvariable=self.cache_size_mb, width=10)
+        cache_spinbox.grid(row=8, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        
+        # Dung lượng ảnh tối đa (dừng download sớm nếu vượt)
+        ttk.Label(config_frame, text="Dung lượng ảnh tối đa (MB):").grid(row=9, column=0, sticky=tk.W, pady=(10, 0))
+        self.max_image_mb = tk.StringVar(value=self.max_image_mb.get())
+        max_size_spinbox = ttk.Spinbox(config_frame, from_=0, to=2000, textvariable=self.max_image_mb, width=10)
+        max_size_spinbox.grid(row=9, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        
+        # Chạy tiếp từ journal của lần chạy trước
+        self.resume_run = tk.BooleanVar(value=self.resume_run.get())
+        ttk.Checkbutton(config_frame, text="Tiếp tục lần chạy trước (bỏ qua entries đã thành công trong journal)",
+                        variable=self.resume_run).grid(row=10, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # Tự điều chỉnh số luồng theo latency / lỗi 429-5xx
+        self.adaptive_concurrency = tk.BooleanVar(value=self.adaptive_concurrency.get())
+        ttk.Checkbutton(config_frame, text="Tự điều chỉnh số luồng (AIMD, bắt đầu từ số luồng ở trên)",
+                        variable=self.adaptive_concurrency).grid(row=11, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # Pool trình duyệt headless cho link trang web
+        ttk.Label(config_frame, text="Số trình duyệt:").grid(row=12, column=0, sticky=tk.W, pady=(10, 0))
+        browser_frame = ttk.Frame(config_frame)
+        browser_frame.grid(row=12, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.browser_count = tk.StringVar(value=self.browser_count.get())
+        ttk.Spinbox(browser_frame, from_=1, to=16, textvariable=self.browser_count, width=10).pack(side=tk.LEFT)
+        ttk.Label(browser_frame, text="Khởi động lại sau (trang):").pack(side=tk.LEFT, padx=(10, 5))
+        self.browser_max_pages = tk.StringVar(value=self.browser_max_pages.get())
+        ttk.Spinbox(browser_frame, from_=0, to=10000, increment=10, textvariable=self.browser_max_pages, width=10).pack(side=tk.LEFT)
+        self.browser_profile = tk.StringVar(value=self.browser_profile.get())
+        ttk.Checkbutton(browser_frame, text="Chế độ nhẹ (không tải font/video/tracking)", variable=self.browser_profile,
+                        onvalue="lean", offvalue="default").pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Rule theo site cho việc tìm ảnh trên trang web (HTML tĩnh / trình duyệt)
+        ttk.Label(config_frame, text="Site rules (JSON):").grid(row=13, column=0, sticky=tk.W, pady=(10, 0))
+        self.site_rules_path = tk.StringVar(value=self.site_rules_path.get())
+        ttk.Entry(config_frame, textvariable=self.site_rules_path, width=50).grid(row=13, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=(10, 0))
+        ttk.Button(config_frame, text="Chọn", command=self.browse_site_rules).grid(row=13, column=2, padx=(10, 0), pady=(10, 0))
+        
+        # Cách chờ trang sẵn sàng khi mở bằng trình duyệt
+        ttk.Label(config_frame, text="Chờ trang sẵn sàng:").grid(row=14, column=0, sticky=tk.W, pady=(10, 0))
+        wait_frame = ttk.Frame(config_frame)
+        wait_frame.grid(row=14, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.page_wait = tk.StringVar(value=self.page_wait.get())
+        ttk.Combobox(wait_frame, textvariable=self.page_wait, values=["scroll", "network_idle", "img"],
+                     state="readonly", width=14).pack(side=tk.LEFT)
+        ttk.Label(wait_frame, text="Chờ tối đa (giây):").pack(side=tk.LEFT, padx=(10, 5))
+        self.page_wait_seconds = tk.StringVar(value=self.page_wait_seconds.get())
+        ttk.Spinbox(wait_frame, from_=1, to=120, textvariable=self.page_wait_seconds, width=10).pack(side=tk.LEFT)
+        
+        # Cache link trang -> link ảnh giữa các lần chạy
+        ttk.Label(config_frame, text="Cache trang (giờ):").grid(row=15, column=0, sticky=tk.W, pady=(10, 0))
+        discovery_frame = ttk.Frame(config_frame)
+        discovery_frame.grid(row=15, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.discovery_cache_hours = tk.StringVar(value=self.discovery_cache_hours.get())
+        ttk.Spinbox(discovery_frame, from_=0, to=8760, textvariable=self.discovery_cache_hours, width=10).pack(side=tk.LEFT)
+        self.discovery_revalidate = tk.BooleanVar(value=self.discovery_revalidate.get())
+        ttk.Checkbutton(discovery_frame, text="Hết hạn thì hỏi lại server (ETag / Last-Modified)",
+                        variable=self.discovery_revalidate).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Số ảnh tốt nhất download cho mỗi sản phẩm (xếp hạng ảnh trên trang)
+        ttk.Label(config_frame, text="Số ảnh mỗi sản phẩm:").grid(row=16, column=0, sticky=tk.W, pady=(10, 0))
+        ranking_frame = ttk.Frame(config_frame)
+        ranking_frame.grid(row=16, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.images_per_product = tk.StringVar(value=self.images_per_product.get())
+        ttk.Spinbox(ranking_frame, from_=1, to=50, textvariable=self.images_per_product, width=10).pack(side=tk.LEFT)
+        self.rank_probe = tk.BooleanVar(value=self.rank_probe.get())
+        ttk.Checkbutton(ranking_frame, text="Đọc kích thước ảnh chưa biết (tải vài KB đầu file)",
+                        variable=self.rank_probe).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Phân loại link ảnh / trang web bằng Content-Type thay vì đuôi file
+        self.probe_link_type = tk.BooleanVar(value=self.probe_link_type.get())
+        ttk.Checkbutton(config_frame, text="Kiểm tra loại link bằng HEAD / Content-Type (không đoán theo đuôi file)",
+                        variable=self.probe_link_type).grid(row=17, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # Số process xử lý ảnh (decode / nền trắng / encode WebP) tách khỏi luồng download
+        ttk.Label(config_frame, text="Số process xử lý ảnh:").grid(row=18, column=0, sticky=tk.W, pady=(10, 0))
+        image_workers_frame = ttk.Frame(config_frame)
+        image_workers_frame.grid(row=18, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.image_workers = tk.StringVar(value=self.image_workers.get())
+        ttk.Spinbox(image_workers_frame, from_=0, to=64, textvariable=self.image_workers, width=10).pack(side=tk.LEFT)
+        ttk.Label(image_workers_frame, text="(0 = số CPU)").pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Cạnh dài nhất của ảnh output (ảnh lớn hơn được thu nhỏ)
+        ttk.Label(config_frame, text="Cạnh ảnh tối đa (px):").grid(row=19, column=0, sticky=tk.W, pady=(10, 0))
+        max_side_frame = ttk.Frame(config_frame)
+        max_side_frame.grid(row=19, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.max_output_side = tk.StringVar(value=self.max_output_side.get())
+        ttk.Spinbox(max_side_frame, from_=0, to=20000, increment=100, textvariable=self.max_output_side, width=10).pack(side=tk.LEFT)
+        ttk.Label(max_side_frame, text="(0 = giữ nguyên kích thước)").pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Biến thể kích thước tạo thêm cho mỗi ảnh (thumbnail, zoom...)
+        ttk.Label(config_frame, text="Biến thể kích thước:").grid(row=20, column=0, sticky=tk.W, pady=(10, 0))
+        variants_frame = ttk.Frame(config_frame)
+        variants_frame.grid(row=20, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.size_variants = tk.StringVar(value=self.size_variants.get())
+        ttk.Entry(variants_frame, textvariable=self.size_variants, width=30).pack(side=tk.LEFT)
+        ttk.Label(variants_frame, text="(vd thumb:300, zoom:2000 - để trống = chỉ ảnh chính)").pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Preset encode WebP và giữ nguyên ảnh nguồn đã là WebP
+        ttk.Label(config_frame, text="Preset WebP:").grid(row=21, column=0, sticky=tk.W, pady=(10, 0))
+        webp_frame = ttk.Frame(config_frame)
+        webp_frame.grid(row=21, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        self.webp_preset = tk.StringVar(value=self.webp_preset.get())
+        ttk.Combobox(webp_frame, textvariable=self.webp_preset, values=["fast", "balanced", "smallest", "lossless"],
+                     state="readonly", width=14).pack(side=tk.LEFT)
+        self.webp_passthrough = tk.BooleanVar(value=self.webp_passthrough.get())
+        ttk.Checkbutton(webp_frame, text="Giữ nguyên ảnh gốc đã là WebP (không encode lại)",
+                        variable=self.webp_passthrough).pack(side=tk.LEFT, padx=(10, 0))
         
         # Control buttons
         button_frame = ttk.Frame(main_frame)
@@ -211,7 +272,12 @@ class ImageCrawlerApp:
         # Test naming button
         self.test_naming_button = ttk.Button(button_frame, text="📝 Test Đặt Tên", 
                                             command=self.test_naming_logic)
-        self.test_naming_button.pack(side=tk.LEFT)
+        self.test_naming_button.pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Tạo báo cáo từ journal
+        self.journal_report_button = ttk.Button(button_frame, text="📄 Báo cáo từ Journal", 
+                                                command=self.report_from_journal)
+        self.journal_report_button.pack(side=tk.LEFT)
         
         # Progress section
         progress_frame = ttk.LabelFrame(main_frame, text="Tiến Trình", padding="10")
@@ -316,102 +382,9 @@ class ImageCrawlerApp:
         )
         if filename:
             try:
-                # Đọc file Excel với nhiều cách khác nhau để đảm bảo nhận đầy đủ dữ liệu
-                try:
-                    # Thử đọc bình thường trước
-                    df = pd.read_excel(filename)
-                    self.log_message(f"Đọc bình thường: {len(df)} dòng")
-                except:
-                    df = pd.read_excel(filename, header=None)
-                    self.log_message(f"Đọc không header: {len(df)} dòng")
-                
-                # Thử đọc với header=None để so sánh
-                try:
-                    df_no_header = pd.read_excel(filename, header=None)
-                    if len(df_no_header) > len(df):
-                        df = df_no_header
-                        self.log_message(f"Chuyển sang đọc không header: {len(df)} dòng")
-                except:
-                    pass
-                
-                # Lưu dữ liệu để debug
-                self.last_excel_data = df
-                
-                # Hiển thị thông tin file
-                self.log_message(f"📊 Thông tin file Excel: {filename}")
-                self.log_message(f"📋 Tổng số cột: {len(df.columns)}")
-                self.log_message(f"📝 Tổng số dòng: {len(df)}")
-                
-                # Kiểm tra cấu trúc file
-                if len(df.columns) < 2:
-                    messagebox.showerror("Lỗi", "File Excel phải có ít nhất 2 cột:\nCột A: Mã sản phẩm\nCột B: Link ảnh")
-                    return
-                
-                # Lấy cột A (mã sản phẩm) và cột B (link)
-                product_codes = df.iloc[:, 0].tolist()
-                links = df.iloc[:, 1].tolist()
-                
-                # Hiển thị dữ liệu gốc
-                self.log_message(f"📋 Dữ liệu gốc từ Excel:")
-                for i, (code, link) in enumerate(zip(product_codes, links)):
-                    self.log_message(f"   Dòng {i+1}: Mã='{code}' | Link='{link}'")
-                
-                # Tạo list entries (LOGIC ĐƠN GIẢN - KHÔNG PHÂN BIỆT DUPLICATE)
-                self.product_codes = []
-                valid_count = 0
-                skipped_count = 0
-                
-                self.log_message(f"🔧 BẮT ĐẦU XỬ LÝ {len(product_codes)} DÒNG DỮ LIỆU")
-                
-                for i, (code, link) in enumerate(zip(product_codes, links)):
-                    # Kiểm tra và xử lý dữ liệu
-                    code_str = str(code).strip() if pd.notna(code) else ""
-                    link_str = str(link).strip() if pd.notna(link) else ""
-                    
-                    # Debug chi tiết từng dòng
-                    self.log_message(f"🔍 Dòng {i+1}: Mã='{code_str}' | Link='{link_str}'")
-                    
-                    # LOGIC ĐƠN GIẢN: Chỉ bỏ qua dòng hoàn toàn trống
-                    if not code_str and not link_str:
-                        self.log_message(f"⚠️ Bỏ qua dòng {i+1}: Dòng trống hoàn toàn")
-                        skipped_count += 1
-                        continue
-                    
-                    # Nếu có link nhưng không có mã, tự tạo mã
-                    if link_str and not code_str:
-                        code_str = f"PRODUCT_{i+1:03d}"
-                        self.log_message(f"⚠️ Dòng {i+1}: Tự tạo mã '{code_str}' cho link")
-                    
-                    # Nếu có mã nhưng không có link, tự tạo link
-                    if code_str and not link_str:
-                        link_str = f"https://example.com/product/{code_str}"
-                        self.log_message(f"⚠️ Dòng {i+1}: Tự tạo link cho mã '{code_str}'")
-                    
-                    # THÊM TẤT CẢ ENTRIES VÀO LIST (KHÔNG PHÂN BIỆT DUPLICATE)
-                    if link_str and code_str:
-                        # Tạo entry object đơn giản
-                        entry = {
-                            'code': code_str,
-                            'link': link_str,
-                            'row': i + 1
-                        }
-                        
-                        # Thêm vào list - không kiểm tra duplicate
-                        self.product_codes.append(entry)
-                        valid_count += 1
-                        self.log_message(f"✅ Dòng {i+1}: Mã='{code_str}' | Link='{link_str}' | Entry #{len(self.product_codes)}")
-                    else:
-                        self.log_message(f"⚠️ Dòng {i+1}: Thiếu thông tin")
-                        skipped_count += 1
-                
-                # Hiển thị kết quả
+                df, self.product_codes, skipped_count = self.load_excel_entries(filename)
                 total_entries = len(self.product_codes)
                 
-                self.log_message(f"📊 Kết quả xử lý Excel:")
-                self.log_message(f"   ✅ Tổng entries: {total_entries}")
-                self.log_message(f"   ⚠️ Bỏ qua: {skipped_count} dòng")
-                self.log_message(f"   📋 Tổng cộng: {len(df)} dòng")
-                
                 # Hiển thị trong text area (LOGIC ĐƠN GIẢN)
                 self.links_text.config(state='normal')
                 self.links_text.delete(1.0, tk.END)
@@ -444,6 +417,8 @@ class ImageCrawlerApp:
                         f"Dòng bỏ qua: {skipped_count}\n\n"
                         f"Vui lòng kiểm tra cấu trúc file Excel.")
                 
+            except InvalidInputError as e:
+                messagebox.showerror("Lỗi", str(e))
             except Exception as e:
                 messagebox.showerror("Lỗi", f"Không thể đọc file Excel: {str(e)}")
                 self.log_message(f"❌ Lỗi khi đọc Excel: {str(e)}")
@@ -525,32 +500,13 @@ class ImageCrawlerApp:
         if folder:
             self.save_path.set(folder)
     
-    def start_worker_threads(self):
-        for i in range(self.max_workers):
-            worker = threading.Thread(target=self.worker_function, daemon=True)
-            worker.start()
-            self.worker_threads.append(worker)
-    
-    def worker_function(self):
-        while True:
-            try:
-                task = self.download_queue.get(timeout=1)
-                if task is None:
-                    break
-                
-                # Handle both old 3-param and new 4-param format for backward compatibility
-                if len(task) == 4:
-                    link, save_dir, product_code, row_number = task
-                else:
-                    link, save_dir, product_code = task
-                    row_number = None
-                self.process_single_link(link, save_dir, product_code, row_number)
-                self.download_queue.task_done()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.log_message(f"Lỗi worker thread: {str(e)}")
+    def browse_site_rules(self):
+        filename = filedialog.askopenfilename(
+            title="Chọn File Site Rules",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if filename:
+            self.site_rules_path.set(filename)
     
     def start_crawling(self):
         if self.is_crawling:
@@ -568,33 +524,21 @@ class ImageCrawlerApp:
             if not links_text or links_text == "Nhập các link sản phẩm, mỗi link một dòng...":
                 messagebox.showwarning("Cảnh báo", "Vui lòng nhập ít nhất một link!")
                 return
-            links = [link.strip() for link in links_text.split('\n') if link.strip() and not link.startswith('#')]
             # Convert links to entries format
-            entries = [{'code': f'manual_{i+1}', 'link': link, 'row': i+1} for i, link in enumerate(links)]
+            entries = self.parse_link_list(links_text)
         
         if not entries:
             messagebox.showwarning("Cảnh báo", "Không có entry hợp lệ nào!")
             return
         
-        # Tạo thư mục lưu
         save_dir = self.save_path.get()
-        os.makedirs(save_dir, exist_ok=True)
+        entries = self.prepare_run(entries, save_dir)
         
         # Cập nhật UI
-        self.is_crawling = True
         self.start_button.config(state='disabled')
         self.stop_button.config(state='normal')
         self.progress_var.set(0)
         
-        # Reset stats và khởi tạo tracking
-        self.total_links = len(entries)
-        self.processed_count = 0
-        self.success_count = 0
-        self.failed_count = 0
-        self.results = []  # Reset results tracking
-        self.start_time = time.time()  # Set start time for reporting
-        self.output_dir = save_dir  # Store output directory
-        
         self.update_stats()
         self.log_message(f"Bắt đầu crawl {len(entries)} entries...")
         
@@ -602,694 +546,45 @@ class ImageCrawlerApp:
         crawl_thread = threading.Thread(target=self.crawl_entries, args=(entries, save_dir))
         crawl_thread.start()
     
-    def crawl_entries(self, entries, save_dir):
-        try:
-            if self.crawl_mode.get() == "direct":
-                # Chế độ link ảnh trực tiếp
-                self.log_message("Chế độ: Link ảnh trực tiếp")
-                for i, entry in enumerate(entries):
-                    if not self.is_crawling:
-                        break
-                    
-                    try:
-                        link = entry['link']
-                        product_code = entry['code']
-                        row = entry['row']
-                        
-                        self.log_message(f"Đang xử lý entry {i+1}/{len(entries)}: {product_code} -> {link} (row {row})")
-                        
-                        # Thêm vào queue download - XỬ LÝ TỪNG ENTRY
-                        self.download_queue.put((link, save_dir, product_code, row))
-                        self.log_message(f"Entry được thêm vào queue: {product_code} -> {link}")
-                        
-                        # Cập nhật progress
-                        progress = ((i + 1) / len(entries)) * 100
-                        self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                        
-                    except Exception as e:
-                        self.log_message(f"Lỗi khi xử lý entry {entry}: {str(e)}")
-                        self.failed_count += 1
-                    
-                    self.processed_count += 1
-                    self.update_stats()
-            else:
-                # Chế độ crawl từ trang web
-                self.log_message("Chế độ: Crawl từ trang web")
-                service = Service(ChromeDriverManager().install())
-                options = webdriver.ChromeOptions()
-                options.add_argument('--headless')
-                options.add_argument('--no-sandbox')
-                options.add_argument('--disable-dev-shm-usage')
-                
-                driver = webdriver.Chrome(service=service, options=options)
-                
-                for i, entry in enumerate(entries):
-                    if not self.is_crawling:
-                        break
-                    
-                    try:
-                        link = entry['link']
-                        product_code = entry['code']
-                        row = entry['row']
-                        
-                        self.log_message(f"Đang xử lý entry {i+1}/{len(entries)}: {product_code} -> {link} (row {row})")
-                        
-                        # Crawl ảnh từ link
-                        images = self.crawl_images_from_link(driver, link)
-                        
-                        if images:
-                            # Thêm vào queue download
-                            for img_url in images:
-                                self.download_queue.put((img_url, save_dir, product_code, row))
-                            
-                            self.log_message(f"Tìm thấy {len(images)} ảnh từ entry: {product_code}")
-                        else:
-                            self.log_message(f"Không tìm thấy ảnh nào từ entry: {product_code}")
-                        
-                        # Cập nhật progress
-                        progress = ((i + 1) / len(entries)) * 100
-                        self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                        
-                    except Exception as e:
-                        self.log_message(f"Lỗi khi xử lý entry {entry}: {str(e)}")
-                        self.failed_count += 1
-                    
-                    self.processed_count += 1
-                    self.update_stats()
-                
-                driver.quit()
-            
-            # Chờ tất cả download hoàn thành
-            self.download_queue.join()
-            
-            self.root.after(0, self.crawling_finished)
-            
-        except Exception as e:
-            self.log_message(f"Lỗi trong quá trình crawl: {str(e)}")
-            self.root.after(0, self.crawling_finished)
-    
-    def crawl_images_from_link(self, driver, link):
-        try:
-            driver.get(link)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "img"))
-            )
-            
-            # Tìm tất cả ảnh
-            images = driver.find_elements(By.TAG_NAME, "img")
-            image_urls = []
-            
-            for img in images:
-                src = img.get_attribute('src')
-                if src and self.is_valid_image_url(src):
-                    image_urls.append(src)
-            
-            return image_urls
-            
-        except Exception as e:
-            self.log_message(f"Lỗi khi crawl link {link}: {str(e)}")
-            return []
-    
-    def is_valid_image_url(self, url):
-        if not url:
-            return False
-        
-        # Kiểm tra xem có phải là URL không
-        if not url.startswith(('http://', 'https://')):
-            return False
-        
-        # Kiểm tra extension
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.JPG', '.JPEG', '.PNG', '.GIF', '.BMP', '.WEBP']
-        parsed_url = urlparse(url)
-        path = parsed_url.path.lower()
-        
-        # Kiểm tra extension trong path
-        has_valid_extension = any(path.endswith(ext.lower()) for ext in valid_extensions)
-        
-        # Kiểm tra query parameters có chứa extension
-        query_has_extension = any(ext.lower() in parsed_url.query.lower() for ext in valid_extensions)
-        
-        # Kiểm tra fragment có chứa extension
-        fragment_has_extension = any(ext.lower() in parsed_url.fragment.lower() for ext in valid_extensions)
-        
-        # Nếu có extension ở bất kỳ đâu, coi như hợp lệ
-        if has_valid_extension or query_has_extension or fragment_has_extension:
-            return True
-        
-        # Kiểm tra một số pattern đặc biệt
-        special_patterns = [
-            'cdn', 'images', 'img', 'photo', 'picture', 'upload', 'media',
-            'static', 'assets', 'content', 'files', 'storage'
-        ]
-        
-        url_lower = url.lower()
-        has_special_pattern = any(pattern in url_lower for pattern in special_patterns)
-        
-        # Nếu có pattern đặc biệt, coi như hợp lệ
-        if has_special_pattern:
-            return True
-        
-        return False
-    
-    def process_single_link(self, img_url, save_dir, product_code, row_number=None):
-        # Initialize result tracking
-        start_time = time.time()
-        result_entry = {
-            'product_code': product_code,
-            'link': img_url, 
-            'row': row_number,
-            'status': 'failed',
-            'filename': None,
-            'file_size': None,
-            'error_reason': None,
-            'download_time': None,
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+    def report_from_journal(self):
+        """Chọn file journal và tạo lại Excel report chỉ từ journal"""
+        journal_path = filedialog.askopenfilename(
+            title="Chọn File Journal",
+            initialdir=self.save_path.get(),
+            filetypes=[("Crawler journal", "*.jsonl"), ("All files", "*.*")]
+        )
+        if not journal_path:
+            return
         
-        try:
-            # Kiểm tra xem có phải link ảnh trực tiếp không
-            if self.is_valid_image_url(img_url):
-                # Download ảnh trực tiếp
-                self.log_message(f"🖼️ Download ảnh trực tiếp: {img_url}")
-                
-                try:
-                    # Enhanced headers để bypass 403 Forbidden
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                        'Referer': 'https://www.fotekexpress.com/',
-                        'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
-                    }
-                    response = requests.get(img_url, headers=headers, timeout=30)
-                    response.raise_for_status()
-                    
-                    # Xử lý ảnh
-                    img = Image.open(io.BytesIO(response.content))
-                    
-                    if self.image_processing.get() == "product":
-                        # Xử lý ảnh sản phẩm: chèn nền trắng
-                        img = self.process_product_image(img)
-                    
-                    # Convert RGBA sang RGB nếu cần
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # Tạo tên file theo mã sản phẩm
-                    filename = self.generate_filename(product_code)
-                    filepath = os.path.join(save_dir, filename)
-                    
-                    # Lưu dưới dạng WebP
-                    img.save(filepath, 'WEBP', quality=85, optimize=True)
-                    
-                    # Lấy file size
-                    file_size = os.path.getsize(filepath)
-                    
-                    # Update result entry for success
-                    result_entry.update({
-                        'status': 'success',
-                        'filename': filename,
-                        'file_size': file_size,
-                        'download_time': time.time() - start_time
-                    })
-                    
-                    self.success_count += 1
-                    self.log_message(f"✅ Đã lưu ảnh: {filename} (Mã: {product_code}) - {file_size/1024:.1f}KB")
-                    
-                except requests.exceptions.Timeout:
-                    result_entry['error_reason'] = "Timeout - Link không phản hồi trong 30s"
-                    self.failed_count += 1
-                    self.log_message(f"❌ Timeout khi download: {img_url}")
-                    
-                except requests.exceptions.HTTPError as e:
-                    result_entry['error_reason'] = f"HTTP Error {e.response.status_code}: {e.response.reason}"
-                    self.failed_count += 1
-                    self.log_message(f"❌ HTTP Error {e.response.status_code}: {img_url}")
-                    
-                except requests.exceptions.RequestException as e:
-                    result_entry['error_reason'] = f"Network Error: {str(e)}"
-                    self.failed_count += 1
-                    self.log_message(f"❌ Network Error: {img_url}")
-                    
-                except Exception as e:
-                    result_entry['error_reason'] = f"Image Processing Error: {str(e)}"
-                    self.failed_count += 1
-                    self.log_message(f"❌ Image Error: {img_url} - {str(e)}")
-                
-            else:
-                # Link không phải ảnh trực tiếp - thử crawl từ trang web
-                self.log_message(f"🌐 Thử crawl từ trang web: {img_url}")
-                try:
-                    # Sử dụng Selenium để crawl
-                    service = Service(ChromeDriverManager().install())
-                    options = webdriver.ChromeOptions()
-                    options.add_argument('--headless')
-                    options.add_argument('--no-sandbox')
-                    options.add_argument('--disable-dev-shm-usage')
-                    
-                    driver = webdriver.Chrome(service=service, options=options)
-                    
-                    # Crawl ảnh từ trang web
-                    images = self.crawl_images_from_link(driver, img_url)
-                    
-                    if images:
-                        # Lưu ảnh đầu tiên tìm được
-                        img_url_direct = images[0]
-                        self.log_message(f"🖼️ Tìm thấy ảnh: {img_url_direct}")
-                        
-                        # Download ảnh với enhanced headers
-                        headers = {
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                            'Referer': 'https://www.fotekexpress.com/',
-                            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                            'Accept-Language': 'en-US,en;q=0.9',
-                            'Accept-Encoding': 'gzip, deflate, br',
-                            'Connection': 'keep-alive',
-                            'Upgrade-Insecure-Requests': '1',
-                        }
-                        response = requests.get(img_url_direct, headers=headers, timeout=30)
-                        response.raise_for_status()
-                        
-                        # Xử lý ảnh
-                        img = Image.open(io.BytesIO(response.content))
-                        
-                        if self.image_processing.get() == "product":
-                            # Xử lý ảnh sản phẩm: chèn nền trắng
-                            img = self.process_product_image(img)
-                        
-                        # Convert RGBA sang RGB nếu cần
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        
-                        # Tạo tên file theo mã sản phẩm
-                        filename = self.generate_filename(product_code)
-                        filepath = os.path.join(save_dir, filename)
-                        
-                        # Lưu dưới dạng WebP
-                        img.save(filepath, 'WEBP', quality=85, optimize=True)
-                        
-                        # Lấy file size
-                        file_size = os.path.getsize(filepath)
-                        
-                        # Update result entry for success
-                        result_entry.update({
-                            'status': 'success',
-                            'filename': filename,
-                            'file_size': file_size,
-                            'download_time': time.time() - start_time
-                        })
-                        
-                        self.success_count += 1
-                        self.log_message(f"✅ Đã lưu ảnh từ trang web: {filename} (Mã: {product_code}) - {file_size/1024:.1f}KB")
-                    else:
-                        result_entry['error_reason'] = "Không tìm thấy ảnh nào trên trang web"
-                        self.log_message(f"⚠️ Không tìm thấy ảnh nào từ trang web: {img_url}")
-                        self.failed_count += 1
-                    
-                    driver.quit()
-                    
-                except Exception as e:
-                    result_entry['error_reason'] = f"Web Crawl Error: {str(e)}"
-                    self.log_message(f"❌ Lỗi khi crawl từ trang web {img_url}: {str(e)}")
-                    self.failed_count += 1
-            
-        except Exception as e:
-            result_entry['error_reason'] = f"General Error: {str(e)}"
-            self.failed_count += 1
-            self.log_message(f"❌ Lỗi khi xử lý link {img_url}: {str(e)}")
-        
-        finally:
-            # Ensure download time is set
-            if result_entry['download_time'] is None:
-                result_entry['download_time'] = time.time() - start_time
-            
-            # Add result to tracking list
-            self.results.append(result_entry)
-            self.update_stats()
-    
-    def process_product_image(self, img):
-        """Xử lý ảnh sản phẩm: chèn nền trắng và giữ nguyên kích thước"""
-        try:
-            # Lấy kích thước gốc
-            original_width, original_height = img.size
-            
-            # Tạo ảnh nền trắng với kích thước gốc
-            white_bg = Image.new('RGB', (original_width, original_height), (255, 255, 255))
-            
-            # Convert ảnh gốc sang RGBA nếu cần
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-            
-            # Paste ảnh gốc lên nền trắng
-            white_bg.paste(img, (0, 0), img)
-            
-            return white_bg
-            
-        except Exception as e:
-            self.log_message(f"Lỗi khi xử lý ảnh sản phẩm: {str(e)}")
-            return img  # Trả về ảnh gốc nếu có lỗi
-    
-    def generate_filename(self, product_code):
-        """Tạo tên file theo logic JavaScript"""
-        return self.naming_processor.generate_filename(str(product_code))
-    
-    def generate_excel_report(self, output_dir):
-        """Tạo Excel report với color coding cho results"""
-        try:
-            self.log_message("📊 Đang tạo Excel report...")
-            
-            # Tạo workbook
-            wb = Workbook()
-            
-            # Remove default sheet
-            wb.remove(wb.active)
-            
-            # === SHEET 1: DETAILED RESULTS ===
-            details_ws = wb.create_sheet("Chi Tiết Kết Quả")
-            
-            # Headers
-            headers = [
-                'STT', 'Mã Sản Phẩm', 'Link', 'Trạng Thái', 'Tên File', 
-                'Kích Thước (KB)', 'Lý Do Lỗi', 'Thời Gian DL (s)', 'Row Excel', 'Timestamp'
-            ]
-            
-            # Style definitions
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            failed_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-            border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            center_alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Add headers
-            for col, header in enumerate(headers, 1):
-                cell = details_ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.border = border
-                cell.alignment = center_alignment
-            
-            # Add data rows
-            for idx, result in enumerate(self.results, 2):
-                # STT
-                details_ws.cell(row=idx, column=1, value=idx-1)
-                
-                # Mã Sản Phẩm
-                details_ws.cell(row=idx, column=2, value=result['product_code'])
-                
-                # Link
-                details_ws.cell(row=idx, column=3, value=result['link'])
-                
-                # Trạng Thái
-                status_cell = details_ws.cell(row=idx, column=4, value=result['status'].upper())
-                status_cell.font = Font(bold=True)
-                
-                # Tên File
-                details_ws.cell(row=idx, column=5, value=result['filename'] or 'N/A')
-                
-                # Kích Thước
-                if result['file_size']:
-                    size_kb = round(result['file_size'] / 1024, 1)
-                    details_ws.cell(row=idx, column=6, value=size_kb)
-                else:
-                    details_ws.cell(row=idx, column=6, value='N/A')
-                
-                # Lý Do Lỗi
-                details_ws.cell(row=idx, column=7, value=result['error_reason'] or 'N/A')
-                
-                # Thời Gian Download
-                if result['download_time']:
-                    dl_time = round(result['download_time'], 2)
-                    details_ws.cell(row=idx, column=8, value=dl_time)
-                else:
-                    details_ws.cell(row=idx, column=8, value='N/A')
-                
-                # Row Excel
-                details_ws.cell(row=idx, column=9, value=result['row'] or 'N/A')
-                
-                # Timestamp
-                details_ws.cell(row=idx, column=10, value=result['timestamp'])
-                
-                # Apply row coloring and borders
-                for col in range(1, 11):
-                    cell = details_ws.cell(row=idx, column=col)
-                    cell.border = border
-                    cell.alignment = Alignment(vertical='center')
-                    
-                    if result['status'] == 'success':
-                        cell.fill = success_fill
-                    else:
-                        cell.fill = failed_fill
-            
-            # Auto-adjust column widths
-            for col in range(1, 11):
-                column_letter = get_column_letter(col)
-                max_length = 0
-                for row in details_ws[f'{column_letter}1:{column_letter}{len(self.results)+1}']:
-                    for cell in row:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                adjusted_width = min(max_length + 2, 50)
-                details_ws.column_dimensions[column_letter].width = adjusted_width
-            
-            # === SHEET 2: SUMMARY STATISTICS ===
-            summary_ws = wb.create_sheet("Tổng Kết")
-            
-            # Calculate statistics
-            total_entries = len(self.results)
-            success_count = len([r for r in self.results if r['status'] == 'success'])
-            failed_count = total_entries - success_count
-            success_rate = (success_count / total_entries * 100) if total_entries > 0 else 0
-            
-            # Processing time
-            if self.start_time:
-                total_time = time.time() - self.start_time
-                avg_time_per_entry = total_time / total_entries if total_entries > 0 else 0
-            else:
-                total_time = 0
-                avg_time_per_entry = 0
-            
-            # Error breakdown
-            error_breakdown = {}
-            for result in self.results:
-                if result['status'] == 'failed' and result['error_reason']:
-                    error_type = result['error_reason'].split(':')[0]
-                    error_breakdown[error_type] = error_breakdown.get(error_type, 0) + 1
-            
-            # Summary content
-            summary_data = [
-                ['📊 BÁO CÁO TỔNG KẾT CRAWLER', ''],
-                ['', ''],
-                ['Thống Kê Chung', ''],
-                ['Tổng số entries', total_entries],
-                ['Thành công', success_count],
-                ['Thất bại', failed_count],
-                ['Tỷ lệ thành công', f'{success_rate:.1f}%'],
-                ['', ''],
-                ['Thời Gian Xử Lý', ''],
-                ['Tổng thời gian', f'{total_time:.1f}s'],
-                ['Trung bình/entry', f'{avg_time_per_entry:.2f}s'],
-                ['', ''],
-                ['Phân Tích Lỗi', ''],
-            ]
-            
-            # Add error breakdown
-            for error_type, count in error_breakdown.items():
-                summary_data.append([error_type, count])
-            
-            # Add summary data
-            for row_idx, (label, value) in enumerate(summary_data, 1):
-                summary_ws.cell(row=row_idx, column=1, value=label)
-                summary_ws.cell(row=row_idx, column=2, value=value)
-                
-                # Style headers
-                if label in ['📊 BÁO CÁO TỔNG KẾT CRAWLER', 'Thống Kê Chung', 'Thời Gian Xử Lý', 'Phân Tích Lỗi']:
-                    summary_ws.cell(row=row_idx, column=1).font = Font(bold=True, size=14)
-                    summary_ws.cell(row=row_idx, column=1).fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-            
-            # Auto-adjust summary columns
-            summary_ws.column_dimensions['A'].width = 25
-            summary_ws.column_dimensions['B'].width = 15
-            
-            # Save file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            report_filename = f"crawler_report_{timestamp}.xlsx"
-            report_path = os.path.join(output_dir, report_filename)
-            
-            wb.save(report_path)
-            
-            self.log_message(f"✅ Đã tạo Excel report: {report_filename}")
-            return report_path
-            
-        except Exception as e:
-            self.log_message(f"❌ Lỗi khi tạo Excel report: {str(e)}")
-            return None
+        report_path = self.generate_report_from_journal(journal_path)
+        if report_path:
+            messagebox.showinfo("Thành công", f"Đã tạo báo cáo từ journal:\n{report_path}")
+        else:
+            messagebox.showwarning("Cảnh báo", "Không tạo được báo cáo - journal không có kết quả nào!")
     
-    def create_output_package(self, base_save_dir):
-        """Tạo organized output package với folder structure và files"""
+    def on_thread_count_changed(self, *args):
+        if not self.is_crawling:
+            return
         try:
-            self.log_message("📁 Đang tạo output package...")
-            
-            # Tạo timestamp cho folder
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            package_name = f"crawler_output_{timestamp}"
-            package_dir = os.path.join(base_save_dir, package_name)
-            
-            # Tạo folder structure
-            images_dir = os.path.join(package_dir, "images")
-            os.makedirs(images_dir, exist_ok=True)
-            
-            self.log_message(f"📁 Tạo folder: {package_dir}")
-            
-            # Copy successful images to images folder
-            copied_count = 0
-            for result in self.results:
-                if result['status'] == 'success' and result['filename']:
-                    source_path = os.path.join(base_save_dir, result['filename'])
-                    dest_path = os.path.join(images_dir, result['filename'])
-                    
-                    try:
-                        if os.path.exists(source_path):
-                            # Copy file thay vì move để giữ nguyên file gốc
-                            import shutil
-                            shutil.copy2(source_path, dest_path)
-                            copied_count += 1
-                    except Exception as e:
-                        self.log_message(f"⚠️ Không thể copy {result['filename']}: {str(e)}")
-            
-            self.log_message(f"📁 Đã copy {copied_count} ảnh vào folder images/")
-            
-            # Generate Excel report
-            excel_path = self.generate_excel_report(package_dir)
-            
-            # Generate text summary
-            summary_path = self.generate_text_summary(package_dir)
-            
-            # Generate package info
-            package_info = {
-                'package_dir': package_dir,
-                'package_name': package_name,
-                'images_dir': images_dir,
-                'excel_path': excel_path,
-                'summary_path': summary_path,
-                'total_files': copied_count + (2 if excel_path and summary_path else 1 if excel_path or summary_path else 0),
-                'images_count': copied_count
-            }
-            
-            self.log_message(f"✅ Tạo output package thành công: {package_name}")
-            return package_info
-            
-        except Exception as e:
-            self.log_message(f"❌ Lỗi khi tạo output package: {str(e)}")
-            return None
+            count = int(str(self.thread_count.get()).strip())
+        except ValueError:
+            return
+        self.resize_workers(count)
     
-    def generate_text_summary(self, output_dir):
-        """Tạo text summary file"""
-        try:
-            # Calculate statistics
-            total_entries = len(self.results)
-            success_count = len([r for r in self.results if r['status'] == 'success'])
-            failed_count = total_entries - success_count
-            success_rate = (success_count / total_entries * 100) if total_entries > 0 else 0
-            
-            # Processing time
-            if self.start_time:
-                total_time = time.time() - self.start_time
-            else:
-                total_time = 0
-            
-            # Error breakdown
-            error_breakdown = {}
-            for result in self.results:
-                if result['status'] == 'failed' and result['error_reason']:
-                    error_type = result['error_reason'].split(':')[0]
-                    error_breakdown[error_type] = error_breakdown.get(error_type, 0) + 1
-            
-            # Create summary content
-            summary_content = f"""🖼️ IMAGE CRAWLER - BÁO CÁO TÓM TẮT
-{'='*60}
-
-📊 THỐNG KÊ TỔNG QUAN:
-    • Tổng số entries đã xử lý: {total_entries}
-    • Thành công: {success_count} ảnh ({success_rate:.1f}%)
-    • Thất bại: {failed_count} ảnh ({100-success_rate:.1f}%)
-    • Thời gian xử lý: {total_time:.1f} giây
-
-📁 KẾT QUẢ OUTPUT:
-    • Folder ảnh: images/ ({success_count} files)
-    • Báo cáo Excel: crawler_report_*.xlsx
-    • File tóm tắt: summary.txt (file này)
-
-"""
-
-            if error_breakdown:
-                summary_content += "❌ PHÂN TÍCH LỖI:\n"
-                for error_type, count in error_breakdown.items():
-                    summary_content += f"    • {error_type}: {count} lỗi\n"
-                summary_content += "\n"
-
-            if success_count > 0:
-                summary_content += "✅ DANH SÁCH ẢNH THÀNH CÔNG:\n"
-                for result in self.results:
-                    if result['status'] == 'success':
-                        size_kb = round(result['file_size'] / 1024, 1) if result['file_size'] else 0
-                        summary_content += f"    • {result['filename']} ({size_kb}KB) - {result['product_code']}\n"
-                summary_content += "\n"
-
-            if failed_count > 0:
-                summary_content += "❌ DANH SÁCH LỖI:\n"
-                for result in self.results:
-                    if result['status'] == 'failed':
-                        summary_content += f"    • {result['product_code']}: {result['error_reason']}\n"
-
-            summary_content += f"\n🕒 Tạo báo cáo: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-
-            # Save summary file
-            summary_filename = "summary.txt"
-            summary_path = os.path.join(output_dir, summary_filename)
-            
-            with open(summary_path, 'w', encoding='utf-8') as f:
-                f.write(summary_content)
-            
-            self.log_message(f"✅ Đã tạo text summary: {summary_filename}")
-            return summary_path
-            
-        except Exception as e:
-            self.log_message(f"❌ Lỗi khi tạo text summary: {str(e)}")
-            return None
+    def on_crawl_finished(self):
+        self.root.after(0, self.crawling_finished)
     
-    def stop_crawling(self):
-        self.is_crawling = False
-        self.log_message("Đang dừng quá trình crawl...")
-        
-        # Clear queue
-        while not self.download_queue.empty():
-            try:
-                self.download_queue.get_nowait()
-                self.download_queue.task_done()
-            except queue.Empty:
-                break
+    def update_progress(self, progress):
+        """Cập nhật progress bar từ thread bất kỳ"""
+        self.root.after(0, lambda p=progress: self.progress_var.set(p))
     
     def crawling_finished(self):
-        self.is_crawling = False
+        # Basic completion message
+        basic_message = self.finish_run()
         self.start_button.config(state='normal')
         self.stop_button.config(state='disabled')
         self.progress_var.set(100)
         
-        # Basic completion message
-        basic_message = f"Crawl hoàn thành! Đã xử lý {self.processed_count} entries, thành công {self.success_count}, thất bại {self.failed_count}"
-        self.log_message(basic_message)
-        
         # Generate comprehensive output package
         if self.output_dir and len(self.results) > 0:
             self.log_message("📊 Bắt đầu tạo báo cáo chi tiết...")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module chờ trang sẵn sàng trước khi lấy link ảnh, thay cho việc chờ cố định một thẻ <img>:
+- img: chờ có ít nhất một <img> (cách cũ)
+- network_idle: chờ không còn request mới trong một khoảng ngắn
+- scroll: cuộn dần xuống cuối trang để kích hoạt lazy-load, dừng sớm khi không còn ảnh mới
+Site rule có thể đặt CSS selector cần chờ (vd gallery sản phẩm) trước khi áp dụng chiến lược
+"""
+
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+READY_IMG = 'img'
+READY_NETWORK_IDLE = 'network_idle'
+READY_SCROLL = 'scroll'
+READY_STRATEGIES = (READY_IMG, READY_NETWORK_IDLE, READY_SCROLL)
+
+# Số request đã xong (performance entries) và trạng thái tải của trang
+NETWORK_STATE_SCRIPT = "return [performance.getEntriesByType('resource').length, document.readyState];"
+
+SCROLL_SCRIPT = """
+window.scrollBy(0, window.innerHeight);
+return window.innerHeight + window.pageYOffset >= document.documentElement.scrollHeight - 2;
+"""
+
+
+def wait_for_img(driver, timeout):
+    """Chờ có ít nhất một thẻ <img> (không lỗi nếu hết thời gian)"""
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.TAG_NAME, "img")))
+        return True
+    except Exception:
+        return False
+
+
+def wait_for_selector(driver, selector, timeout):
+    """
+    Chờ phần tử khớp CSS selector xuất hiện
+
+    Args:
+        driver (WebDriver): Driver đang mở trang
+        selector (str): CSS selector (vd ".product-gallery img")
+        timeout (float): Thời gian chờ tối đa (giây)
+
+    Returns:
+        bool: True nếu phần tử đã xuất hiện
+    """
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        return True
+    except Exception:
+        return False
+
+
+def wait_for_network_idle(driver, timeout, idle_time=0.5, poll=0.1):
+    """
+    Chờ trang không phát sinh request mới trong idle_time giây
+
+    Args:
+        driver (WebDriver): Driver đang mở trang
+        timeout (float): Thời gian chờ tối đa (giây)
+        idle_time (float): Khoảng thời gian không có request mới để coi là idle
+        poll (float): Chu kỳ kiểm tra (giây)
+
+    Returns:
+        bool: True nếu đạt trạng thái idle trước khi hết thời gian
+    """
+    deadline = time.monotonic() + timeout
+    last_count = -1
+    last_change = time.monotonic()
+
+    while time.monotonic() < deadline:
+        count, ready_state = driver.execute_script(NETWORK_STATE_SCRIPT)
+        now = time.monotonic()
+        if count != last_count:
+            last_count = count
+            last_change = now
+        elif ready_state != 'loading' and now - last_change >= idle_time:
+            return True
+        time.sleep(poll)
+    return False
+
+
+def scroll_for_lazy_images(driver, collect, timeout, pause=0.4, stable_rounds=2, max_rounds=30):
+    """
+    Cuộn từng màn hình để kích hoạt lazy-load, dừng sớm khi số ứng viên ảnh không tăng:
+    ngay lần cuộn đầu tiên không có ảnh mới nếu đã tới cuối trang, ngược lại sau stable_rounds
+    lần liên tiếp (trang cuộn vô hạn)
+
+    Args:
+        driver (WebDriver): Driver đang mở trang
+        collect (callable): Hàm collect() trả về danh sách ứng viên ảnh hiện có
+        timeout (float): Thời gian cuộn tối đa (giây)
+        pause (float): Thời gian chờ sau mỗi lần cuộn (giây)
+        stable_rounds (int): Số lần cuộn liên tiếp không có ảnh mới để dừng khi chưa tới cuối trang
+        max_rounds (int): Số lần cuộn tối đa
+
+    Returns:
+        tuple: (ứng viên ảnh lần thu thập cuối, số lần cuộn)
+    """
+    deadline = time.monotonic() + timeout
+    candidates = collect()
+    rounds = 0
+    unchanged = 0
+
+    while rounds < max_rounds and time.monotonic() < deadline:
+        at_bottom = driver.execute_script(SCROLL_SCRIPT)
+        rounds += 1
+        time.sleep(pause)
+
+        latest = collect()
+        if len(latest) > len(candidates):
+            unchanged = 0
+        else:
+            unchanged += 1
+        candidates = latest
+
+        if unchanged and (at_bottom or unchanged >= stable_rounds):
+            break
+    return candidates, rounds
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module journal tiến trình dạng append-only (JSON Lines) để chạy tiếp khi app bị tắt
+giữa chừng và tạo lại báo cáo chỉ từ journal
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+JOURNAL_FILENAME = "crawler_journal.jsonl"
+
+
+def entry_key(product_code, row, image_rank=None):
+    """
+    Khóa nhận diện một entry (hoặc một ảnh của entry) giữa các lần chạy
+
+    Args:
+        product_code (str): Mã sản phẩm
+        row (int): Dòng Excel
+        image_rank (int): Thứ hạng ảnh của trang web (None = khóa của cả entry)
+
+    Returns:
+        str: Khóa dạng "row|mã" hoặc "row|mã|#hạng"
+    """
+    key = f"{row}|{product_code}"
+    return f"{key}|#{image_rank}" if image_rank is not None else key
+
+
+def result_key(result):
+    """
+    Khóa của một result entry: mỗi ảnh của trang web là một kết quả riêng, link ảnh trực tiếp
+    và trang không tìm được ảnh tính là ảnh số 1
+
+    Args:
+        result (dict): Result entry
+
+    Returns:
+        str: Khóa dạng "row|mã|#hạng"
+    """
+    return entry_key(result.get('product_code'), result.get('row'), result.get('image_rank') or 1)
+
+
+def load_records(journal_path, record_type):
+    """
+    Đọc lại các bản ghi cùng loại từ journal
+
+    Args:
+        journal_path (str): Đường dẫn file journal
+        record_type (str): 'result' hoặc 'entry'
+
+    Returns:
+        list: Bản ghi theo thứ tự ghi (bỏ qua dòng ghi dở khi app bị tắt)
+    """
+    records = []
+    if not os.path.exists(journal_path):
+        return records
+
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == record_type:
+                record.pop('type', None)
+                records.append(record)
+    return records
+
+
+def load_results(journal_path):
+    """
+    Đọc lại toàn bộ result entries từ journal
+
+    Args:
+        journal_path (str): Đường dẫn file journal
+
+    Returns:
+        list: Result entries theo thứ tự ghi (bỏ qua dòng ghi dở khi app bị tắt)
+    """
+    return load_records(journal_path, 'result')
+
+
+def latest_results(journal_path):
+    """
+    Kết quả mới nhất của từng ảnh trong journal
+
+    Args:
+        journal_path (str): Đường dẫn file journal
+
+    Returns:
+        list: Result entries, mỗi result_key một entry
+    """
+    latest = {}
+    for result in load_results(journal_path):
+        latest[result_key(result)] = result
+    return list(latest.values())
+
+
+def completed_results(journal_path):
+    """
+    Lấy kết quả của các entry đã hoàn thành: đủ số ảnh entry cần download (ghi lúc bắt đầu entry,
+    mặc định 1 ảnh) và kết quả mới nhất của từng ảnh đều thành công - entry còn ảnh lỗi hoặc chưa
+    download (app bị tắt giữa chừng) sẽ được crawl lại khi resume
+
+    Args:
+        journal_path (str): Đường dẫn file journal
+
+    Returns:
+        dict: entry_key -> danh sách result entries (status 'success') của entry
+    """
+    expected = {}
+    for record in load_records(journal_path, 'entry'):
+        expected[entry_key(record.get('product_code'), record.get('row'))] = record.get('images') or 1
+
+    entries = {}
+    for result in latest_results(journal_path):
+        if result.get('status') == 'success':
+            key = entry_key(result.get('product_code'), result.get('row'))
+            entries.setdefault(key, {})[result.get('image_rank') or 1] = result
+
+    completed = {}
+    for key, ranks in entries.items():
+        count = expected.get(key, 1)
+        if all(rank in ranks for rank in range(1, count + 1)):
+            completed[key] = [ranks[rank] for rank in range(1, count + 1)]
+    return completed
+
+
+class ProgressJournal:
+    def __init__(self, output_dir, resume=False, fsync_interval=1.0):
+        """
+        Mở journal trong thư mục output
+
+        Args:
+            output_dir (str): Thư mục lưu ảnh
+            resume (bool): True = ghi tiếp journal cũ, False = lưu journal cũ thành bản archive và bắt đầu mới
+            fsync_interval (float): Khoảng thời gian tối thiểu (giây) giữa 2 lần fsync xuống đĩa
+        """
+        self.path = os.path.join(output_dir, JOURNAL_FILENAME)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+
+        if not resume and os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            os.replace(self.path, os.path.join(output_dir, f"crawler_journal_{timestamp}.jsonl"))
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()
+
+            now = time.monotonic()
+            if now - self._last_sync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_sync = now
+
+    def start_run(self, total_entries, resumed_entries=0):
+        """Ghi bản ghi bắt đầu lần chạy"""
+        self._write({
+            'type': 'run_start',
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'entries': total_entries,
+            'resumed': resumed_entries,
+        })
+
+    def start_entry(self, product_code, row, images):
+        """Ghi số ảnh entry sẽ download trước khi download, để resume biết entry đã đủ ảnh chưa"""
+        self._write({'type': 'entry', 'product_code': product_code, 'row': row, 'images': images})
+
+    def append(self, result_entry):
+        """Ghi một result entry ngay khi có kết quả"""
+        record = {'type': 'result'}
+        record.update(result_entry)
+        self._write(record)
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module retry với exponential backoff + jitter và circuit breaker theo host
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Các HTTP status coi là lỗi tạm thời, có thể thử lại
+RETRYABLE_STATUS = (408, 425, 429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Host đang bị ngắt (circuit breaker mở) - bỏ qua request ngay"""
+
+    def __init__(self, host):
+        self.host = host
+        super().__init__(f"host {host} tạm ngưng sau nhiều lỗi liên tiếp")
+
+
+def parse_retry_after(value):
+    """
+    Đọc header Retry-After (số giây hoặc HTTP-date)
+
+    Args:
+        value (str): Giá trị header Retry-After
+
+    Returns:
+        float: Số giây cần chờ, hoặc None nếu không đọc được
+    """
+    if not value:
+        return None
+
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, jitter=0.5, max_retry_after=60.0):
+        """
+        Khởi tạo chính sách retry
+
+        Args:
+            max_attempts (int): Tổng số lần thử tối đa (1 = không retry)
+            base_delay (float): Delay (giây) trước lần thử lại đầu tiên
+            max_delay (float): Delay tối đa cho backoff
+            jitter (float): Biên độ jitter (0-1), delay dao động ±jitter * delay
+            max_retry_after (float): Giới hạn trên cho Retry-After từ server
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.jitter = min(1.0, max(0.0, float(jitter)))
+        self.max_retry_after = max_retry_after
+
+    def is_retryable_status(self, status_code):
+        return status_code in RETRYABLE_STATUS
+
+    def compute_delay(self, attempt, retry_after=None):
+        """
+        Tính thời gian chờ trước lần thử tiếp theo
+
+        Args:
+            attempt (int): Số lần đã thử (bắt đầu từ 1)
+            retry_after (float): Số giây server yêu cầu chờ (nếu có)
+
+        Returns:
+            float: Số giây cần chờ
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+
+class CircuitBreaker:
+    # Giá trị allow() trả về cho request thăm dò (half-open) - vẫn là giá trị "đúng"
+    PROBE = 'probe'
+
+    def __init__(self, failure_threshold=5, cooldown=60.0):
+        """
+        Khởi tạo circuit breaker theo host
+
+        Args:
+            failure_threshold (int): Số lỗi tạm thời liên tiếp để ngắt host (0 = tắt)
+            cooldown (float): Số giây trước khi cho phép 1 request thử lại (half-open)
+        """
+        self.failure_threshold = max(0, int(failure_threshold))
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = {'failures': 0, 'opened_at': None, 'probing': False,
+                                 'trips': 0, 'rejected': 0}
+        return self._hosts[host]
+
+    def allow(self, host):
+        """
+        Kiểm tra có được gửi request tới host không
+
+        Args:
+            host (str): Host sắp gửi request
+
+        Returns:
+            bool | str: True, PROBE (request thăm dò - người gọi phải end_probe khi request kết thúc)
+                        hoặc False nếu host đang bị ngắt
+        """
+        if not self.failure_threshold:
+            return True
+
+        with self._lock:
+            state = self._state(host)
+            if state['opened_at'] is None:
+                return True
+
+            # Hết cooldown: cho đúng 1 request thăm dò (half-open)
+            if not state['probing'] and time.monotonic() - state['opened_at'] >= self.cooldown:
+                state['probing'] = True
+                return self.PROBE
+
+            state['rejected'] += 1
+            return False
+
+    def record_success(self, host):
+        with self._lock:
+            state = self._state(host)
+            state['failures'] = 0
+            state['opened_at'] = None
+            state['probing'] = False
+
+    def end_probe(self, host):
+        """
+        Kết thúc request thăm dò: nếu request dừng mà chưa ghi nhận thành công / lỗi (vd exception
+        không liên quan tới host) thì bỏ trạng thái thăm dò để request sau được thăm dò lại,
+        tránh host bị chặn tới hết lần chạy
+        """
+        with self._lock:
+            self._state(host)['probing'] = False
+
+    def record_failure(self, host):
+        """Ghi nhận lỗi tạm thời, trả về True nếu host vừa bị ngắt"""
+        if not self.failure_threshold:
+            return False
+
+        with self._lock:
+            state = self._state(host)
+            state['failures'] += 1
+
+            if state['probing']:
+                # Request thăm dò thất bại - mở lại circuit
+                state['probing'] = False
+                state['opened_at'] = time.monotonic()
+                return False
+
+            if state['opened_at'] is None and state['failures'] >= self.failure_threshold:
+                state['opened_at'] = time.monotonic()
+                state['trips'] += 1
+                return True
+            return False
+
+    def stats(self):
+        """
+        Thống kê theo host
+
+        Returns:
+            dict: host -> {'open', 'trips', 'rejected'}
+        """
+        with self._lock:
+            return {
+                host: {'open': state['opened_at'] is not None, 'trips': state['trips'],
+                       'rejected': state['rejected']}
+                for host, state in self._hosts.items()
+            }
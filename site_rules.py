@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module rule theo từng site cho việc tìm ảnh trên trang web, đọc từ file JSON:
+
+{
+    "shop.example.com": {"mode": "browser"},
+    "example.vn": {"mode": "static", "exclude": ["logo", "banner"]},
+    "gallery.example.net": {"mode": "browser", "wait": "scroll", "wait_selector": ".product-gallery img"}
+}
+
+mode: "auto" (HTML tĩnh trước, không có ảnh mới dùng trình duyệt), "browser" (luôn dùng
+trình duyệt - trang render bằng JavaScript), "static" (chỉ dùng HTML tĩnh).
+wait / wait_selector: cách chờ trang sẵn sàng khi mở bằng trình duyệt ("img", "network_idle",
+"scroll" - mặc định theo cấu hình chung) và CSS selector cần chờ trước.
+Host "example.vn" áp dụng cho cả các subdomain.
+"""
+
+import json
+import os
+from urllib.parse import urlparse
+
+DEFAULT_RULES_FILE = "site_rules.json"
+
+MODE_AUTO = 'auto'
+MODE_BROWSER = 'browser'
+MODE_STATIC = 'static'
+
+DEFAULT_RULE = {'mode': MODE_AUTO, 'exclude': [], 'wait': None, 'wait_selector': None}
+
+
+class SiteRules:
+    def __init__(self, rules=None):
+        """
+        Khởi tạo bộ rule
+
+        Args:
+            rules (dict): host -> {'mode', 'exclude', 'wait', 'wait_selector'}
+        """
+        self.rules = {}
+        for host, rule in (rules or {}).items():
+            merged = dict(DEFAULT_RULE)
+            merged.update(rule or {})
+            if merged['mode'] not in (MODE_AUTO, MODE_BROWSER, MODE_STATIC):
+                merged['mode'] = MODE_AUTO
+            self.rules[host.lower().lstrip('.')] = merged
+
+    @classmethod
+    def load(cls, path):
+        """
+        Đọc rule từ file JSON (không có file thì dùng rule mặc định cho mọi site)
+
+        Args:
+            path (str): Đường dẫn file rule
+
+        Returns:
+            SiteRules: Bộ rule đã đọc
+
+        Raises:
+            ValueError: File rule không phải JSON hợp lệ
+        """
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def for_url(self, url):
+        """
+        Lấy rule cho URL (khớp host chính xác hoặc host cha)
+
+        Args:
+            url (str): URL trang
+
+        Returns:
+            dict: {'mode', 'exclude', 'wait', 'wait_selector'}
+        """
+        try:
+            host = (urlparse(str(url)).hostname or '').lower()
+        except ValueError:
+            host = ''
+        while host:
+            if host in self.rules:
+                return self.rules[host]
+            if '.' not in host:
+                break
+            host = host.split('.', 1)[1]
+        return DEFAULT_RULE
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module tìm ảnh ứng viên từ HTML tĩnh (không cần trình duyệt): đọc <img src>, srcset,
+các thuộc tính lazy-load (data-src...), <source srcset> và meta og:image / twitter:image.
+Với trang mở bằng trình duyệt: DOM_IMAGE_SCRIPT lấy toàn bộ ứng viên trong một lần gọi
+execute_script, lọc ở phía Python bằng extract_dom_image_candidates.
+Ứng viên kèm nguồn và kích thước đã biết để image_ranking xếp hạng
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from image_ranking import new_candidate
+
+MAX_HTML_BYTES = 5 * 1024 * 1024
+
+# Thuộc tính chứa link ảnh của các thư viện lazy-load phổ biến
+LAZY_SRC_ATTRS = ('data-src', 'data-lazy-src', 'data-original', 'data-lazy', 'data-zoom-image',
+                  'data-large_image', 'data-full', 'data-image')
+SRCSET_ATTRS = ('srcset', 'data-srcset', 'data-lazy-srcset')
+META_IMAGE_KEYS = ('og:image', 'og:image:url', 'og:image:secure_url', 'twitter:image', 'twitter:image:src')
+
+# Ảnh trang trí / placeholder không phải ảnh sản phẩm
+DEFAULT_EXCLUDE = ('data:', '.svg', 'spacer', 'pixel.gif', 'blank.gif', 'loading.gif', 'placeholder')
+
+# Ảnh đã tải xong mà nhỏ hơn kích thước này (icon, tracking pixel) thì bỏ qua
+MIN_DOM_IMAGE_SIZE = 50
+
+CSS_URL_PATTERN = re.compile(r"""url\(\s*['"]?(.*?)['"]?\s*\)""")
+
+# Chạy trong trang: trả về mọi ứng viên ảnh trong một round trip WebDriver thay vì
+# find_elements + get_attribute cho từng ảnh. arguments[0] = danh sách thuộc tính lazy-load
+DOM_IMAGE_SCRIPT = """
+var lazyAttrs = arguments[0];
+var items = [];
+var nodes = document.querySelectorAll('img, picture source');
+for (var i = 0; i < nodes.length; i++) {
+    var el = nodes[i];
+    var lazy = [];
+    for (var j = 0; j < lazyAttrs.length; j++) {
+        var value = el.getAttribute(lazyAttrs[j]);
+        if (value) { lazy.push(value); }
+    }
+    items.push({
+        tag: el.tagName.toLowerCase(),
+        currentSrc: el.currentSrc || '',
+        src: el.getAttribute('src') || '',
+        srcset: el.getAttribute('srcset') || el.getAttribute('data-srcset') || el.getAttribute('data-lazy-srcset') || '',
+        lazy: lazy,
+        width: el.naturalWidth || 0,
+        height: el.naturalHeight || 0,
+        renderedWidth: el.clientWidth || 0,
+        renderedHeight: el.clientHeight || 0
+    });
+}
+var backgrounds = [];
+var all = document.querySelectorAll('body *');
+for (var k = 0; k < all.length; k++) {
+    var bg = window.getComputedStyle(all[k]).backgroundImage;
+    if (bg && bg !== 'none') { backgrounds.push(bg); }
+}
+return {base: document.baseURI, items: items, backgrounds: backgrounds};
+"""
+
+
+def parse_srcset(value):
+    """
+    Tách srcset thành danh sách URL
+
+    Args:
+        value (str): Giá trị srcset ("a.jpg 1x, b.jpg 2x" hoặc "a.jpg 400w, b.jpg 800w")
+
+    Returns:
+        list: Các (url, chiều rộng) theo thứ tự descriptor giảm dần (ảnh lớn nhất trước);
+              chiều rộng = 0 khi descriptor không phải dạng "w"
+    """
+    candidates = []
+    for part in (value or '').split(','):
+        tokens = part.strip().split()
+        if not tokens:
+            continue
+        descriptor = tokens[1] if len(tokens) > 1 else '1x'
+        try:
+            weight = float(descriptor[:-1])
+        except ValueError:
+            weight = 1.0
+        width = int(weight) if descriptor.endswith('w') else 0
+        candidates.append((weight, tokens[0], width))
+    return [(url, width) for _, url, width in sorted(candidates, key=lambda item: -item[0])]
+
+
+def attr_size(value):
+    """Đọc thuộc tính width/height của thẻ (vd "800", "800px"), 0 nếu không phải số"""
+    match = re.match(r'\s*(\d+)', value or '')
+    return int(match.group(1)) if match else 0
+
+
+class ImageCandidateParser(HTMLParser):
+    """Gom ảnh ứng viên từ HTML theo thứ tự xuất hiện (og:image đưa lên đầu)"""
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.meta_images = []
+        self.images = []
+
+    def _add(self, target, url, source, width=0, height=0, srcset_width=0):
+        url = (url or '').strip()
+        if url:
+            target.append(new_candidate(urljoin(self.base_url, url), source, width, height, srcset_width))
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if tag == 'base' and attrs.get('href'):
+            self.base_url = urljoin(self.base_url, attrs['href'])
+
+        elif tag == 'meta':
+            key = (attrs.get('property') or attrs.get('name') or '').lower()
+            if key in META_IMAGE_KEYS:
+                self._add(self.meta_images, attrs.get('content'), 'meta')
+
+        elif tag == 'link' and (attrs.get('rel') or '').lower() == 'image_src':
+            self._add(self.meta_images, attrs.get('href'), 'meta')
+
+        elif tag in ('img', 'source'):
+            width, height = attr_size(attrs.get('width')), attr_size(attrs.get('height'))
+            # Ảnh thật của lazy-load nằm ở data-*, src thường chỉ là placeholder
+            for attr in LAZY_SRC_ATTRS:
+                self._add(self.images, attrs.get(attr), 'lazy', width, height)
+            for attr in SRCSET_ATTRS:
+                for url, srcset_width in parse_srcset(attrs.get(attr)):
+                    self._add(self.images, url, 'srcset', srcset_width=srcset_width)
+            if tag == 'img':
+                self._add(self.images, attrs.get('src'), 'img', width, height)
+
+    def candidates(self):
+        return self.meta_images + self.images
+
+
+def is_excluded(url, patterns):
+    return not url.startswith(('http://', 'https://')) or any(p in url.lower() for p in patterns)
+
+
+def extract_image_candidates(html, base_url, exclude=()):
+    """
+    Tìm ảnh ứng viên trong HTML
+
+    Args:
+        html (str): Nội dung HTML
+        base_url (str): URL của trang (để đổi link tương đối thành tuyệt đối)
+        exclude (iterable): Chuỗi con cần loại bỏ thêm (ngoài DEFAULT_EXCLUDE)
+
+    Returns:
+        list: Các ứng viên (image_ranking.new_candidate) link http(s), theo thứ tự xuất hiện
+    """
+    parser = ImageCandidateParser(base_url)
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # HTML lỗi cú pháp - dùng những gì đã đọc được
+        pass
+
+    patterns = tuple(p.lower() for p in DEFAULT_EXCLUDE + tuple(exclude))
+    return [candidate for candidate in parser.candidates() if not is_excluded(candidate['url'], patterns)]
+
+
+def page_validators(headers):
+    """
+    Lấy validator HTTP của trang (dùng để kiểm tra trang có thay đổi ở lần chạy sau)
+
+    Args:
+        headers (Mapping): Response headers
+
+    Returns:
+        dict: {'etag', 'last_modified'}
+    """
+    return {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+
+def fetch_page_html(session, url, timeout=15, max_bytes=MAX_HTML_BYTES):
+    """
+    Tải HTML của trang bằng HTTP thường
+
+    Args:
+        session (requests.Session): Session keep-alive của worker
+        url (str): URL trang
+        timeout (int): Timeout (giây)
+        max_bytes (int): Dung lượng HTML tối đa đọc
+
+    Returns:
+        tuple: (html, final_url, validators) - html là None nếu trang không phải HTML
+    """
+    return read_page_html(session.get(url, timeout=timeout, stream=True), max_bytes)
+
+
+def read_page_html(response, max_bytes=MAX_HTML_BYTES):
+    """
+    Đọc HTML từ response đã mở (stream=True) rồi đóng response
+
+    Args:
+        response (requests.Response): Response của trang (vd response 200 của request có điều kiện)
+        max_bytes (int): Dung lượng HTML tối đa đọc
+
+    Returns:
+        tuple: (html, final_url, validators) - html là None nếu trang không phải HTML
+    """
+    try:
+        response.raise_for_status()
+        validators = page_validators(response.headers)
+        content_type = (response.headers.get('Content-Type') or '').lower()
+        if 'html' not in content_type:
+            return None, response.url, validators
+
+        body = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            body += chunk
+            if len(body) >= max_bytes:
+                break
+
+        # requests mặc định ISO-8859-1 khi server không gửi charset - HTML hiện nay gần như luôn là UTF-8
+        encoding = response.encoding if 'charset=' in content_type else 'utf-8'
+        try:
+            return bytes(body).decode(encoding, errors='replace'), response.url, validators
+        except LookupError:
+            return bytes(body).decode('utf-8', errors='replace'), response.url, validators
+    finally:
+        response.close()
+
+
+def extract_dom_image_candidates(result, exclude=(), min_size=MIN_DOM_IMAGE_SIZE):
+    """
+    Lọc kết quả của DOM_IMAGE_SCRIPT thành danh sách ảnh ứng viên
+
+    Args:
+        result (dict): Giá trị trả về của execute_script(DOM_IMAGE_SCRIPT, ...)
+        exclude (iterable): Chuỗi con cần loại bỏ thêm (ngoài DEFAULT_EXCLUDE)
+        min_size (int): Bỏ ảnh đã tải có cả 2 chiều nhỏ hơn giá trị này (px)
+
+    Returns:
+        list: Các ứng viên (image_ranking.new_candidate) link http(s), theo thứ tự trong trang
+    """
+    result = result or {}
+    base_url = result.get('base') or ''
+    candidates = []
+
+    def add(url, source, width=0, height=0, srcset_width=0):
+        url = (url or '').strip()
+        if url:
+            candidates.append(new_candidate(urljoin(base_url, url), source, width, height, srcset_width))
+
+    for item in result.get('items') or []:
+        # naturalWidth = 0 khi ảnh chưa tải (lazy-load chưa tới) - không lọc theo kích thước
+        width, height = item.get('width') or 0, item.get('height') or 0
+        if width and height and width < min_size and height < min_size:
+            continue
+        # Ảnh hiển thị to trên trang (gallery chính) được ưu tiên dù chưa tải xong
+        width = max(width, item.get('renderedWidth') or 0)
+        height = max(height, item.get('renderedHeight') or 0)
+
+        for url in item.get('lazy') or []:
+            add(url, 'lazy', width, height)
+        for url, srcset_width in parse_srcset(item.get('srcset')):
+            add(url, 'srcset', srcset_width=srcset_width)
+        add(item.get('currentSrc'), item.get('tag') or 'img', width, height)
+        if item.get('tag') == 'img':
+            add(item.get('src'), 'img', width, height)
+
+    for background in result.get('backgrounds') or []:
+        for url in CSS_URL_PATTERN.findall(background):
+            add(url, 'background')
+
+    patterns = tuple(p.lower() for p in DEFAULT_EXCLUDE + tuple(exclude))
+    return [candidate for candidate in candidates if not is_excluded(candidate['url'], patterns)]
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module download ảnh dạng streaming: kiểm tra Content-Type / Content-Length trước,
+nhận diện magic bytes ở chunk đầu tiên và dừng sớm với file quá lớn hoặc không phải ảnh
+"""
+
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 16
+
+# Content-Type chắc chắn không phải ảnh (trang lỗi HTML, JSON...)
+NON_IMAGE_TYPES = (
+    'text/', 'application/json', 'application/xml', 'application/xhtml+xml',
+    'application/javascript', 'application/pdf', 'application/zip', 'video/', 'audio/',
+)
+
+
+class DownloadRejected(Exception):
+    """Download bị dừng sớm vì không phải ảnh hoặc vượt dung lượng cho phép"""
+
+    def __init__(self, reason, bytes_saved=0):
+        self.reason = reason
+        self.bytes_saved = bytes_saved
+        super().__init__(reason)
+
+
+def sniff_image_type(head):
+    """
+    Nhận diện định dạng ảnh từ các byte đầu tiên
+
+    Args:
+        head (bytes): Ít nhất 12 byte đầu của file
+
+    Returns:
+        str: 'jpeg', 'png', 'gif', 'webp', 'bmp', 'tiff', 'ico', 'avif', hoặc None nếu không phải ảnh
+    """
+    head = bytes(head[:SNIFF_BYTES])
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'tiff'
+    if head.startswith(b'\x00\x00\x01\x00'):
+        return 'ico'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis', b'heic', b'heix', b'mif1'):
+        return 'avif'
+    return None
+
+
+def parse_content_length(headers):
+    try:
+        length = int(headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+    return length if length >= 0 else None
+
+
+def check_headers(headers, max_bytes):
+    """
+    Kiểm tra response headers trước khi đọc body
+
+    Args:
+        headers (Mapping): Response headers
+        max_bytes (int): Dung lượng tối đa cho phép (0 = không giới hạn)
+
+    Returns:
+        int: Content-Length (None nếu server không gửi)
+
+    Raises:
+        DownloadRejected: Content-Type không phải ảnh hoặc Content-Length vượt giới hạn
+    """
+    content_length = parse_content_length(headers)
+    content_type = (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+
+    if content_type.startswith(NON_IMAGE_TYPES):
+        raise DownloadRejected(f"Content-Type không phải ảnh ({content_type})", content_length or 0)
+
+    if max_bytes and content_length is not None and content_length > max_bytes:
+        raise DownloadRejected(f"File quá lớn ({content_length / 1024 / 1024:.1f}MB)", content_length)
+
+    return content_length
+
+
+class ImageStreamBuffer:
+    """Buffer nhận từng chunk: cấp phát trước theo Content-Length, sniff chunk đầu, chặn khi vượt max"""
+
+    def __init__(self, headers, max_bytes):
+        self.max_bytes = max_bytes
+        self.content_length = check_headers(headers, max_bytes)
+
+        # Body nén (gzip...) có độ dài sau giải nén khác Content-Length - không cấp phát trước
+        encoding = (headers.get('Content-Encoding') or 'identity').lower()
+        if self.content_length and encoding == 'identity':
+            self.buffer = bytearray(self.content_length)
+        else:
+            self.buffer = bytearray()
+        self.position = 0
+        self.sniffed = False
+
+    def _reject(self, reason):
+        saved = self.content_length - self.position if self.content_length else 0
+        raise DownloadRejected(reason, max(0, saved))
+
+    def feed(self, chunk):
+        """Thêm một chunk, raise DownloadRejected nếu vượt giới hạn hoặc không phải ảnh"""
+        if not chunk:
+            return
+
+        end = self.position + len(chunk)
+        if self.max_bytes and end > self.max_bytes:
+            self._reject(f"File vượt quá {self.max_bytes / 1024 / 1024:.1f}MB")
+
+        if end <= len(self.buffer):
+            self.buffer[self.position:end] = chunk
+        else:
+            # Server gửi nhiều hơn Content-Length hoặc không có Content-Length
+            del self.buffer[self.position:]
+            self.buffer += chunk
+        self.position = end
+
+        if not self.sniffed and self.position >= SNIFF_BYTES:
+            self.sniff()
+
+    def sniff(self):
+        self.sniffed = True
+        if sniff_image_type(self.buffer[:SNIFF_BYTES]) is None:
+            head = bytes(self.buffer[:SNIFF_BYTES]).lstrip()
+            kind = "trang HTML/text" if head[:1] == b'<' else "không rõ định dạng"
+            self._reject(f"Nội dung không phải ảnh ({kind})")
+
+    def finish(self):
+        """
+        Kết thúc stream và trả về nội dung
+
+        Returns:
+            bytearray: Nội dung ảnh (không copy thêm lần nào)
+        """
+        if not self.sniffed:
+            self.sniff()
+        del self.buffer[self.position:]
+        return self.buffer
+
+
+def read_image_stream(response, max_bytes, chunk_size=CHUNK_SIZE):
+    """
+    Đọc body của requests.Response (stream=True) thành bytes ảnh
+
+    Args:
+        response (requests.Response): Response mở với stream=True
+        max_bytes (int): Dung lượng tối đa cho phép (0 = không giới hạn)
+        chunk_size (int): Kích thước mỗi chunk
+
+    Returns:
+        bytearray: Nội dung ảnh
+
+    Raises:
+        DownloadRejected: Nội dung không phải ảnh hoặc vượt dung lượng cho phép
+    """
+    try:
+        stream = ImageStreamBuffer(response.headers, max_bytes)
+        for chunk in response.iter_content(chunk_size):
+            stream.feed(chunk)
+        return stream.finish()
+    except DownloadRejected:
+        # Đóng kết nối để không tải phần còn lại của body
+        response.close()
+        raise
+
+
+def discard_response(response, max_drain=CHUNK_SIZE):
+    """Giải phóng response lỗi: đọc hết nếu body nhỏ để giữ kết nối keep-alive, ngược lại đóng"""
+    content_length = parse_content_length(response.headers)
+    if content_length is not None and content_length <= max_drain:
+        try:
+            response.content
+            return
+        except Exception:
+            pass
+    response.close()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module chống download trùng URL trong một lần crawl: task đầu tiên tải và xử lý ảnh,
+các dòng Excel khác cùng URL dùng lại kết quả đó
+"""
+
+import threading
+
+
+class UrlDeduplicator:
+    """Theo dõi URL đang tải (in-flight) và đã tải xong trong lần crawl hiện tại"""
+
+    OWNER = 'owner'
+    WAITING = 'waiting'
+    COMPLETED = 'completed'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}   # url -> danh sách waiter chờ kết quả
+        self._completed = {}   # url -> outcome của task đầu tiên
+        self.reused_count = 0
+
+    def claim(self, url, waiter):
+        """
+        Đăng ký xử lý một URL
+
+        Args:
+            url (str): URL cần tải
+            waiter (tuple): Thông tin dòng đang chờ (save_dir, product_code, row_number, image_rank)
+
+        Returns:
+            tuple: (trạng thái, outcome)
+                - OWNER: caller phải tự tải, outcome = None
+                - WAITING: URL đang được tải, waiter được xử lý khi task đầu tiên xong
+                - COMPLETED: URL đã tải xong, outcome là kết quả để dùng lại
+        """
+        with self._lock:
+            if url in self._completed:
+                self.reused_count += 1
+                return self.COMPLETED, self._completed[url]
+            if url in self._in_flight:
+                self.reused_count += 1
+                self._in_flight[url].append(waiter)
+                return self.WAITING, None
+            self._in_flight[url] = []
+            return self.OWNER, None
+
+    def complete(self, url, outcome):
+        """
+        Ghi nhận kết quả của task đầu tiên
+
+        Args:
+            url (str): URL đã tải
+            outcome (dict): {'status', 'filepath', 'error_reason'}
+
+        Returns:
+            list: Các waiter đang chờ URL này
+        """
+        with self._lock:
+            self._completed[url] = outcome
+            return self._in_flight.pop(url, [])